@@ -5,15 +5,13 @@ def check_venv():
 	if sys.prefix == sys.base_prefix:
 		print("Warning: You are not running inside a Python virtual environment (venv). Activate your venv for best practice.")
 		print("To activate: source venv/bin/activate (Linux/Mac) or .\\venv\\Scripts\\activate (Windows)")
-  
-check_venv()
+
 """
 aiCustomer.py
 Console tool that interacts with OpenAI's GPT models. It contains a system prompt.
 The AI acts as a professional in energy consumption for customers, giving clear, concise advice in one sentence.
 """
 
-import openai
 import os
 
 
@@ -42,6 +40,9 @@ def get_ai_response(client, prompt: str, model: str = "gpt-3.5-turbo") -> str:
 	return response.choices[0].message.content.strip()
 
 if __name__ == "__main__":
+	import openai
+
+	check_venv()
 
 	OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 	print("Enter your prompt for the AI (type 'exit' to quit):")
@@ -8,10 +8,8 @@ def check_venv():
 	if sys.prefix == sys.base_prefix:
 		print("Warning: You are not running inside a Python virtual environment (venv). Activate your venv for best practice.")
 		print("To activate: source venv/bin/activate (Linux/Mac) or .\\venv\\Scripts\\activate (Windows)")
-check_venv()
 
 
-import openai
 import os
 import json
 import sys
@@ -0,0 +1,183 @@
+"""
+Online detection of meter resets, negative deltas and spikes.
+
+Cumulative counters should only grow, but meters get reset or replaced (the
+counter drops back towards zero), occasionally step backwards, or report a
+burst after a communication gap. AnomalyDetector looks at every new reading
+as it is ingested, with O(1) state per meter: an exponentially weighted mean
+and variance of its recent import deltas.
+
+    reset     import fell below RESET_RATIO x the previous reading
+    negative  any other backward step (import or export)
+    spike     import delta above mean + SPIKE_SIGMAS x std (after WARMUP deltas)
+
+Flagged deltas are repaired before they reach calc_data and the delta stores:
+resets and spikes are replaced by the expected delta (the EWMA mean), negative
+steps by 0. Flagged deltas do not update the EWMA. The state of a meter is
+seeded from the tail of its history the first time the meter is seen, so no
+second pass over history is needed. The latest events are kept in anomalies.json
+next to the data for /anomalies.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import Counter, deque
+
+from diff_data import DATA_DIR
+
+STATE_FILE = os.path.join(DATA_DIR, "anomalies.json")
+
+ALPHA = 0.05            # EWMA weight of the newest delta
+SPIKE_SIGMAS = 6.0
+MIN_SCALE = 1.0         # floor of the std, so flat meters do not flag every small change
+WARMUP = 16             # deltas before spikes are flagged
+RESET_RATIO = 0.5
+SEED_READINGS = 96      # one day of 15-minute readings
+EVENTS_KEPT = 10_000
+
+RESET, NEGATIVE, SPIKE = "reset", "negative", "spike"
+
+
+class MeterState:
+    __slots__ = ("mean", "var", "n")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+
+    def update(self, delta: float):
+        if self.n == 0:
+            self.mean = delta
+        else:
+            diff = delta - self.mean
+            self.mean += ALPHA * diff
+            self.var = (1 - ALPHA) * (self.var + ALPHA * diff * diff)
+        self.n += 1
+
+    @property
+    def expected(self) -> float:
+        return max(self.mean, 0.0) if self.n else 0.0
+
+    def classify(self, prev_imp: float, imp: float) -> str | None:
+        delta = imp - prev_imp
+        if delta < 0:
+            return RESET if imp < prev_imp * RESET_RATIO else NEGATIVE
+        if self.n >= WARMUP and delta > self.mean + SPIKE_SIGMAS * max(math.sqrt(self.var), MIN_SCALE):
+            return SPIKE
+        return None
+
+
+class AnomalyDetector:
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self.states: dict[str, MeterState] = {}
+        self.events: deque = deque(maxlen=EVENTS_KEPT)
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    # ---------- persistence ----------
+    @classmethod
+    def load(cls, path: str = STATE_FILE) -> "AnomalyDetector":
+        det = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            det.events.extend(raw.get("events", []))
+            det.counts.update(raw.get("counts", {}))
+        return det
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"counts": self.counts, "events": list(self.events)}, f)
+        os.replace(tmp, self.path)
+
+    # ---------- detection ----------
+    def seeded(self, meter: str) -> bool:
+        return meter in self.states
+
+    def seed(self, meter: str, imports):
+        """Warm a meter's state up from its recent cumulative imports, without flagging."""
+        state = self.states.setdefault(meter, MeterState())
+        values = [v for v in imports if v is not None]
+        for prev, cur in zip(values, values[1:]):
+            if state.classify(prev, cur) is None:
+                state.update(cur - prev)
+
+    def check(self, meter: str, time: str, prev: tuple, cur: tuple,
+              record: bool = True) -> tuple[float, float, str | None]:
+        """
+        (import delta, export delta, kind) between two (import, export) readings,
+        repaired if flagged; `kind` is None for normal readings. With `record`
+        False (readings replayed after a restart) the event is not kept again.
+        """
+        dimp, dexp = cur[0] - prev[0], cur[1] - prev[1]
+        state = self.states.setdefault(meter, MeterState())
+        kind = state.classify(prev[0], cur[0])
+        if kind is None:
+            state.update(dimp)
+            if dexp >= 0:
+                return dimp, dexp, None
+            kind, fixed_imp, fixed_exp = NEGATIVE, dimp, 0.0      # export stepped back
+        elif kind == NEGATIVE:
+            fixed_imp, fixed_exp = 0.0, max(dexp, 0.0)
+        else:
+            fixed_imp = state.expected
+            fixed_exp = 0.0 if kind == RESET else max(dexp, 0.0)
+        if record:
+            self._record(meter, time, kind, dimp, fixed_imp, state.expected)
+        return fixed_imp, fixed_exp, kind
+
+    def _record(self, meter: str, time: str, kind: str, raw: float, repaired: float, expected: float):
+        with self._lock:
+            self.counts[kind] += 1
+            self.events.append({
+                "meter": meter, "time": time, "kind": kind,
+                "delta": raw, "repaired": repaired, "expected": expected,
+            })
+
+    # ---------- queries ----------
+    def query(self, meter: str | None = None, kind: str | None = None, since: str | None = None,
+              limit: int = 100) -> list[dict]:
+        """Newest events first; `since` is a "YYYY-MM-DD HH:MM:SS" lower bound."""
+        out = []
+        with self._lock:
+            for event in reversed(self.events):
+                if meter is not None and event["meter"] != meter:
+                    continue
+                if kind is not None and event["kind"] != kind:
+                    continue
+                if since is not None and event["time"] < since:
+                    continue
+                out.append(event)
+                if len(out) >= limit:
+                    break
+        return out
+
+
+def import_deltas(values: list, repair: bool = False) -> list[float]:
+    """
+    Import deltas of one meter's cumulative values (pairs with a missing side
+    are skipped). With `repair`, resets, negative steps and spikes are repaired
+    as in ingestion.
+    """
+    state = MeterState()
+    deltas = []
+    for prev, cur in zip(values, values[1:]):
+        if prev is None or cur is None:
+            continue
+        if not repair:
+            deltas.append(cur - prev)
+            continue
+        kind = state.classify(prev, cur)
+        if kind is None:
+            state.update(cur - prev)
+            deltas.append(cur - prev)
+        else:
+            deltas.append(0.0 if kind == NEGATIVE else state.expected)
+    return deltas
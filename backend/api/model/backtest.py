@@ -0,0 +1,176 @@
+# backtest.py
+# Rolling-origin backtest of the forecaster over history: accuracy and speed.
+# Usage:
+#   python -m model.backtest --kind users --horizon 24 --origins 28 --stride 96 --out backtest.json
+#   python -m model.backtest --kind regions --horizon 168 --origins 8 --stride 672
+#
+# Forecast origins are the last --origins cut points of the panel, --stride
+# steps apart, each leaving a full --horizon of actuals after it. At every origin
+# each series is forecast as forecast_user / forecast_region_series would have
+# done with the data up to that point:
+#
+#   users    checkpoint scalers and the row's user embedding (rows the model was
+#            not trained on: id 0, unscaled, as in hierarchy.forecast_meters)
+#   regions  mean/std of the row up to the origin, embedding id 0
+#
+# Inference is batched: the windows of all origins of a block of series are
+# stacked into one [series x origins, lookback] tensor and rolled out together,
+# --batch windows at a time. Errors are accumulated per horizon step and per
+# series as blocks complete, so memory is bounded by the block, not by U*T.
+#
+# MAE is in the panel's units. MAPE only counts actuals with |y| > MAPE_FLOOR:
+# consumption deltas are often 0, where percentage errors are undefined.
+# Throughput counts forecast windows (and forecast steps) per second of
+# rollout time; data preparation is reported separately.
+
+from __future__ import annotations
+import argparse, json, os, time
+from typing import List
+
+import numpy as np
+
+from model.xlstm_runner import MODEL_PATH, USER_DATA_PATH, LOCAL_DATA_PATH, load_forecaster, rollout
+from model.scheduler import load_panel, series_names
+
+BATCH_SIZE = 4096
+MAPE_FLOOR = 1e-3
+KINDS = ("users", "regions")
+
+# --------------------------- Origins ---------------------------
+def rolling_origins(T: int, lookback: int, horizon: int, origins: int, stride: int) -> np.ndarray:
+    """The last `origins` cut points, `stride` apart, with lookback before and horizon after them."""
+    if stride <= 0 or origins <= 0:
+        raise ValueError("origins and stride must be positive")
+    last = T - horizon
+    cuts = last - stride * np.arange(origins)[::-1]
+    cuts = cuts[cuts >= lookback]
+    if len(cuts) == 0:
+        raise ValueError(f"Series length {T} must be >= lookback + horizon = {lookback + horizon}")
+    return cuts.astype(np.int64)
+
+def _scalers(kind: str, rows: np.ndarray, idxs: np.ndarray, cuts: np.ndarray, ckpt: dict):
+    """(mu, s) of shape [block, origins] used to scale each window."""
+    if kind == "users":
+        num_users = ckpt["hyper"]["num_users"]
+        known = idxs < num_users
+        mu = np.zeros(len(idxs), dtype=np.float64)
+        s = np.ones(len(idxs), dtype=np.float64)
+        mu[known] = np.asarray(ckpt["scalers"]["mean"], dtype=np.float64)[idxs[known]]
+        s[known] = np.asarray(ckpt["scalers"]["std"], dtype=np.float64)[idxs[known]]
+        mu, s = np.repeat(mu[:, None], len(cuts), 1), np.repeat(s[:, None], len(cuts), 1)
+    else:
+        # Mean/std of each row up to each origin, from running sums.
+        csum = np.cumsum(rows, axis=1, dtype=np.float64)[:, cuts - 1]
+        csq = np.cumsum(np.square(rows, dtype=np.float64), axis=1)[:, cuts - 1]
+        mu = csum / cuts
+        s = np.sqrt(np.maximum(csq / cuts - mu * mu, 0.0))
+    return mu, np.where(s > 1e-8, s, 1.0)
+
+# --------------------------- Backtest ---------------------------
+def backtest(ckpt_path: str, data_path: str, kind: str = "users", horizon: int = 24, origins: int = 28,
+             stride: int = 96, batch_size: int = BATCH_SIZE, indices: List[int] | None = None) -> dict:
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    started = time.perf_counter()
+    model, ckpt = load_forecaster(ckpt_path)
+    lookback = ckpt["hyper"]["lookback"]
+    data = load_panel(data_path)
+    U, T = data.shape
+    idxs_all = np.arange(U, dtype=np.int64) if indices is None else np.asarray(indices, dtype=np.int64)
+    cuts = rolling_origins(T, lookback, horizon, origins, stride)
+    O = len(cuts)
+
+    window_cols = cuts[:, None] - lookback + np.arange(lookback)[None, :]     # [O, L]
+    target_cols = cuts[:, None] + np.arange(horizon)[None, :]                 # [O, H]
+    abs_err = np.zeros(horizon)                        # per horizon step, summed over series and origins
+    pct_err = np.zeros(horizon)
+    pct_n = np.zeros(horizon)
+    series_mae = np.zeros(len(idxs_all))
+    series_mape = np.full(len(idxs_all), np.nan)
+    rollout_s = 0.0
+
+    block = max(1, batch_size // O)
+    for b in range(0, len(idxs_all), block):
+        idxs = idxs_all[b:b + block]
+        rows = np.asarray(data[idxs], dtype=np.float32)                       # [B, T]
+        mu, s = _scalers(kind, rows, idxs, cuts, ckpt)
+        windows = (rows[:, window_cols] - mu[:, :, None]) / s[:, :, None]      # [B, O, L]
+        if kind == "users":
+            uids = np.where(idxs < ckpt["hyper"]["num_users"], idxs, 0)
+        else:
+            uids = np.zeros(len(idxs), dtype=np.int64)
+
+        t0 = time.perf_counter()
+        preds = rollout(model, windows.reshape(-1, lookback), np.repeat(uids, O), horizon)
+        rollout_s += time.perf_counter() - t0
+
+        preds = preds.reshape(len(idxs), O, horizon) * s[:, :, None] + mu[:, :, None]
+        actual = rows[:, target_cols]                                          # [B, O, H]
+        err = np.abs(preds - actual)
+        valid = np.abs(actual) > MAPE_FLOOR
+        pct = np.where(valid, err / np.where(valid, np.abs(actual), 1.0), 0.0)
+
+        abs_err += err.sum(axis=(0, 1))
+        pct_err += pct.sum(axis=(0, 1))
+        pct_n += valid.sum(axis=(0, 1))
+        series_mae[b:b + len(idxs)] = err.mean(axis=(1, 2))
+        n_valid = valid.sum(axis=(1, 2))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            series_mape[b:b + len(idxs)] = np.where(n_valid > 0, pct.sum(axis=(1, 2)) / n_valid, np.nan)
+
+    windows_run = len(idxs_all) * O
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mape_h = np.where(pct_n > 0, pct_err / pct_n, np.nan)
+    names = series_names(kind)
+    if names is None or len(names) != U:
+        names = [str(i) for i in range(U)]
+    return {
+        "kind": kind,
+        "horizon": horizon,
+        "lookback": lookback,
+        "origins": [int(c) for c in cuts],
+        "series": len(idxs_all),
+        "mae": float(abs_err.sum() / (windows_run * horizon)),
+        "mape": float(pct_err.sum() / pct_n.sum()) if pct_n.sum() else None,
+        "per_horizon": {
+            "mae": (abs_err / windows_run).tolist(),
+            "mape": [None if np.isnan(v) else float(v) for v in mape_h],
+        },
+        "per_series": {
+            names[i]: {"mae": float(mae), "mape": None if np.isnan(mape) else float(mape)}
+            for i, mae, mape in zip(idxs_all, series_mae, series_mape)
+        },
+        "throughput": {
+            "windows": windows_run,
+            "batch_size": batch_size,
+            "rollout_seconds": round(rollout_s, 3),
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "windows_per_second": round(windows_run / rollout_s, 2) if rollout_s else None,
+            "steps_per_second": round(windows_run * horizon / rollout_s, 2) if rollout_s else None,
+        },
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--kind", choices=KINDS, default="users")
+    ap.add_argument("--data", default=None, help="defaults to processed.json / processed_regions.json")
+    ap.add_argument("--horizon", type=int, default=24)
+    ap.add_argument("--origins", type=int, default=28, help="number of forecast origins")
+    ap.add_argument("--stride", type=int, default=96, help="steps between origins")
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE, help="windows per rollout")
+    ap.add_argument("--out", default=None, help="full JSON report (default: summary on stdout only)")
+    args = ap.parse_args()
+
+    data_path = args.data or (USER_DATA_PATH if args.kind == "users" else LOCAL_DATA_PATH)
+    report = backtest(args.model, data_path, args.kind, args.horizon, args.origins, args.stride, args.batch)
+    if args.out:
+        tmp = args.out + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        os.replace(tmp, args.out)
+    print(json.dumps({k: v for k, v in report.items() if k != "per_series"}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# clusters.py
+# Behavioural segments of the meters: mini-batch k-means over daily load shapes.
+# Usage:
+#   python -m model.clusters --k 8 --days 28 --end-hour 0 --out clusters.json
+#
+# Every row of the [U, T] processed panel (15-minute import deltas, row order
+# from device_ids.json) is folded onto the 24 hours of a day over its last
+# --days days and turned into shares of the day's consumption, so only the
+# shape counts. The panel is read from its memory-mapped .npy twin CHUNK_ROWS
+# rows at a time, so memory is bounded by the [U, 24] shape matrix.
+#
+# The shapes are clustered with mini-batch k-means (k-means++ seeding on a
+# sample, per-centroid learning rates 1 / points seen). Rows without any
+# consumption are not clustered (cluster -1). Each centroid gets a label from
+# its shape:
+#
+#   night-heavy  > NIGHT_SHARE of the day between 22:00 and 06:00
+#   solar        midday (11-15) hours below SOLAR_DIP x the morning/evening ones:
+#                the panel is net import, so rooftop generation shows as a dip
+#   daytime      > DAYTIME_SHARE between 08:00 and 18:00 (commercial hours)
+#   mixed        anything else
+#
+# The panel has no timestamps; its rows end together, and --end-hour is the
+# hour of day at which the last delta ends (0 = midnight). Assignments,
+# centroids and labels are written atomically to clusters.json next to the
+# model data. Cluster forecasts are the sums of the members' meter forecasts
+# (hierarchy.forecast_meters).
+
+from __future__ import annotations
+import argparse, json, os, threading, time
+from typing import Dict, List
+
+import numpy as np
+
+from model.xlstm_runner import MODEL_PATH, USER_DATA_PATH, MODEL_DATA_DIR
+from model.scheduler import DEVICE_IDS_PATH, load_device_ids
+from model.train import panel_npy
+
+CLUSTERS_PATH = os.path.join(MODEL_DATA_DIR, "clusters.json")
+
+STEPS_PER_HOUR = 4
+HOURS = 24
+DEFAULT_K = 8
+DEFAULT_DAYS = 28
+CHUNK_ROWS = 4096
+BATCH_SIZE = 1024
+MAX_ITER = 300
+TOL = 1e-4              # stop when no centroid moved more than this for PATIENCE batches
+PATIENCE = 10
+INIT_SAMPLE = 10_000
+
+NIGHT_HOURS = [22, 23, 0, 1, 2, 3, 4, 5]
+DAYTIME_HOURS = list(range(8, 18))
+MIDDAY_HOURS = [11, 12, 13, 14]
+SHOULDER_HOURS = [7, 8, 9, 17, 18, 19, 20]
+NIGHT_SHARE = 0.45
+DAYTIME_SHARE = 0.55
+SOLAR_DIP = 0.5
+
+# --------------------------- Features ---------------------------
+def daily_shapes(panel: np.ndarray, days: int = DEFAULT_DAYS, end_hour: int = 0,
+                 chunk_rows: int = CHUNK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ([U, 24] hour-of-day shares, [U] mean daily consumption) of the last `days`
+    days of every panel row, read a block of rows at a time. Column h is the hour
+    starting at h:00; all-zero rows keep zero shares.
+    """
+    if not 0 <= end_hour < HOURS:
+        raise ValueError(f"end_hour must be in 0..23, got {end_hour}")
+    U, T = panel.shape
+    steps = min(T, days * HOURS * STEPS_PER_HOUR) // STEPS_PER_HOUR * STEPS_PER_HOUR
+    if steps == 0:
+        raise ValueError(f"the panel needs at least one hour of data, got T={T}")
+    # Hour of day of each kept hour, counted back from the end of the panel.
+    hours = (end_hour - steps // STEPS_PER_HOUR + np.arange(steps // STEPS_PER_HOUR)) % HOURS
+    fold = np.eye(HOURS)[hours]                 # [kept hours, 24] one-hot hour of day
+    shapes = np.zeros((U, HOURS), dtype=np.float32)
+    daily = np.zeros(U, dtype=np.float32)
+    for start in range(0, U, chunk_rows):
+        block = np.clip(np.asarray(panel[start:start + chunk_rows, T - steps:], dtype=np.float64), 0.0, None)
+        hourly = block.reshape(len(block), -1, STEPS_PER_HOUR).sum(axis=2)
+        folded = hourly @ fold
+        total = folded.sum(axis=1)
+        shapes[start:start + len(block)] = folded / np.where(total > 0, total, 1.0)[:, None]
+        daily[start:start + len(block)] = total / (steps / (HOURS * STEPS_PER_HOUR))
+    return shapes, daily
+
+# --------------------------- K-means ---------------------------
+def _sq_distances(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """[len(x), k] squared Euclidean distances."""
+    d = (x * x).sum(axis=1)[:, None] - 2.0 * x @ centroids.T + (centroids * centroids).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0)
+
+def kmeans_pp(x: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding: each next centroid drawn with probability ~ squared distance."""
+    centroids = [x[rng.integers(len(x))]]
+    closest = _sq_distances(x, centroids[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(len(x), p=closest / total) if total > 0 else rng.integers(len(x))
+        centroids.append(x[pick])
+        closest = np.minimum(closest, _sq_distances(x, x[pick][None, :])[:, 0])
+    return np.array(centroids, dtype=np.float64)
+
+def assign(x: np.ndarray, centroids: np.ndarray, chunk_rows: int = CHUNK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """(nearest centroid [N], squared distance to it [N]), a block of rows at a time."""
+    labels = np.empty(len(x), dtype=np.int64)
+    dist = np.empty(len(x), dtype=np.float64)
+    for start in range(0, len(x), chunk_rows):
+        d = _sq_distances(np.asarray(x[start:start + chunk_rows], dtype=np.float64), centroids)
+        labels[start:start + len(d)] = d.argmin(axis=1)
+        dist[start:start + len(d)] = d[np.arange(len(d)), labels[start:start + len(d)]]
+    return labels, dist
+
+def minibatch_kmeans(x: np.ndarray, k: int, batch_size: int = BATCH_SIZE, max_iter: int = MAX_ITER,
+                     seed: int = 0) -> tuple[np.ndarray, int]:
+    """(centroids [k, D], batches run) of mini-batch k-means over the rows of x."""
+    if len(x) < k:
+        raise ValueError(f"need at least k={k} rows with consumption, got {len(x)}")
+    rng = np.random.default_rng(seed)
+    sample = x[rng.choice(len(x), min(len(x), INIT_SAMPLE), replace=False)].astype(np.float64)
+    centroids = kmeans_pp(sample, k, rng)
+    seen = np.zeros(k)
+    calm = 0
+    for it in range(1, max_iter + 1):
+        batch = x[rng.integers(0, len(x), min(batch_size, len(x)))].astype(np.float64)
+        labels = _sq_distances(batch, centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k).astype(np.float64)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, batch)
+        # Same result as moving each centroid towards its points one by one with rate 1 / seen.
+        seen += counts
+        hit = counts > 0
+        moved = (sums[hit] - counts[hit, None] * centroids[hit]) / seen[hit, None]
+        centroids[hit] += moved
+        calm = calm + 1 if (not hit.any() or np.abs(moved).max() < TOL) else 0
+        if calm >= PATIENCE:
+            break
+    return centroids, it
+
+# --------------------------- Labels ---------------------------
+def label_shape(shape: np.ndarray) -> str:
+    shares = shape / max(float(shape.sum()), 1e-12)
+    if shares[NIGHT_HOURS].sum() > NIGHT_SHARE:
+        return "night-heavy"
+    if shares[MIDDAY_HOURS].mean() < SOLAR_DIP * shares[SHOULDER_HOURS].mean():
+        return "solar"
+    if shares[DAYTIME_HOURS].sum() > DAYTIME_SHARE:
+        return "daytime"
+    return "mixed"
+
+# --------------------------- Batch job ---------------------------
+def build_clusters(k: int = DEFAULT_K, days: int = DEFAULT_DAYS, end_hour: int = 0,
+                   data_path: str = USER_DATA_PATH, device_ids_path: str = DEVICE_IDS_PATH,
+                   batch_size: int = BATCH_SIZE, seed: int = 0) -> dict:
+    started = time.perf_counter()
+    panel = np.load(panel_npy(data_path), mmap_mode="r")
+    device_ids = load_device_ids(device_ids_path)
+    if len(device_ids) != panel.shape[0]:
+        raise ValueError(f"{device_ids_path} has {len(device_ids)} ids for {panel.shape[0]} panel rows")
+
+    shapes, daily = daily_shapes(panel, days, end_hour)
+    active = np.flatnonzero(shapes.any(axis=1))
+    centroids, batches = minibatch_kmeans(shapes[active], k, batch_size, seed=seed)
+    labels = np.full(len(device_ids), -1, dtype=np.int64)
+    labels[active], dist = assign(shapes[active], centroids)
+
+    clusters = []
+    for c in range(k):
+        members = labels == c
+        clusters.append({
+            "cluster": c,
+            "label": label_shape(centroids[c]),
+            "size": int(members.sum()),
+            "mean_daily": float(daily[members].mean()) if members.any() else 0.0,
+            "centroid": centroids[c].round(6).tolist(),
+        })
+    return {
+        "k": k,
+        "days": days,
+        "end_hour": end_hour,
+        "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "batches": batches,
+        "inertia": float(dist.sum()),
+        "inactive": int(len(device_ids) - len(active)),
+        "took_s": round(time.perf_counter() - started, 3),
+        "clusters": clusters,
+        "assignments": {m: int(c) for m, c in zip(device_ids, labels)},
+    }
+
+def save_clusters(result: dict, path: str = CLUSTERS_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp, path)
+
+# --------------------------- Serving ---------------------------
+class MeterClusters:
+    """clusters.json for the API, re-read whenever the batch job rewrites it."""
+
+    def __init__(self, path: str = CLUSTERS_PATH, ckpt_path: str = MODEL_PATH,
+                 data_path: str = USER_DATA_PATH, device_ids_path: str = DEVICE_IDS_PATH):
+        self.path = path
+        self.ckpt_path = ckpt_path
+        self.data_path = data_path
+        self.device_ids_path = device_ids_path
+        self._mtime = None
+        self._result: dict = {}
+        self._lock = threading.Lock()
+
+    def result(self) -> dict:
+        with self._lock:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"{self.path} not found; run python -m model.clusters")
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._result = json.load(f)
+                self._mtime = mtime
+            return self._result
+
+    def summary(self) -> dict:
+        return {key: value for key, value in self.result().items() if key != "assignments"}
+
+    def cluster(self, c: int) -> dict:
+        clusters = self.result()["clusters"]
+        if not 0 <= c < len(clusters):
+            raise KeyError(c)
+        return clusters[c]
+
+    def meter(self, meter_id: str) -> dict:
+        c = self.result()["assignments"].get(str(meter_id))
+        if c is None:
+            raise KeyError(meter_id)
+        if c < 0:
+            return {"meter": str(meter_id), "cluster": -1, "label": "inactive"}
+        info = self.cluster(c)
+        return {"meter": str(meter_id), "cluster": c, "label": info["label"],
+                "size": info["size"], "centroid": info["centroid"]}
+
+    def forecast(self, n: int) -> Dict[int, List[float]]:
+        """n-step forecast of every cluster: the sum of its members' meter forecasts."""
+        from model.hierarchy import forecast_meters
+
+        result = self.result()
+        meter_fc = forecast_meters(self.ckpt_path, self.data_path, n)
+        device_ids = load_device_ids(self.device_ids_path)
+        if len(device_ids) != meter_fc.shape[0]:
+            raise ValueError(f"{self.device_ids_path} has {len(device_ids)} ids for {meter_fc.shape[0]} panel rows")
+        labels = np.array([result["assignments"].get(m, -1) for m in device_ids], dtype=np.int64)
+        k = len(result["clusters"])
+        sums = np.zeros((k, n), dtype=np.float64)
+        np.add.at(sums, labels[labels >= 0], meter_fc[labels >= 0])
+        return {c: sums[c].tolist() for c in range(k)}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=USER_DATA_PATH)
+    ap.add_argument("--device-ids", default=DEVICE_IDS_PATH)
+    ap.add_argument("--out", default=CLUSTERS_PATH)
+    ap.add_argument("--k", type=int, default=DEFAULT_K)
+    ap.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    ap.add_argument("--end-hour", type=int, default=0, help="hour of day at which the panel's last delta ends")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    result = build_clusters(args.k, args.days, args.end_hour, args.data, args.device_ids, args.batch_size, args.seed)
+    save_clusters(result, args.out)
+    print(json.dumps({key: value for key, value in result.items() if key not in ("assignments",)}, indent=2))
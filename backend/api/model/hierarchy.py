@@ -0,0 +1,163 @@
+# hierarchy.py
+# Hierarchical region forecasts built from meter forecasts.
+# Usage:
+#   python -m model.hierarchy --n 24 --reconcile ols
+#
+# Every meter row of processed.json is forecast in one batched pass, the
+# forecasts are summed per region through meter_to_location.json (row order
+# from device_ids.json) and the regions are summed into "moldova", so the three
+# levels always add up. Optionally the bottom-up region sums are reconciled
+# with the direct region forecasts of processed_regions.json:
+#
+#   bottom_up     regions = sum of their meters (direct forecasts unused)
+#   ols           OLS reconciliation of meters + direct region forecast; per region
+#                 every meter moves by (direct - bottom_up) / (n_meters + 1)
+#   proportional  meters are rescaled so each region matches its direct forecast
+#
+# Regions without any meter in the panel fall back to their direct forecast
+# (with bottom_up, only those regions are forecast directly).
+
+from __future__ import annotations
+import argparse, json, os
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+from model.xlstm_runner import (
+    MODEL_PATH, USER_DATA_PATH, LOCAL_DATA_PATH, MODEL_DATA_DIR,
+    load_array2d, load_forecaster, user_windows, series_windows, rollout,
+)
+from model.scheduler import DEVICE_IDS_PATH, REGIONS_INDEX_PATH, load_device_ids, load_regions
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(MODEL_DATA_DIR))
+METER_MAP_PATH = os.path.join(BACKEND_DIR, "data", "daniel_data", "meter_to_location.json")
+
+NATIONAL = "moldova"
+RECONCILE_METHODS = ("bottom_up", "ols", "proportional")
+BATCH_SIZE = 1024
+
+# --------------------------- IO ---------------------------
+def load_meter_map(path: str = METER_MAP_PATH) -> Dict[str, list]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def region_groups(device_ids: List[str], meter_map: Dict[str, list], regions: List[str]) -> np.ndarray:
+    """Region index of every panel row (-1 when the meter is not in the map)."""
+    region_of = {}
+    for r, name in enumerate(regions):
+        for m in meter_map.get(name, []):
+            region_of[str(m)] = r
+    return np.array([region_of.get(m, -1) for m in device_ids], dtype=np.int64)
+
+# --------------------------- Forecast ---------------------------
+def forecast_meters(ckpt_path: str, data_path: str, n: int, batch_size: int = BATCH_SIZE) -> np.ndarray:
+    """n-step forecasts for every row of the meter panel -> [U, n]."""
+    return _forecast_meters(ckpt_path, data_path, os.path.getmtime(data_path), n, batch_size).copy()
+
+@lru_cache(maxsize=4)
+def _forecast_meters(ckpt_path: str, data_path: str, mtime: float, n: int, batch_size: int) -> np.ndarray:
+    model, ckpt = load_forecaster(ckpt_path)
+    lookback, num_users = ckpt["hyper"]["lookback"], ckpt["hyper"]["num_users"]
+    data = load_array2d(data_path)
+    U, T = data.shape
+    if T <= lookback:
+        raise ValueError(f"Series length {T} must be > lookback={lookback}")
+    means = np.zeros(U, dtype=np.float32)
+    stds = np.ones(U, dtype=np.float32)
+    k = min(U, num_users)
+    means[:k] = np.asarray(ckpt["scalers"]["mean"], dtype=np.float32)[:k]
+    stds[:k] = np.asarray(ckpt["scalers"]["std"], dtype=np.float32)[:k]
+
+    out = np.empty((U, n), dtype=np.float32)
+    for start in range(0, U, batch_size):
+        idxs = np.arange(start, min(start + batch_size, U))
+        windows, mu, s = user_windows(data, idxs, means, stds, lookback)
+        # Rows the model was not trained on get the fixed id 0, as regions do.
+        uids = np.where(idxs < num_users, idxs, 0)
+        out[idxs] = rollout(model, windows, uids, n) * s[:, None] + mu[:, None]
+    return out
+
+def forecast_regions_direct(ckpt_path: str, data_path: str, n: int, rows=None) -> np.ndarray:
+    """forecast_region_series for the region rows (default: all) at once -> [len(rows), n]."""
+    model, ckpt = load_forecaster(ckpt_path)
+    data = load_array2d(data_path)
+    idxs = np.arange(data.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+    windows, mu, s = series_windows(data, idxs, ckpt["hyper"]["lookback"])
+    return rollout(model, windows, [0] * len(idxs), n) * s[:, None] + mu[:, None]
+
+# --------------------------- Reconciliation ---------------------------
+def reconcile(meter_fc: np.ndarray, groups: np.ndarray, num_regions: int,
+              direct: np.ndarray | None = None, method: str = "bottom_up"):
+    """
+    Coherent (meters [U, n], regions [R, n]) from meter forecasts, their region
+    index per row and, for ols/proportional, the direct region forecasts [R, n].
+    Unmapped rows (group -1) are returned unchanged and left out of the regions.
+    """
+    if method not in RECONCILE_METHODS:
+        raise ValueError(f"reconcile must be one of {RECONCILE_METHODS}, got {method!r}")
+    if method != "bottom_up" and direct is None:
+        raise ValueError(f"reconcile={method!r} needs the direct region forecasts")
+
+    mapped = groups >= 0
+    meters = meter_fc.astype(np.float64, copy=True)
+    counts = np.bincount(groups[mapped], minlength=num_regions)
+    regions = np.zeros((num_regions, meter_fc.shape[1]), dtype=np.float64)
+    np.add.at(regions, groups[mapped], meters[mapped])
+
+    if method == "ols":
+        adjust = (direct - regions) / (counts + 1)[:, None]
+        meters[mapped] += adjust[groups[mapped]]
+        regions += counts[:, None] * adjust
+    elif method == "proportional":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(regions != 0, direct / regions, 1.0)
+        meters[mapped] *= ratio[groups[mapped]]
+        regions = np.where(regions != 0, direct, regions)
+
+    if direct is not None:
+        empty = counts == 0
+        regions[empty] = direct[empty]
+    return meters, regions
+
+def forecast_hierarchy(n: int, reconcile_method: str = "bottom_up", ckpt_path: str = MODEL_PATH,
+                       meter_data_path: str = USER_DATA_PATH, region_data_path: str = LOCAL_DATA_PATH,
+                       device_ids_path: str = DEVICE_IDS_PATH, regions_path: str = REGIONS_INDEX_PATH,
+                       meter_map_path: str = METER_MAP_PATH) -> dict:
+    """Region and national forecasts from one batched meter-level pass."""
+    if reconcile_method not in RECONCILE_METHODS:
+        raise ValueError(f"reconcile must be one of {RECONCILE_METHODS}, got {reconcile_method!r}")
+    regions = load_regions(regions_path)
+    device_ids = load_device_ids(device_ids_path)
+    meter_fc = forecast_meters(ckpt_path, meter_data_path, n)
+    if len(device_ids) != meter_fc.shape[0]:
+        raise ValueError(f"{device_ids_path} has {len(device_ids)} ids for {meter_fc.shape[0]} panel rows")
+    groups = region_groups(device_ids, load_meter_map(meter_map_path), regions)
+
+    direct = None
+    if reconcile_method != "bottom_up":
+        direct = forecast_regions_direct(ckpt_path, region_data_path, n)
+    elif os.path.exists(region_data_path):
+        # bottom_up only needs the direct forecasts of the regions without meters
+        empty = np.flatnonzero(np.bincount(groups[groups >= 0], minlength=len(regions)) == 0)
+        if len(empty):
+            direct = np.zeros((len(regions), n))
+            direct[empty] = forecast_regions_direct(ckpt_path, region_data_path, n, empty)
+    _, region_fc = reconcile(meter_fc, groups, len(regions), direct, reconcile_method)
+
+    return {
+        "reconcile": reconcile_method,
+        "horizon": n,
+        "regions": {name: region_fc[r].tolist() for r, name in enumerate(regions)},
+        NATIONAL: region_fc.sum(axis=0).tolist(),
+        "meters": int((groups >= 0).sum()),
+        "unmapped_meters": int((groups < 0).sum()),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=24)
+    ap.add_argument("--reconcile", choices=RECONCILE_METHODS, default="bottom_up")
+    args = ap.parse_args()
+    print(json.dumps(forecast_hierarchy(args.n, args.reconcile), indent=2))
@@ -0,0 +1,158 @@
+# scheduler.py
+# Whole-network forecasting: every region in processed_regions.json or every
+# meter in processed.json, sharded across a process pool.
+# Usage:
+#   python -m model.scheduler --kind users --horizon 24 --workers 4 --threads 1 --out forecasts.jsonl
+#
+# Each worker loads the checkpoint and the [U, T] panel once (initializer), is
+# pinned to --threads torch threads, and forecasts its shards with one batched
+# rollout per shard. Results are streamed back as shards complete.
+
+from __future__ import annotations
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from model.xlstm_runner import (
+    MODEL_PATH, USER_DATA_PATH, LOCAL_DATA_PATH, MODEL_DATA_DIR,
+    load_array2d, load_forecaster, user_windows, series_windows, rollout,
+)
+
+REGIONS_INDEX_PATH = os.path.join(MODEL_DATA_DIR, "regions_index.json")
+DEVICE_IDS_PATH = os.path.join(MODEL_DATA_DIR, "device_ids.json")
+
+# --------------------------- Worker side ---------------------------
+_worker = {}
+
+def _init_worker(ckpt_path: str, data_path: str, kind: str, threads: int):
+    import torch
+    torch.set_num_threads(threads)
+    model, ckpt = load_forecaster(ckpt_path, "cpu")
+    _worker.update(
+        model=model,
+        ckpt=ckpt,
+        kind=kind,
+        data=load_panel(data_path),
+    )
+
+def _forecast_shard(idxs: List[int], horizon: int) -> Tuple[List[int], np.ndarray]:
+    model, ckpt, data = _worker["model"], _worker["ckpt"], _worker["data"]
+    lookback = ckpt["hyper"]["lookback"]
+    if _worker["kind"] == "users":
+        windows, mu, s = user_windows(data, idxs, ckpt["scalers"]["mean"], ckpt["scalers"]["std"], lookback)
+        uids = idxs
+    else:
+        windows, mu, s = series_windows(data, idxs, lookback)
+        uids = [0] * len(idxs)     # same fixed embedding as forecast_region_series
+    preds = rollout(model, windows, uids, horizon) * s[:, None] + mu[:, None]
+    return idxs, preds
+
+# --------------------------- Driver side ---------------------------
+def load_panel(path: str) -> np.ndarray:
+    """[U, T] panel; .npy files are memory-mapped instead of parsed."""
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return load_array2d(path)
+
+class ForecastRun:
+    """Iterate (index, forecast) pairs as shards complete; throughput is filled in as it goes."""
+
+    def __init__(self, ckpt_path: str, data_path: str, kind: str = "users", horizon: int = 24,
+                 workers: int | None = None, threads: int = 1, shard_size: int = 256,
+                 indices: List[int] | None = None):
+        if kind not in ("users", "regions"):
+            raise ValueError(f"kind must be 'users' or 'regions', got {kind!r}")
+        self.ckpt_path, self.data_path, self.kind = ckpt_path, data_path, kind
+        self.horizon, self.threads, self.shard_size = horizon, threads, shard_size
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads)
+        if indices is None:
+            indices = range(load_panel(data_path).shape[0])
+        self.indices = list(indices)
+        self.series = 0
+        self.seconds = 0.0
+
+    @property
+    def series_per_second(self) -> float:
+        return self.series / self.seconds if self.seconds else 0.0
+
+    def __iter__(self) -> Iterator[Tuple[int, List[float]]]:
+        shards = [self.indices[i:i + self.shard_size] for i in range(0, len(self.indices), self.shard_size)]
+        started = time.perf_counter()
+        # spawn: workers must not inherit torch's thread pools from the parent.
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.ckpt_path, self.data_path, self.kind, self.threads),
+        ) as pool:
+            futures = [pool.submit(_forecast_shard, shard, self.horizon) for shard in shards]
+            for fut in as_completed(futures):
+                idxs, preds = fut.result()
+                for idx, row in zip(idxs, preds):
+                    yield idx, row.tolist()
+                self.series += len(idxs)
+                self.seconds = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "series": self.series,
+            "horizon": self.horizon,
+            "workers": self.workers,
+            "threads_per_worker": self.threads,
+            "seconds": round(self.seconds, 3),
+            "series_per_second": round(self.series_per_second, 2),
+        }
+
+def _load_json(path: str):
+    with open(path, "rb") as f:
+        return json.loads(f.read())   # bytes: lets json detect the UTF-16 device_ids.json
+
+def load_device_ids(path: str = DEVICE_IDS_PATH) -> List[str]:
+    """Meter id of every row of processed.json."""
+    return [str(m) for m in _load_json(path)]
+
+def load_regions(path: str = REGIONS_INDEX_PATH) -> List[str]:
+    """Region name of every row of processed_regions.json."""
+    return _load_json(path)["regions"]
+
+def series_names(kind: str) -> List[str] | None:
+    """Row names: region names from regions_index.json, meter ids from device_ids.json."""
+    path = REGIONS_INDEX_PATH if kind == "regions" else DEVICE_IDS_PATH
+    if not os.path.exists(path):
+        return None
+    return load_regions(path) if kind == "regions" else load_device_ids(path)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--kind", choices=["users", "regions"], default="regions")
+    ap.add_argument("--data", default=None, help="defaults to processed.json / processed_regions.json")
+    ap.add_argument("--horizon", type=int, default=24)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    ap.add_argument("--shard", type=int, default=256, help="series per shard")
+    ap.add_argument("--out", default=None, help="JSON lines output (default: stdout)")
+    args = ap.parse_args()
+
+    data_path = args.data or (USER_DATA_PATH if args.kind == "users" else LOCAL_DATA_PATH)
+    run = ForecastRun(args.model, data_path, args.kind, args.horizon, args.workers, args.threads, args.shard)
+    names = series_names(args.kind)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for idx, forecast in run:
+            rec = {"index": idx, "forecast": forecast}
+            if names is not None and idx < len(names):
+                rec["id"] = names[idx]
+            out.write(json.dumps(rec) + "\n")
+    finally:
+        if args.out:
+            out.close()
+    print(json.dumps(run.stats()), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
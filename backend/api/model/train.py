@@ -0,0 +1,217 @@
+# train.py
+# Train (or retrain) the global forecaster from the [U, T] delta panel.
+# Usage:
+#   python -m model.train --data processed.json --out candidate.pt --epochs 5 --workers 4
+#   python -m model.train --data processed.json --out candidate.pt --epochs 10 --resume
+#
+# The panel is converted once to .npy and memory-mapped; training windows are
+# strided views into it (sliding_window_view), built per item inside the
+# DataLoader workers, so memory stays bounded by the batch, not by U*T*lookback.
+# After every epoch the checkpoint load_forecaster reads ({state_dict, hyper,
+# scalers, meta}) is written to --out, and the optimizer/epoch state to
+# <out>.resume for --resume.
+#
+# --out is required and may not be the served checkpoint (MODEL_PATH): an epoch
+# in progress must never replace it. Promote a finished run explicitly, by
+# copying it over model_data/model.pt or pointing FORECAST_MODEL at it.
+
+from __future__ import annotations
+import argparse, json, os, time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset, RandomSampler
+
+from model.xlstm_runner import (
+    ARCHS, MODEL_PATH, USER_DATA_PATH, build_model, default_device, load_array2d, make_checkpoint, train_epoch,
+)
+
+DEFAULT_HYPER = {
+    "arch": "lstm",
+    "input_size": 1,
+    "hidden_size": 64,
+    "num_layers": 2,
+    "id_embed_dim": 8,
+    "dropout": 0.1,
+    "lookback": 64,
+    "horizon": 1,
+}
+SCALER_CHUNK_ROWS = 1024
+
+# --------------------------- Panel ---------------------------
+def panel_npy(path: str) -> str:
+    """Path of the .npy twin of a JSON panel, (re)written when the JSON is newer."""
+    if path.endswith(".npy"):
+        return path
+    npy = os.path.splitext(path)[0] + ".npy"
+    if not os.path.exists(npy) or os.path.getmtime(npy) < os.path.getmtime(path):
+        tmp = npy + ".tmp.npy"
+        np.save(tmp, load_array2d(path))
+        os.replace(tmp, npy)
+    return npy
+
+def panel_scalers(panel: np.ndarray, chunk_rows: int = SCALER_CHUNK_ROWS):
+    """Per-row mean/std, read from the memmap a block of rows at a time."""
+    U = panel.shape[0]
+    mean = np.empty(U, dtype=np.float32)
+    std = np.empty(U, dtype=np.float32)
+    for start in range(0, U, chunk_rows):
+        block = np.asarray(panel[start:start + chunk_rows], dtype=np.float64)
+        mean[start:start + len(block)] = block.mean(axis=1)
+        std[start:start + len(block)] = block.std(axis=1)
+    return mean, np.where(std > 1e-8, std, 1.0).astype(np.float32)
+
+# --------------------------- Dataset ---------------------------
+class WindowDataset(Dataset):
+    """
+    (window [L], uid, target [H]) items of a memory-mapped panel; item i is row
+    i // W, window i % W (every `stride` steps). The memmap is opened lazily so
+    each DataLoader worker maps the file itself instead of pickling the array.
+    """
+
+    def __init__(self, npy_path: str, means, stds, lookback: int, horizon: int, stride: int = 1):
+        self.npy_path = npy_path
+        self.means = np.asarray(means, dtype=np.float32)
+        self.stds = np.asarray(stds, dtype=np.float32)
+        self.lookback, self.horizon, self.stride = lookback, horizon, stride
+        U, T = np.load(npy_path, mmap_mode="r").shape
+        if T < lookback + horizon:
+            raise ValueError(f"Series length {T} must be >= lookback+horizon={lookback + horizon}")
+        self.rows = U
+        self.per_row = (T - lookback - horizon) // stride + 1
+        self._windows = None
+
+    def __len__(self):
+        return self.rows * self.per_row
+
+    def _views(self):
+        if self._windows is None:
+            from numpy.lib.stride_tricks import sliding_window_view
+            panel = np.load(self.npy_path, mmap_mode="r")
+            self._windows = sliding_window_view(panel, self.lookback + self.horizon, axis=1)
+        return self._windows
+
+    def __getitem__(self, i):
+        u, w = divmod(int(i), self.per_row)
+        window = (self._views()[u, w * self.stride] - self.means[u]) / self.stds[u]
+        return (
+            torch.from_numpy(window[:self.lookback].astype(np.float32)),
+            u,
+            torch.from_numpy(window[self.lookback:].astype(np.float32)),
+        )
+
+    def __getstate__(self):
+        # Workers re-open the memmap; never pickle the mapped views.
+        return {**self.__dict__, "_windows": None}
+
+# --------------------------- Checkpoints ---------------------------
+def resume_path(out: str) -> str:
+    return out + ".resume"
+
+def save_atomic(obj, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    torch.save(obj, tmp)
+    os.replace(tmp, path)
+
+def init_weights(model, ckpt_path: str) -> int:
+    """Copy every tensor of ckpt_path whose name and shape match; returns how many were copied."""
+    state = torch.load(ckpt_path, map_location="cpu")["state_dict"]
+    own = model.state_dict()
+    matched = {k: v for k, v in state.items() if k in own and own[k].shape == v.shape}
+    own.update(matched)
+    model.load_state_dict(own)
+    return len(matched)
+
+# --------------------------- Training ---------------------------
+def fit(data_path: str, out: str, hyper: dict | None = None, epochs: int = 5, batch_size: int = 256,
+        lr: float = 1e-3, stride: int = 1, workers: int = 2, threads: int | None = None,
+        windows_per_epoch: int | None = None, resume: bool = False, init: str | None = None,
+        seed: int = 0, device=None, log=print) -> dict:
+    """Train on the panel at data_path and write the checkpoint to `out` after every epoch."""
+    if threads:
+        torch.set_num_threads(threads)
+    torch.manual_seed(seed)
+    device = torch.device(device) if device else default_device()
+
+    npy = panel_npy(data_path)
+    panel = np.load(npy, mmap_mode="r")
+    state = torch.load(resume_path(out), map_location="cpu") if resume and os.path.exists(resume_path(out)) else None
+
+    if state is not None:
+        hyper = state["hyper"]
+        means, stds = np.asarray(state["scalers"]["mean"]), np.asarray(state["scalers"]["std"])
+    else:
+        hyper = {**DEFAULT_HYPER, **(hyper or {}), "num_users": panel.shape[0]}
+        means, stds = panel_scalers(panel)
+    if hyper["num_users"] != panel.shape[0]:
+        raise ValueError(f"Resume state was trained on {hyper['num_users']} users, panel has {panel.shape[0]}")
+
+    model = build_model(hyper).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    start_epoch = 0
+    if state is not None:
+        model.load_state_dict(state["state_dict"])
+        optimizer.load_state_dict(state["optimizer"])
+        start_epoch = state["epoch"]
+        log(f"resumed {out} at epoch {start_epoch}")
+    elif init:
+        log(f"initialized {init_weights(model, init)} tensors from {init}")
+
+    dataset = WindowDataset(npy, means, stds, hyper["lookback"], hyper["horizon"], stride)
+    generator = torch.Generator().manual_seed(seed + start_epoch)
+    sampler = RandomSampler(dataset, num_samples=min(windows_per_epoch or len(dataset), len(dataset)),
+                            generator=generator)
+    loader = DataLoader(dataset, batch_size=batch_size, sampler=sampler, num_workers=workers,
+                        persistent_workers=workers > 0, pin_memory=device.type == "cuda")
+    log(f"{len(dataset)} windows ({dataset.rows} series x {dataset.per_row}), "
+        f"{len(sampler)} per epoch, horizon={hyper['horizon']}")
+
+    history = []
+    for epoch in range(start_epoch, epochs):
+        started = time.perf_counter()
+        loss = train_epoch(model, loader, optimizer, device)
+        seconds = time.perf_counter() - started
+        history.append({"epoch": epoch + 1, "loss": loss, "seconds": round(seconds, 2)})
+        log(f"epoch {epoch + 1}/{epochs} loss={loss:.5f} {len(sampler) / seconds:.0f} windows/s")
+
+        ckpt = make_checkpoint(model, hyper, means, stds, device_trained=device.type,
+                               epochs=epoch + 1, loss=loss, data=os.path.basename(data_path))
+        save_atomic(ckpt, out)
+        save_atomic({**ckpt, "optimizer": optimizer.state_dict(), "epoch": epoch + 1}, resume_path(out))
+    return {"out": out, "hyper": hyper, "history": history}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=USER_DATA_PATH, help="[U, T] panel (.json or .npy)")
+    ap.add_argument("--out", required=True, help="checkpoint to write (not the served model.pt)")
+    ap.add_argument("--epochs", type=int, default=5)
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--lr", type=float, default=1e-3)
+    ap.add_argument("--stride", type=int, default=1, help="steps between windows of a series")
+    ap.add_argument("--windows-per-epoch", type=int, default=None, help="sample this many windows per epoch")
+    ap.add_argument("--workers", type=int, default=2, help="DataLoader workers")
+    ap.add_argument("--threads", type=int, default=None, help="torch threads for the training loop")
+    ap.add_argument("--arch", choices=ARCHS, default=DEFAULT_HYPER["arch"])
+    ap.add_argument("--slstm-at", type=int, nargs="*", default=[], help="xlstm: block indices that are sLSTM")
+    ap.add_argument("--lookback", type=int, default=DEFAULT_HYPER["lookback"])
+    ap.add_argument("--horizon", type=int, default=DEFAULT_HYPER["horizon"])
+    ap.add_argument("--hidden", type=int, default=DEFAULT_HYPER["hidden_size"])
+    ap.add_argument("--layers", type=int, default=DEFAULT_HYPER["num_layers"])
+    ap.add_argument("--resume", action="store_true", help="continue from <out>.resume")
+    ap.add_argument("--init", default=None, help="warm-start from a checkpoint (matching tensors only)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    if os.path.abspath(args.out) == os.path.abspath(MODEL_PATH):
+        ap.error(f"--out must not be the served checkpoint {MODEL_PATH}; promote a finished run by copying it")
+
+    hyper = {"arch": args.arch, "lookback": args.lookback, "horizon": args.horizon,
+             "hidden_size": args.hidden, "num_layers": args.layers}
+    if args.arch == "xlstm":
+        hyper["slstm_at"] = args.slstm_at
+    result = fit(args.data, args.out, hyper, args.epochs, args.batch, args.lr, args.stride, args.workers,
+                 args.threads, args.windows_per_epoch, args.resume, args.init, args.seed)
+    print(json.dumps(result["history"]))
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@
 
 from __future__ import annotations
 import argparse, json
+from functools import lru_cache
 from typing import List
 import numpy as np
 import torch
@@ -25,10 +26,15 @@ def load_array2d(path: str) -> np.ndarray:
 
 # --------------------------- Model ---------------------------
 class GlobalLSTMForecaster(nn.Module):
+    """
+    horizon=1: one-step head, rolled out autoregressively (the shipped model.pt).
+    horizon=H: direct multi-horizon head emitting the next H steps in one forward pass.
+    """
     def __init__(self, num_users: int, input_size: int, hidden_size: int,
-                 num_layers: int, id_embed_dim: int, dropout: float):
+                 num_layers: int, id_embed_dim: int, dropout: float, horizon: int = 1):
         super().__init__()
         self.use_id = id_embed_dim > 0
+        self.horizon = horizon
         self.id_embed = nn.Embedding(num_users, id_embed_dim) if self.use_id else None
         self.lstm = nn.LSTM(
             input_size=input_size + (id_embed_dim if self.use_id else 0),
@@ -37,7 +43,7 @@ class GlobalLSTMForecaster(nn.Module):
             batch_first=True,
             dropout=dropout if num_layers > 1 else 0.0,
         )
-        self.head = nn.Linear(hidden_size, 1)
+        self.head = nn.Linear(hidden_size, horizon)
     def forward(self, x: torch.Tensor, user_ids: torch.Tensor | None = None):
         if self.use_id:
             if user_ids is None:
@@ -47,16 +53,147 @@ class GlobalLSTMForecaster(nn.Module):
             x = torch.cat([x, emb_rep], dim=-1)
         out, _ = self.lstm(x)
         last = out[:, -1, :]
-        return self.head(last)
+        return self.head(last)                                          # [B, horizon]
+
+class XLSTMForecaster(nn.Module):
+    """
+    Same interface as GlobalLSTMForecaster (x [B,L,1], user_ids [B] -> [B, horizon]) on an
+    xLSTM block stack: mLSTM blocks, with sLSTM blocks at the indices in `slstm_at`.
+    Needs the optional `xlstm` package.
+    """
+    def __init__(self, num_users: int, input_size: int, hidden_size: int,
+                 num_layers: int, id_embed_dim: int, dropout: float, horizon: int = 1,
+                 lookback: int = 64, num_heads: int = 4, slstm_at=(), conv1d_kernel_size: int = 4):
+        super().__init__()
+        try:
+            from xlstm import (xLSTMBlockStack, xLSTMBlockStackConfig, mLSTMBlockConfig, mLSTMLayerConfig,
+                               sLSTMBlockConfig, sLSTMLayerConfig, FeedForwardConfig)
+        except ImportError as e:
+            raise ImportError("hyper['arch'] == 'xlstm' needs the xlstm package (pip install xlstm)") from e
+
+        self.use_id = id_embed_dim > 0
+        self.horizon = horizon
+        self.id_embed = nn.Embedding(num_users, id_embed_dim) if self.use_id else None
+        self.proj = nn.Linear(input_size + (id_embed_dim if self.use_id else 0), hidden_size)
+        slstm_at = list(slstm_at)
+        config = xLSTMBlockStackConfig(
+            mlstm_block=mLSTMBlockConfig(mlstm=mLSTMLayerConfig(
+                conv1d_kernel_size=conv1d_kernel_size, qkv_proj_blocksize=num_heads, num_heads=num_heads)),
+            slstm_block=sLSTMBlockConfig(
+                slstm=sLSTMLayerConfig(
+                    backend="cuda" if torch.cuda.is_available() else "vanilla",
+                    num_heads=num_heads, conv1d_kernel_size=conv1d_kernel_size,
+                    bias_init="powerlaw_blockdependent"),
+                feedforward=FeedForwardConfig(proj_factor=1.3, act_fn="gelu"),
+            ) if slstm_at else None,
+            context_length=lookback,
+            num_blocks=num_layers,
+            embedding_dim=hidden_size,
+            dropout=dropout,
+            slstm_at=slstm_at,
+        )
+        self.xlstm = xLSTMBlockStack(config)
+        self.head = nn.Linear(hidden_size, horizon)
+    def forward(self, x: torch.Tensor, user_ids: torch.Tensor | None = None):
+        if self.use_id:
+            if user_ids is None:
+                raise ValueError("user_ids required when id_embed_dim>0")
+            emb = self.id_embed(user_ids)
+            emb_rep = emb.unsqueeze(1).expand(-1, x.size(1), -1)
+            x = torch.cat([x, emb_rep], dim=-1)
+        out = self.xlstm(self.proj(x))
+        return self.head(out[:, -1, :])                                 # [B, horizon]
+
+# --------------------------- Loading ---------------------------
+ARCHS = ("lstm", "xlstm")
+
+def build_model(hyper: dict) -> nn.Module:
+    """Model for a checkpoint's hyper block; hyper["arch"] picks the class (default "lstm")."""
+    arch = hyper.get("arch", "lstm")
+    if arch == "xlstm":
+        return XLSTMForecaster(
+            num_users=hyper["num_users"],
+            input_size=hyper["input_size"],
+            hidden_size=hyper["hidden_size"],
+            num_layers=hyper["num_layers"],
+            id_embed_dim=hyper["id_embed_dim"],
+            dropout=hyper["dropout"],
+            horizon=hyper.get("horizon", 1),
+            lookback=hyper["lookback"],
+            num_heads=hyper.get("num_heads", 4),
+            slstm_at=hyper.get("slstm_at", []),
+            conv1d_kernel_size=hyper.get("conv1d_kernel_size", 4),
+        )
+    if arch != "lstm":
+        raise ValueError(f"Unknown model arch {arch!r}, expected one of {ARCHS}")
+    return GlobalLSTMForecaster(
+        num_users=hyper["num_users"],
+        input_size=hyper["input_size"],
+        hidden_size=hyper["hidden_size"],
+        num_layers=hyper["num_layers"],
+        id_embed_dim=hyper["id_embed_dim"],
+        dropout=hyper["dropout"],
+        horizon=hyper.get("horizon", 1),    # absent in one-step checkpoints
+    )
+
+def default_device() -> torch.device:
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+@lru_cache(maxsize=4)
+def load_forecaster(ckpt_path: str, device: str | None = None):
+    """Load (and cache per process) the model of a checkpoint. Returns (model, ckpt)."""
+    ckpt = torch.load(ckpt_path, map_location="cpu")
+    model = build_model(ckpt["hyper"]).to(device or default_device())
+    model.load_state_dict(ckpt["state_dict"], strict=True)
+    model.eval()
+    return model, ckpt
 
 # --------------------------- Forecast ---------------------------
+def user_windows(data: np.ndarray, idxs, means, stds, lookback: int):
+    """Scaled last-`lookback` windows of user rows with their checkpoint scalers -> (windows [B,L], mu [B], s [B])."""
+    idxs = np.asarray(idxs, dtype=np.int64)
+    mu = np.asarray(means, dtype=np.float32)[idxs]
+    s = np.asarray(stds, dtype=np.float32)[idxs]
+    s = np.where(s > 1e-8, s, 1.0).astype(np.float32)
+    windows = (data[idxs, -lookback:] - mu[:, None]) / s[:, None]
+    return windows.astype(np.float32), mu, s
+
+def series_windows(data: np.ndarray, idxs, lookback: int):
+    """Scaled last-`lookback` windows of rows using each row's own mean/std -> (windows [B,L], mu [B], s [B])."""
+    idxs = np.asarray(idxs, dtype=np.int64)
+    rows = data[idxs]
+    mu = rows.mean(axis=1).astype(np.float32)
+    s = rows.std(axis=1).astype(np.float32)
+    s = np.where(s > 1e-8, s, 1.0).astype(np.float32)
+    windows = (rows[:, -lookback:] - mu[:, None]) / s[:, None]
+    return windows.astype(np.float32), mu, s
+
+@torch.no_grad()
+def rollout(model: nn.Module, windows: np.ndarray, uids, n: int, device=None) -> np.ndarray:
+    """
+    n-step forecast for a batch of scaled windows [B, L]. Returns scaled predictions [B, n].
+    Each forward pass covers model.horizon steps for the whole batch: n passes for the
+    one-step model, one pass for a direct head with horizon >= n (longer n chains blocks).
+    """
+    device = device or next(model.parameters()).device
+    window_t = torch.from_numpy(np.ascontiguousarray(windows, dtype=np.float32)).unsqueeze(-1).to(device)  # [B,L,1]
+    lookback = window_t.size(1)
+    uid_t = torch.as_tensor(np.asarray(uids), dtype=torch.long, device=device)
+    preds = torch.empty((window_t.size(0), n), dtype=torch.float32, device=device)
+    i = 0
+    while i < n:
+        yhat = model(window_t, uid_t)                                   # [B,H]
+        k = min(yhat.size(1), n - i)
+        preds[:, i:i + k] = yhat[:, :k]
+        i += k
+        window_t = torch.cat([window_t, yhat.unsqueeze(-1)], dim=1)[:, -lookback:, :]
+    return preds.cpu().numpy()
+
 @torch.no_grad()
 def forecast_user(ckpt_path: str, data_path: str, user_idx: int, n: int) -> List[float]:
     # Load checkpoint & data
-    ckpt = torch.load(ckpt_path, map_location="cpu")
+    model, ckpt = load_forecaster(ckpt_path)
     hyper = ckpt["hyper"]
-    means = ckpt["scalers"]["mean"]
-    stds  = ckpt["scalers"]["std"]
     lookback = hyper["lookback"]
     U_saved = hyper["num_users"]
 
@@ -68,95 +205,117 @@ def forecast_user(ckpt_path: str, data_path: str, user_idx: int, n: int) -> List
         # Not fatal, but warn: embeddings depend on num_users used during training.
         print(f"[warn] Data users={U} differs from training users={U_saved}. "
               f"User embeddings index must still be valid.")
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = GlobalLSTMForecaster(
-        num_users=U_saved,
-        input_size=hyper["input_size"],
-        hidden_size=hyper["hidden_size"],
-        num_layers=hyper["num_layers"],
-        id_embed_dim=hyper["id_embed_dim"],
-        dropout=hyper["dropout"],
-    ).to(device)
-    model.load_state_dict(ckpt["state_dict"], strict=True)
-    model.eval()
-
-    # Per-user scaler
-    mu = float(means[user_idx])
-    sd = float(stds[user_idx])
-    s = sd if sd > 1e-8 else 1.0
-
-    series = data[user_idx]                    # [T]
     if T <= lookback:
         raise ValueError(f"Series length {T} must be > lookback={lookback}")
-    window = ((series[-lookback:] - mu) / s).astype(np.float32)     # [L]
-    window_t = torch.from_numpy(window).unsqueeze(0).unsqueeze(-1).to(device)  # [1,L,1]
-    uid_t = torch.tensor([user_idx], dtype=torch.long, device=device)
-
-    preds_scaled = []
-    for _ in range(n):
-        yhat = model(window_t, uid_t).item()   # scalar (scaled)
-        preds_scaled.append(yhat)
-        next_step = torch.tensor([[[yhat]]], dtype=torch.float32, device=device)
-        window_t = torch.cat([window_t[:, 1:, :], next_step], dim=1)
-
-    preds = (np.array(preds_scaled, dtype=np.float32) * s + mu).tolist()
+
+    # Per-user scaler
+    window, mu, s = user_windows(data, [user_idx], ckpt["scalers"]["mean"], ckpt["scalers"]["std"], lookback)
+    preds_scaled = rollout(model, window, [user_idx], n)
+    preds = (preds_scaled[0] * s[0] + mu[0]).tolist()
     return preds
 
 @torch.no_grad()
 def forecast_region_series(ckpt_path: str, data_path: str, region_idx: int, n: int) -> List[float]:
     """Forecast n steps for a single region series using its own mean/std,
     while feeding a constant embedding id=0 just to satisfy the model."""
-    ckpt = torch.load(ckpt_path, map_location="cpu")
-    hyper = ckpt["hyper"]
-    lookback = hyper["lookback"]
-    U_saved  = hyper["num_users"]  # users _in training_, needed for embedding size
+    model, ckpt = load_forecaster(ckpt_path)
+    lookback = ckpt["hyper"]["lookback"]
 
     data = load_array2d(data_path)             # [R, T] regions x time
     R, T = data.shape
     if region_idx < 0 or region_idx >= R:
         raise IndexError(f"region index {region_idx} out of range 0..{R-1}")
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = GlobalLSTMForecaster(
-        num_users=U_saved,
-        input_size=hyper["input_size"],   # should be 1
-        hidden_size=hyper["hidden_size"],
-        num_layers=hyper["num_layers"],
-        id_embed_dim=hyper["id_embed_dim"],
-        dropout=hyper["dropout"],
-    ).to(device)
-    model.load_state_dict(ckpt["state_dict"], strict=True)
-    model.eval()
-
     # Use region's own scaler (not checkpoint scalers)
-    series = data[region_idx]                # [T]
     if T <= lookback:
         raise ValueError(f"Series length {T} must be > lookback={lookback}")
 
     # Optional: if your deltas can be spiky/negative due to meter resets, you may clip:
     # series = np.clip(series, 0, None)
 
-    mu = float(series.mean())
-    sd = float(series.std())
-    s  = sd if sd > 1e-8 else 1.0
-
-    window = ((series[-lookback:] - mu) / s).astype(np.float32)       # [L]
-    window_t = torch.from_numpy(window).unsqueeze(0).unsqueeze(-1).to(device)  # [1,L,1]
+    window, mu, s = series_windows(data, [region_idx], lookback)
 
     # Feed a fixed embedding id (e.g., 0). It won't semantically match a "region",
     # but keeps the dimensions valid. For best results, retrain on regions.
-    uid_t = torch.tensor([0], dtype=torch.long, device=device)
+    preds_scaled = rollout(model, window, [0], n)
+    preds = (preds_scaled[0] * s[0] + mu[0]).tolist()
+    return preds
 
-    preds_scaled = []
-    for _ in range(n):
-        yhat = model(window_t, uid_t).item()
-        preds_scaled.append(yhat)
-        next_step = torch.tensor([[[yhat]]], dtype=torch.float32, device=device)
-        window_t = torch.cat([window_t[:, 1:, :], next_step], dim=1)
 
-    preds = (np.array(preds_scaled, dtype=np.float32) * s + mu).tolist()
-    return preds
+# --------------------------- Training ---------------------------
+def fit_scalers(data: np.ndarray):
+    """Per-row mean/std as stored in checkpoint["scalers"]."""
+    mean = data.mean(axis=1).astype(np.float32)
+    std = data.std(axis=1).astype(np.float32)
+    return mean, np.where(std > 1e-8, std, 1.0).astype(np.float32)
+
+def training_windows(data: np.ndarray, means, stds, lookback: int, horizon: int, stride: int = 1):
+    """
+    All (window [N,L], uid [N], target [N,H]) pairs of the scaled panel, stepping
+    `stride` positions per row. Materializes the windows; see model/train.py for
+    the streaming version used on full panels.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    if data.shape[1] < lookback + horizon:
+        raise ValueError(f"Series length {data.shape[1]} must be >= lookback+horizon={lookback + horizon}")
+    mu = np.asarray(means, dtype=np.float32)[:, None]
+    s = np.asarray(stds, dtype=np.float32)[:, None]
+    scaled = (data - mu) / s
+    views = sliding_window_view(scaled, lookback + horizon, axis=1)[:, ::stride]   # [U, W, L+H]
+    U, W = views.shape[:2]
+    flat = views.reshape(U * W, lookback + horizon)
+    uids = np.repeat(np.arange(U, dtype=np.int64), W)
+    return flat[:, :lookback].astype(np.float32), uids, flat[:, lookback:].astype(np.float32)
+
+def train_epoch(model: nn.Module, batches, optimizer, device=None, clip: float = 1.0) -> float:
+    """One pass over (x [B,L], uid [B], y [B,H]) batches with MSE loss; returns the mean loss."""
+    device = device or next(model.parameters()).device
+    model.train()
+    total, count = 0.0, 0
+    for x, uid, y in batches:
+        x = torch.as_tensor(x, dtype=torch.float32, device=device).unsqueeze(-1)
+        uid = torch.as_tensor(uid, dtype=torch.long, device=device)
+        y = torch.as_tensor(y, dtype=torch.float32, device=device)
+        loss = nn.functional.mse_loss(model(x, uid), y)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        if clip:
+            nn.utils.clip_grad_norm_(model.parameters(), clip)
+        optimizer.step()
+        total += loss.item() * len(y)
+        count += len(y)
+    model.eval()
+    return total / max(count, 1)
+
+def make_checkpoint(model: nn.Module, hyper: dict, means, stds, **meta) -> dict:
+    """Checkpoint in the format load_forecaster reads."""
+    return {
+        "state_dict": {k: v.detach().cpu() for k, v in model.state_dict().items()},
+        "hyper": dict(hyper),
+        "scalers": {"mean": np.asarray(means).tolist(), "std": np.asarray(stds).tolist()},
+        "meta": meta,
+    }
+
+def train(data: np.ndarray, hyper: dict, epochs: int = 5, batch_size: int = 256, lr: float = 1e-3,
+          stride: int = 1, seed: int = 0, device=None) -> dict:
+    """
+    Train a forecaster on a [U, T] panel in memory and return its checkpoint.
+    hyper["horizon"] selects the head: 1 (autoregressive) or H (direct).
+    """
+    torch.manual_seed(seed)
+    device = torch.device(device) if device else default_device()
+    hyper = {**hyper, "num_users": data.shape[0], "horizon": hyper.get("horizon", 1)}
+    means, stds = fit_scalers(data)
+    x, uid, y = training_windows(data, means, stds, hyper["lookback"], hyper["horizon"], stride)
+    model = build_model(hyper).to(device)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(y))
+        batches = ((x[b], uid[b], y[b]) for b in np.array_split(order, max(1, len(order) // batch_size)))
+        train_epoch(model, batches, optimizer, device)
+    return make_checkpoint(model, hyper, means, stds, device_trained=device.type)
 
 
 import os
@@ -166,7 +325,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # backend/api/model/
 API_DIR = os.path.dirname(SCRIPT_DIR)                    # backend/api/
 BACKEND_DIR = os.path.dirname(API_DIR)                   # backend/
 MODEL_DATA_DIR = os.path.join(BACKEND_DIR, "data", "model_data")
-MODEL_PATH = os.path.join(MODEL_DATA_DIR, "model.pt")
+MODEL_PATH = os.getenv("FORECAST_MODEL", os.path.join(MODEL_DATA_DIR, "model.pt"))
+# Week forecasts can use a separate checkpoint, e.g. one with a direct 168-step head.
+WEEK_MODEL_PATH = os.getenv("FORECAST_WEEK_MODEL", MODEL_PATH)
 USER_DATA_PATH = os.path.join(MODEL_DATA_DIR, "processed.json")
 LOCAL_DATA_PATH = os.path.join(MODEL_DATA_DIR, "processed_regions.json")
 
@@ -177,12 +338,13 @@ def m_eval(user_index: int, week: bool = False, location: int = -1) -> List[floa
     If location != -1: interpret user_index as REGION row in processed_regions.json
     """
     horizon = 168 if week else 24
+    model_path = WEEK_MODEL_PATH if week else MODEL_PATH
     if location == -1:
         print(f"DEBUG: user forecast idx={user_index}, horizon={horizon}")
-        return forecast_user(MODEL_PATH, USER_DATA_PATH, user_index, horizon)
+        return forecast_user(model_path, USER_DATA_PATH, user_index, horizon)
     else:
         print(f"DEBUG: region forecast idx={user_index}, horizon={horizon}")
-        return forecast_region_series(MODEL_PATH, LOCAL_DATA_PATH, location, horizon)
+        return forecast_region_series(model_path, LOCAL_DATA_PATH, location, horizon)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,32 @@
 from flask import Flask, jsonify
-from flask import request
+from flask import request, Response, stream_with_context
 from flask_cors import CORS
 import diff_data
+import math
+import readings
 import aiProvider
 import aiCustomer
 import os
-import openai
-import model.xlstm_runner
-from model.xlstm_runner import m_eval
 from gauss_tarrif import hourly_consumption
+import gauss_tarrif
+from meter_registry import MeterRegistry
+from total_consumption import TotalConsumption, EXPORTS_DIR
+from ingest import Ingestor, ExportWatcher, DeferredSink
+from anomalies import AnomalyDetector
+import parquet_store
+import rollups
+from prefix_index import PrefixIndex
+import top_k
+from profiles import ProfileSearch
+from frames import FrameCache, FrameHub, sse_message, parse_frame_time
+from lazy import Lazy, load_all, warm_up
+import metrics
+import profiling
+from metrics import span
+from datetime import timedelta
+import queue
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
 # Use relative paths for local development
 import os
@@ -24,14 +39,117 @@ TOTAL_CONSUMPTION_JSON = os.path.join(DATA_DIR, "daniel_data", "location_total_c
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument(app)
+profiling.instrument(app)
 
 import json
-data = {}
-# Opening JSON file
-with open(diff_data.DATA_JSON_FILE) as json_file:
-    data:dict = json.load(json_file)
 
-keys = list(data.keys())
+# ---------- Subsystems ----------
+# Nothing below is loaded at import time. Every subsystem is built on first use,
+# or by the warm-up thread started in start_background(); /ready reports when
+# the ones in READY_SUBSYSTEMS are built.
+
+def load_json(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+# data.json, or its compact twin (readings.py) once converted.
+data = Lazy("meter store", lambda: readings.load_readings(readings.data_file(diff_data.DATA_JSON_FILE)))
+keys = Lazy("meter keys", lambda: list(data().keys()))
+calc_data = Lazy("calc data", lambda: load_json(CALC_DATA_JSON))
+meter_data = Lazy("meter map", lambda: load_json(METER_TO_LOCATION))
+registry = Lazy("meter registry", MeterRegistry.load)
+consumption_totals = Lazy("total consumption", TotalConsumption.load)
+
+def load_consumption_data():
+    # Streaming first/last reducer behind /consumptions once it has been folded
+    # from the exports (total_consumption.py); the precomputed json until then.
+    if consumption_totals().files:
+        return consumption_totals().location_totals(meter_data())
+    return load_json(TOTAL_CONSUMPTION_JSON)
+
+consumption_data = Lazy("consumption data", load_consumption_data)
+
+# Color frames are computed once per time and dropped when ingestion touches them.
+color_frames = Lazy("color frames", lambda: FrameCache(data()))
+color_hub = Lazy("color hub", lambda: FrameHub(color_frames()))
+
+# Date/region-partitioned Parquet copy of the readings (only with pyarrow installed).
+history = Lazy("parquet history", lambda: parquet_store.ParquetStore(meter_data()))
+
+# Hour/day/week totals per meter and region. Built (or loaded) in the warm-up,
+# not before /ready: readings ingested meanwhile wait in their sink and are
+# replayed once the store is attached.
+rollups_sink = DeferredSink()
+prefix_sink = DeferredSink()
+consumption_rollups = Lazy("consumption rollups", lambda: rollups_sink.attach(rollups.Rollups.load_or_build(
+    data(), meter_data(), readings.data_file(diff_data.DATA_JSON_FILE))))
+consumption_prefix = Lazy("consumption prefix sums", lambda: prefix_sink.attach(PrefixIndex.load_or_build(
+    data(), meter_data(), readings.data_file(diff_data.DATA_JSON_FILE))))
+profile_search = Lazy("profile search", lambda: ProfileSearch(consumption_rollups()))
+heavy_consumers = Lazy("heavy consumers", lambda: top_k.RunningTopK(
+    top_k.HeavyConsumers(consumption_rollups())))
+
+anomaly_detector = Lazy("anomaly detector", AnomalyDetector.load)
+
+def load_ingestor():
+    ingestor = Ingestor(data(), calc_data(), meter_data(), consumption_data(),
+                        registry(), consumption_totals(), anomaly_detector())
+    ingestor.add_sink(rollups_sink)
+    ingestor.add_sink(prefix_sink)
+    ingestor.subscribe(lambda event: color_frames().invalidate(event.times))
+    ingestor.subscribe(color_hub().on_ingest)
+    ingestor.subscribe(lambda event: keys().extend(m for m in event.meters if m not in keys()))
+    ingestor.subscribe(_when_ready(heavy_consumers, "on_ingest"))
+    ingestor.subscribe(_when_ready(profile_search, "on_ingest"))
+    # Exports applied before the restart are not in data.json: apply them again.
+    # The Parquet sink comes after, as the dataset kept their readings.
+    ingestor.replay(INGEST_WATCH_DIR)
+    if parquet_store.available():
+        ingestor.add_sink(history().on_ingest_frame)
+    return ingestor
+
+def _when_ready(lazy, method):
+    """Listener that forwards events to a subsystem once it is built (and never builds it)."""
+    return lambda event: getattr(lazy(), method)(event) if lazy.ready else None
+
+ingestor = Lazy("ingestor", load_ingestor)
+
+def load_forecaster():
+    # torch and the model code are only imported once a forecast is needed.
+    from model.xlstm_runner import m_eval
+
+    def timed_m_eval(*args, **kwargs):
+        with span("model_inference"), profiling.torch_trace("forecast"):
+            return m_eval(*args, **kwargs)
+    return timed_m_eval
+
+def load_hierarchy():
+    from model.hierarchy import forecast_hierarchy
+
+    def timed_forecast_hierarchy(*args, **kwargs):
+        with span("model_inference"), profiling.torch_trace("forecast_hierarchy"):
+            return forecast_hierarchy(*args, **kwargs)
+    return timed_forecast_hierarchy
+
+def load_clusters():
+    from model.clusters import MeterClusters
+    return MeterClusters()
+
+def load_openai_client():
+    import openai
+    return openai.OpenAI(api_key=OPENAI_API_KEY)
+
+m_eval = Lazy("forecaster", load_forecaster)
+hierarchy = Lazy("hierarchical forecaster", load_hierarchy)
+meter_clusters = Lazy("meter clusters", load_clusters)
+client = Lazy("openai client", load_openai_client)
+ai_data = Lazy("ai summaries", lambda: aiProvider.get_location_energy_data(data(), meter_data()))
+
+READY_SUBSYSTEMS = [data, keys, calc_data, meter_data, registry, consumption_totals,
+                    consumption_data, color_frames, color_hub, anomaly_detector, ingestor]
+WARM_UP_SUBSYSTEMS = READY_SUBSYSTEMS + [consumption_rollups, consumption_prefix, heavy_consumers,
+                                         m_eval, hierarchy, client, ai_data]
 
 # Create a mapping from user ID to index position
 def get_user_index(user_id):
@@ -40,40 +158,90 @@ def get_user_index(user_id):
     Returns the index if found, otherwise returns 0 as default.
     """
     user_id_str = str(user_id)
-    if user_id_str in keys:
-        return keys.index(user_id_str)
+    if user_id_str in keys():
+        return keys().index(user_id_str)
     else:
         print(f"Warning: User ID {user_id} not found in data. Using index 0 as default.")
         return 0
 
-consumption_data = {}
-# Opening JSON file
-with open(TOTAL_CONSUMPTION_JSON) as json_file:
-    consumption_data:dict = json.load(json_file)
+# Export files dropped into INGEST_WATCH_DIR are picked up without a restart.
+INGEST_WATCH_DIR = os.getenv("INGEST_WATCH_DIR", EXPORTS_DIR)
+# Ingestion changes the memory of the process that runs it, so it is only
+# enabled where a single process serves; gunicorn.conf.py turns it off for
+# WEB_WORKERS > 1 (each worker would ingest every file and write the same state files).
+ingest_enabled = True
 
+def start_export_watcher():
+    watcher = ExportWatcher(ingestor(), INGEST_WATCH_DIR,
+                            interval=float(os.getenv("INGEST_WATCH_INTERVAL", "30")))
+    watcher.start()
+    return watcher
 
-calc_data = {}
-with open(CALC_DATA_JSON) as json_file:
-    calc_data:dict = json.load(json_file)
+export_watcher = Lazy("export watcher", start_export_watcher)
 
-meter_data = {}
-with open(METER_TO_LOCATION) as json_file:
-    meter_data:dict = json.load(json_file)
+def preload():
+    """Build the READY_SUBSYSTEMS synchronously (gunicorn master, before fork)."""
+    load_all(READY_SUBSYSTEMS)
 
-ai_data = aiProvider.get_location_energy_data(data, meter_data)
+def start_background():
+    """
+    Start the background work of this process: the warm-up thread (unless
+    LAZY_WARMUP=0) and the export watcher. Called once per serving process:
+    from __main__, or from gunicorn's post_fork (threads do not survive the
+    fork from the preloading master).
+    """
+    lazies = WARM_UP_SUBSYSTEMS if os.getenv("LAZY_WARMUP", "1") == "1" else []
+    if ingest_enabled and os.path.isdir(INGEST_WATCH_DIR):
+        lazies = lazies + [export_watcher]
+    if lazies:
+        warm_up(lazies)
 
 @app.route("/id/<id>")
 def hello(id):
-    return data[str(id)]
+    with span("data_lookup"):
+        return data()[str(id)]
 
 @app.route("/diff/<id>")
 def diffs(id):
-    return diff_data.get_diffs(data[str(id)])
+    with span("data_lookup"):
+        readings = data()[str(id)]
+    with span("aggregation"):
+        return diff_data.get_diffs(readings)
+
+@app.route("/health")
+def health():
+    """Liveness probe: the process is up and serving, whatever is still loading."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route("/ready")
+def ready():
+    """Readiness probe: 503 until every subsystem in READY_SUBSYSTEMS is built."""
+    is_ready = all(lazy.ready for lazy in READY_SUBSYSTEMS)
+    body = {
+        "ready": is_ready,
+        "subsystems": {lazy.name: lazy.status() for lazy in WARM_UP_SUBSYSTEMS},
+        "pid": os.getpid(),
+    }
+    return jsonify(body), 200 if is_ready else 503
+
+@app.route("/metrics")
+def metrics_route():
+    """Prometheus text exposition of the request/stage/cache metrics of this process."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 @app.route("/keys")
 def keys_route():
-    return keys
+    return keys()
+
+@app.route("/meters")
+def meters_route():
+    """Meter count and ids straight from the registry (no export rescan)."""
+    return jsonify({
+        **registry().summary(),
+        "ids": registry().ids(),
+        "disappeared": registry().disappeared(),
+    })
 
 # @app.route("/calc")
 # def calc():
@@ -96,6 +264,62 @@ def tariff(hour, previousCost):
     consumption = round(hourly_consumption(hour) * previousCost * 0.15 + previousCost * 0.85, 2)
     return jsonify({"price": consumption})
 
+@app.route("/tariff/batch", methods=['POST'])
+def tariff_batch():
+    """
+    Prices for many previous costs over a day or a week in one call.
+    Body: {"previous_costs": [...], "days": 1, "resolution_minutes": 60,
+           "peaks": [[9, 2], [19, 2.5]], "share": 0.15,
+           "load": [...] | {"location": "<region>"} | {"user_id": <id>}}
+    With "load" the price follows that series (or the model's forecast for the
+    region/user, hourly, up to 7 days) instead of the Gaussian peaks.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        costs = [float(c) for c in body.get("previous_costs", [])]
+        days = float(body.get("days", 1))
+        resolution = int(body.get("resolution_minutes", 60))
+        peaks = [(float(c), float(s)) for c, s in body.get("peaks", gauss_tarrif.PEAKS)]
+        share = float(body.get("share", gauss_tarrif.PEAK_SHARE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "previous_costs, days, resolution_minutes, peaks and share must be numeric"}), 400
+    if not costs:
+        return jsonify({"error": "Missing 'previous_costs' list"}), 400
+    if not 0 < days <= 31 or resolution <= 0 or 24 * 60 % resolution:
+        return jsonify({"error": "days must be in (0, 31] and resolution_minutes must divide a day"}), 400
+    if not peaks or any(s <= 0 for _, s in peaks) or not 0 <= share <= 1:
+        return jsonify({"error": "peaks need positive sigmas and share must be in [0, 1]"}), 400
+
+    load = body.get("load")
+    if isinstance(load, dict):
+        hours = int(round(days * 24))
+        if hours > 168:
+            return jsonify({"error": "Forecast-driven prices cover at most 7 days"}), 400
+        week = hours > 24
+        if "location" in load:
+            regions = load_json(os.path.join(BASE_DIR, "data", "model_data", "regions_index.json"))["regions"]
+            names = [r.lower() for r in regions]
+            if str(load["location"]).lower() not in names:
+                return jsonify({"error": f"Location '{load['location']}' not found",
+                                "available_locations": regions}), 400
+            idx = names.index(str(load["location"]).lower())
+            load = m_eval()(user_index=idx, week=week, location=idx)[:hours]
+        elif "user_id" in load:
+            load = m_eval()(user_index=get_user_index(load["user_id"]), week=week)[:hours]
+        else:
+            return jsonify({"error": "load must be a list or {location} / {user_id}"}), 400
+    elif load is not None and not (isinstance(load, list) and load and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in load)):
+        return jsonify({"error": "load must be a non-empty list of numbers or {location} / {user_id}"}), 400
+
+    with span("aggregation"):
+        prices = gauss_tarrif.price_matrix(costs, days, resolution, peaks, share, load)
+    return jsonify({
+        "hours": gauss_tarrif.hour_grid(days, resolution).tolist(),
+        "previous_costs": costs,
+        "prices": prices.round(2).tolist(),
+    })
+
 
 @app.route("/color", methods=['POST'])
 def give_color() :
@@ -104,15 +328,64 @@ def give_color() :
         return jsonify({"error": "Missing 'time' field"}), 400
 
     time_value = json_data["time"]
-    return diff_data.get_color_json(data, str(time_value))
+    return color_frames().get(str(time_value))
+
+@app.route("/color/stream")
+def stream_color():
+    """
+    Server-sent events with per-region color frames.
+      /color/stream                          live: a frame for every newly ingested interval
+      /color/stream?start=..&end=..          replay a historical range (times as in POST /color)
+                   &step=15&speed=900        step in minutes, speed as a multiple of real time
+    """
+    start = request.args.get("start")
+    end = request.args.get("end")
+
+    if start or end:
+        if not (start and end):
+            return jsonify({"error": "Replay needs both 'start' and 'end'"}), 400
+        try:
+            parse_frame_time(start), parse_frame_time(end)
+            step = timedelta(minutes=float(request.args.get("step", 15)))
+            speed = float(request.args.get("speed", 900))
+        except (ValueError, OverflowError):
+            return jsonify({"error": "Invalid 'start', 'end', 'step' or 'speed'"}), 400
+        if step <= timedelta(0):
+            return jsonify({"error": "'step' must be a positive number of minutes"}), 400
+        frames = color_hub().replay(start, end, step, step.total_seconds() / speed if speed > 0 else 0)
+
+        def replay():
+            for frame in frames:
+                yield sse_message(frame)
+            yield sse_message({"end": end}, event="done")
+
+        return Response(stream_with_context(replay()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+
+    def live():
+        hub = color_hub()
+        q = hub.subscribe()
+        try:
+            while True:
+                try:
+                    yield sse_message(q.get(timeout=15))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            hub.unsubscribe(q)
+
+    return Response(stream_with_context(live()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
 
 @app.route("/region/all")
 def get_regions():
-    return calc_data
+    return calc_data()
 
 @app.route("/ai")
 def get_ai_resp():
-    return aiProvider.get_ai_recommendations(client, ai_data)
+    summaries = ai_data()
+    with span("llm_call"):
+        return aiProvider.get_ai_recommendations(client(), summaries)
 
 @app.route("/ai/chat", methods=['POST'])
 def chat_q():
@@ -121,19 +394,38 @@ def chat_q():
         return jsonify({"error": "Missing 'message' field"}), 400
     
     message = json_data["message"]
-    return {"response": aiCustomer.get_ai_response(client, message)}
+    with span("llm_call"):
+        return {"response": aiCustomer.get_ai_response(client(), message)}
 
 @app.route("/consumptions")
 def give_consumption():
-    return consumption_data
+    # Kept current by the ingestor (POST /ingest and the export watcher).
+    return consumption_data()
+
+@app.route("/ingest", methods=['POST'])
+def ingest_readings():
+    """
+    Append a batch of readings without restarting the app.
+    Body: {"readings": [{"Meter": ..., "Clock": "dd.mm.YYYY HH:MM:SS", "Import": ..., "Export": ...}, ...]}
+    """
+    if not ingest_enabled:
+        return jsonify({"error": "Live ingestion needs a single serving process (WEB_WORKERS=1)"}), 503
+    json_data = request.get_json()
+    readings = json_data.get("readings") if isinstance(json_data, dict) else json_data
+    if not isinstance(readings, list):
+        return jsonify({"error": "Missing 'readings' list"}), 400
+
+    with span("ingest"):
+        event = ingestor().ingest_records(readings)
+    return jsonify(event.to_dict())
 
 @app.route("/pred/week")
 def w_pred():
-    return m_eval(user_index=0, week=True)
+    return m_eval()(user_index=0, week=True)
 
 @app.route("/pred")
 def pred():
-    return m_eval(user_index=0)
+    return m_eval()(user_index=0)
 
 
 @app.route("/pred/week/<user_id>")
@@ -141,7 +433,7 @@ def w_pred_user(user_id):
     try:
         user_id_int = int(user_id)
         user_index = get_user_index(user_id_int)
-        return m_eval(user_index=user_index, week=True)
+        return m_eval()(user_index=user_index, week=True)
     except ValueError:
         return jsonify({"error": "Invalid user ID"}), 400
 
@@ -151,7 +443,7 @@ def pred_user(user_id):
         user_id_int = int(user_id)
         user_index = get_user_index(user_id_int)
         print(f"DEBUG: pred_user called with user_id={user_id_int}, mapped to user_index={user_index}")
-        return m_eval(user_index=user_index)
+        return m_eval()(user_index=user_index)
     except ValueError:
         return jsonify({"error": "Invalid user ID"}), 400
 
@@ -164,8 +456,8 @@ def debug_user_mapping(user_id):
         return jsonify({
             "user_id": user_id_int,
             "user_index": user_index,
-            "total_users": len(keys),
-            "available_user_ids": keys[:10] if len(keys) > 10 else keys  # Show first 10 or all if less
+            "total_users": len(keys()),
+            "available_user_ids": keys()[:10] if len(keys()) > 10 else keys()  # Show first 10 or all if less
         })
     except ValueError:
         return jsonify({"error": "Invalid user ID"}), 400
@@ -196,7 +488,7 @@ def pred_location(location_name):
             }), 400
         
         # Get predictions using location index
-        predictions = m_eval(user_index=location_index, week=False, location=location_index)
+        predictions = m_eval()(user_index=location_index, week=False, location=location_index)
         return jsonify(predictions)
         
     except Exception as e:
@@ -227,12 +519,242 @@ def pred_location_week(location_name):
             }), 400
         
         # Get weekly predictions using location index
-        predictions = m_eval(user_index=location_index, week=True, location=location_index)
+        predictions = m_eval()(user_index=location_index, week=True, location=location_index)
         return jsonify(predictions)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/pred/hierarchy")
+@app.route("/pred/hierarchy/week")
+def pred_hierarchy():
+    """
+    Region and "moldova" forecasts aggregated from one batched pass over all
+    meters. ?reconcile=bottom_up|ols|proportional, ?location=<region> for one region.
+    """
+    week = request.path.endswith("/week")
+    method = request.args.get("reconcile", "bottom_up")
+    try:
+        result = hierarchy()(168 if week else 24, method)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    location = request.args.get("location")
+    if location is None:
+        return jsonify(result)
+    if location.lower() == "moldova":
+        return jsonify(result["moldova"])
+    for region, forecast in result["regions"].items():
+        if region.lower() == location.lower():
+            return jsonify(forecast)
+    return jsonify({
+        "error": f"Location '{location}' not found",
+        "available_locations": list(result["regions"]),
+    }), 400
+
+@app.route("/clusters")
+def get_clusters():
+    """Behavioural clusters written by `python -m model.clusters`: labels, sizes and centroids."""
+    try:
+        return jsonify(meter_clusters().summary())
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route("/clusters/<meter_id>")
+def get_meter_cluster(meter_id):
+    """The cluster of one meter of device_ids.json (-1 / "inactive" without consumption)."""
+    try:
+        return jsonify(meter_clusters().meter(meter_id))
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 503
+    except KeyError:
+        return jsonify({"error": f"Meter '{meter_id}' is not in the clustered panel"}), 404
+
+@app.route("/pred/clusters")
+@app.route("/pred/clusters/week")
+def pred_clusters():
+    """
+    Forecast of every cluster, summed from its meters' forecasts; ?cluster=<n>
+    for one cluster, ?meter=<id> for the cluster of a meter.
+    """
+    week = request.path.endswith("/week")
+    clusters = meter_clusters()
+    try:
+        cluster = request.args.get("cluster")
+        if request.args.get("meter") is not None:
+            cluster = clusters.meter(request.args["meter"])["cluster"]
+        elif cluster is not None:
+            cluster = int(cluster)
+            clusters.cluster(cluster)
+        with span("model_inference"), profiling.torch_trace("forecast_clusters"):
+            forecasts = clusters.forecast(168 if week else 24)
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 503
+    except KeyError:
+        return jsonify({"error": "Unknown cluster or meter"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    if cluster is None:
+        return jsonify({
+            str(c): {"label": clusters.cluster(c)["label"], "forecast": forecast}
+            for c, forecast in forecasts.items()
+        })
+    if cluster < 0:
+        return jsonify({"error": "The meter is not in any cluster"}), 404
+    return jsonify(forecasts[cluster])
+
+@app.route("/history")
+def get_history():
+    """
+    Readings from the Parquet dataset. ?start=&end= (YYYY-MM-DD[ HH:MM:SS], end
+    exclusive), ?region= and ?meter= may repeat; only matching partitions are read.
+    """
+    if not parquet_store.available():
+        return jsonify({"error": "The Parquet dataset needs pyarrow"}), 503
+    try:
+        with span("parquet_query"):
+            df = history().query(
+                meters=request.args.getlist("meter") or None,
+                regions=request.args.getlist("region") or None,
+                start=request.args.get("start"),
+                end=request.args.get("end"),
+                columns=["meter", "time", "import", "export", "region"],
+            )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    df["time"] = df["time"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return jsonify(df.to_dict(orient="records"))
+
+def _series_keys(meters, regions) -> list[str]:
+    return [rollups.meter_key(m) for m in meters] + [rollups.region_key(r) for r in regions]
+
+@app.route("/rollups")
+def get_rollups():
+    """
+    Import/export per ?meter= and ?region= (repeatable; region "moldova" is every
+    mapped meter) over ?start=&end= in steps of ?resolution= (hour, day, week,
+    6h, 2d...; omitted for one total), read from the coarsest rollup that fits.
+    """
+    series_keys = _series_keys(request.args.getlist("meter"), request.args.getlist("region"))
+    if not series_keys:
+        return jsonify({"error": "Give at least one meter or region"}), 400
+    try:
+        with span("rollup_query"):
+            return jsonify(consumption_rollups().query(
+                series_keys, request.args.get("start"), request.args.get("end"), request.args.get("resolution")))
+    except KeyError as e:
+        return jsonify({"error": f"No readings for {e.args[0]}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/consumption/ranges", methods=["POST"])
+def consumption_ranges():
+    """
+    Import/export of many ranges in one request, each two prefix-sum lookups:
+    {"regions": [...], "ranges": [[start, end], ...]}, bounds snapped down to the
+    15-minute grid, end exclusive. Regions only; meters are in /rollups.
+    """
+    body = request.get_json(silent=True) or {}
+    series_keys = _series_keys([], body.get("regions", []))
+    ranges = body.get("ranges")
+    if not series_keys or not isinstance(ranges, list) or \
+            not all(isinstance(r, (list, tuple)) and len(r) == 2 for r in ranges):
+        return jsonify({"error": "Give regions and ranges as [[start, end], ...]"}), 400
+    try:
+        with span("prefix_query"):
+            return jsonify(consumption_prefix().totals(series_keys, ranges))
+    except KeyError as e:
+        return jsonify({"error": f"No readings for {e.args[0]}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/consumption/moving")
+def consumption_moving():
+    """Trailing ?window= (e.g. 24h, 7d) sums per ?region= at every grid point in (start, end]."""
+    series_keys = _series_keys([], request.args.getlist("region"))
+    if not series_keys:
+        return jsonify({"error": "Give at least one region"}), 400
+    try:
+        with span("prefix_query"):
+            return jsonify(consumption_prefix().moving(
+                series_keys, request.args.get("window", "24h"),
+                request.args.get("start"), request.args.get("end")))
+    except KeyError as e:
+        return jsonify({"error": f"No readings for {e.args[0]}"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/top")
+def top_consumers():
+    """
+    The ?k= (default 50) meters of ?region= ("moldova" for all) with the largest
+    ?by=import|export over ?start=&end=. Without a range: the latest hour, kept
+    current on ingest.
+    """
+    region = request.args.get("region", rollups.TOTAL_REGION)
+    by = request.args.get("by", "import")
+    try:
+        k = int(request.args.get("k", top_k.DEFAULT_K))
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    start, end = request.args.get("start"), request.args.get("end")
+    try:
+        with span("top_k"):
+            result = None
+            if start is None and end is None:
+                result = heavy_consumers().get(region, k, by)
+                if result is None:
+                    end = consumption_rollups().end
+                    start = end - heavy_consumers().interval if end else None
+            if result is None:
+                result = heavy_consumers().engine.query(region, start, end, k, by)
+        return jsonify(result)
+    except KeyError:
+        return jsonify({"error": f"No meters indexed for region '{region}'"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/anomalies")
+def get_anomalies():
+    """
+    Resets, negative steps and spikes flagged during ingestion, newest first.
+    Filters: ?meter=, ?kind=reset|negative|spike, ?since=YYYY-MM-DD HH:MM:SS, ?limit=.
+    """
+    try:
+        limit = int(request.args.get("limit", 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    detector = anomaly_detector()
+    return jsonify({
+        "counts": dict(detector.counts),
+        "events": detector.query(request.args.get("meter"), request.args.get("kind"),
+                                 request.args.get("since"), limit),
+    })
+
+@app.route("/similar/<meter_id>")
+def similar_meters(meter_id):
+    """
+    The ?k= (default 10) meters whose ?profile=daily|weekly load shape is closest
+    to this meter's, by cosine distance; ?method=exact|lsh (approximate).
+    """
+    try:
+        k = int(request.args.get("k", 10))
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    try:
+        with span("profile_search"):
+            return jsonify(profile_search().similar(
+                meter_id, k, request.args.get("profile", "daily"), request.args.get("method", "exact")))
+    except KeyError:
+        return jsonify({"error": f"Meter '{meter_id}' has no rolled-up readings"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route("/locations")
 def get_locations():
     """Get list of available locations"""
@@ -245,4 +767,7 @@ def get_locations():
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py app:app`.
+    aiProvider.check_venv()
+    start_background()
+    app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG") == "1", threaded=True)
\ No newline at end of file
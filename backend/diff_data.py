@@ -1,5 +1,4 @@
 from datetime import datetime
-import pandas as pd
 import copy
 import os
 
@@ -8,6 +7,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 CLOCK_COLMN_NAME = "Clock (8:0-0:1.0.0*255:2)"
+IMPORT_COLMN_NAME = "Active Energy Import (3:1-0:1.8.0*255:2)"
+EXPORT_COLMN_NAME = "Active Energy Export (3:1-0:2.8.0*255:2)"
 METER_MAP_FILE = os.path.join(DATA_DIR, "daniel_data", "meter_to_location.json")
 LOCATION_CSV_FILE = os.path.join(DATA_DIR, "daniel_data", "locations.csv")
 DATA_JSON_FILE = os.path.join(DATA_DIR, "data.json")
@@ -39,6 +40,8 @@ def get_diffs(d: list[dict]) -> list[dict]:
 
 
 def get_every_diff(data: dict, ids: list[str]):
+    import pandas as pd
+
     df = (
         pd.concat({k: pd.DataFrame(v) for k, v, in data.items()}, names=["Meter"])
         .reset_index(level=0)
@@ -56,6 +59,8 @@ def get_every_diff(data: dict, ids: list[str]):
 
 
 def get_timed_diffs(data: dict, ids: list[str], time: str) -> list[dict]:
+    import pandas as pd
+
     # Getting the ids back in column
     df = (
         pd.concat({k: pd.DataFrame(v) for k, v, in data.items()}, names=["Meter"])
@@ -103,7 +108,6 @@ def calc_diff_timed(data: dict, ids: list[str], t2: str, t1: str) -> dict:
 import json
 from diff_data import calc_diff_timed
 import os
-import pandas as pd
 
 
 
@@ -120,6 +124,7 @@ def get_all_region_meters() -> dict:
 
 
 def get_color_json(data: dict, cloc: str) -> dict:
+    import pandas as pd
 
     t = cloc.split(" ")
     hour = t[1]
@@ -237,6 +242,7 @@ def get_region_consumption(data:dict, region:str) -> dict:
     return result
 
 def calc_consump(data:dict) -> list[dict]:
+    import pandas as pd
 
     coords_df = pd.read_csv(LOCATION_CSV_FILE)
     coords_maps: list[str] = [row["Name"] for _, row in coords_df.iterrows()]
@@ -264,9 +270,6 @@ def calc_consump(data:dict) -> list[dict]:
 
 if __name__ == "__main__":
 
-    import json
+    from readings import load_readings, data_file
 
-    data = {}
-    # Opening JSON file
-    with open(DATA_JSON_FILE) as json_file:
-        data: dict = json.load(json_file)
+    data: dict = load_readings(data_file(DATA_JSON_FILE))
@@ -0,0 +1,81 @@
+"""
+Chunked readers for the "All measuring points" export files dropped by the
+metering system (see api/filename.py for the naming scheme).
+
+Every reader yields pandas DataFrames with the same four normalized columns so
+that the registry, the total-consumption reducer and live ingestion never have
+to know about the raw layout:
+
+    Meter  (str)             meter id
+    Time   (datetime64[ns])  reading timestamp
+    Import (float64)         cumulative active energy import
+    Export (float64)         cumulative active energy export
+"""
+
+import os
+
+EXPORT_CHUNK_ROWS = 200_000
+EXPORT_EXTENSIONS = (".csv", ".xlsx", ".xls")
+EXPORT_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+# Positional layout of the export files (the header row, when present, is
+# dropped because its first column is not numeric).
+_RAW_COLUMNS = ["Meter", "Clock", "Import", "Export"]
+
+
+def list_export_files(folder: str) -> list[str]:
+    """Export files in `folder`, oldest name first."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, f)
+        for f in os.listdir(folder)
+        if f.lower().endswith(EXPORT_EXTENSIONS)
+    )
+
+
+def _to_number(col):
+    import pandas as pd
+
+    return pd.to_numeric(col.str.replace(",", ".", regex=False), errors="coerce")
+
+
+def normalize_chunk(raw):
+    """Turn a raw positional chunk into the normalized Meter/Time/Import/Export frame."""
+    import pandas as pd
+
+    raw = raw.iloc[:, : len(_RAW_COLUMNS)]
+    raw.columns = _RAW_COLUMNS[: len(raw.columns)]
+
+    meter = pd.to_numeric(raw["Meter"], errors="coerce")
+    df = pd.DataFrame(
+        {
+            "Meter": meter,
+            "Time": pd.to_datetime(raw["Clock"], format=EXPORT_TIME_FORMAT, errors="coerce"),
+            "Import": _to_number(raw["Import"]),
+            "Export": _to_number(raw["Export"]) if "Export" in raw else float("nan"),
+        }
+    )
+    df = df.dropna(subset=["Meter", "Time"])
+    df["Meter"] = df["Meter"].astype("int64").astype(str)
+    return df.reset_index(drop=True)
+
+
+def iter_export_chunks(path: str, chunksize: int = EXPORT_CHUNK_ROWS):
+    """Yield normalized frames of at most `chunksize` rows from one export file."""
+    import pandas as pd
+
+    if path.lower().endswith(".csv"):
+        reader = pd.read_csv(
+            path,
+            header=None,
+            dtype=str,
+            encoding="utf-8",
+            on_bad_lines="skip",
+            chunksize=chunksize,
+        )
+        for raw in reader:
+            yield normalize_chunk(raw)
+    else:
+        # Excel has no chunked reader; these files are small manual exports.
+        yield normalize_chunk(pd.read_excel(path, header=None, dtype=str))
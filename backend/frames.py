@@ -0,0 +1,144 @@
+"""
+Cache of per-region color frames served by /color.
+
+A frame for time T is the get_color_json() result for T: per-location import
+between T - 1h and T, plus its color and coordinates. Frames are computed once
+and reused until ingestion delivers a reading that falls into their window.
+FrameHub pushes the same cached frames to every /color/stream (SSE) client.
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+import diff_data
+import metrics
+
+FRAME_TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+FRAME_WINDOW = timedelta(hours=1)
+
+
+class FrameCache:
+    def __init__(self, data: dict, max_frames: int = 512):
+        self.data = data
+        self.max_frames = max_frames
+        self._frames: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, time_value: str) -> dict:
+        with self._lock:
+            frame = self._frames.get(time_value)
+        if frame is not None:
+            metrics.cache_hit("color_frames")
+            return frame
+
+        metrics.cache_miss("color_frames")
+        with metrics.span("aggregation"):
+            frame = diff_data.get_color_json(self.data, time_value)
+        with self._lock:
+            if len(self._frames) >= self.max_frames:
+                # Drop the oldest inserted frame (dicts keep insertion order).
+                self._frames.pop(next(iter(self._frames)))
+            self._frames[time_value] = frame
+        return frame
+
+    def invalidate(self, times) -> int:
+        """
+        Drop every cached frame whose window contains one of `times`
+        (datetimes of newly ingested readings). Returns the number dropped.
+        """
+        stale = set()
+        for t in times:
+            # A reading at t is the end point of frame t and the start point of frame t + 1h.
+            stale.add(t.strftime(FRAME_TIME_FORMAT))
+            stale.add((t + FRAME_WINDOW).strftime(FRAME_TIME_FORMAT))
+        with self._lock:
+            dropped = [k for k in stale if k in self._frames]
+            for k in dropped:
+                del self._frames[k]
+        return len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+
+def parse_frame_time(time_value: str) -> datetime:
+    return datetime.strptime(time_value, FRAME_TIME_FORMAT)
+
+
+class FrameHub:
+    """
+    Fans color frames out to every connected /color/stream client.
+
+    Each frame is computed once through the shared FrameCache, no matter how
+    many clients receive it. Slow clients lose their oldest queued frames
+    instead of blocking the publisher.
+    """
+
+    def __init__(self, cache: FrameCache, queue_size: int = 64):
+        self.cache = cache
+        self.queue_size = queue_size
+        self._clients: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._clients.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._clients.discard(q)
+
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def publish(self, time_value: str) -> dict:
+        message = {"time": time_value, "regions": self.cache.get(time_value)}
+        with self._lock:
+            clients = list(self._clients)
+        for q in clients:
+            while True:
+                try:
+                    q.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+        return message
+
+    def on_ingest(self, event):
+        """Ingestor listener: push a fresh frame for every newly covered time."""
+        if not self._clients:
+            return
+        for t in sorted(event.times):
+            self.publish(t.strftime(FRAME_TIME_FORMAT))
+
+    def replay(self, start: str, end: str, step: timedelta, delay: float):
+        """
+        Frames from `start` to `end` (inclusive), sleeping `delay` seconds between
+        them; ValueError right away unless `step` is positive.
+        """
+        t, stop = parse_frame_time(start), parse_frame_time(end)
+        if step <= timedelta(0):
+            raise ValueError("step must be positive")
+
+        def frames(t):
+            while t <= stop:
+                time_value = t.strftime(FRAME_TIME_FORMAT)
+                yield {"time": time_value, "regions": self.cache.get(time_value)}
+                t += step
+                if t <= stop and delay > 0:
+                    time.sleep(delay)
+
+        return frames(t)
+
+
+def sse_message(payload, event: str = "frame") -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
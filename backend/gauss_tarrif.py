@@ -1,4 +1,12 @@
 import math
+from functools import lru_cache
+
+import numpy as np
+
+# (center hour, sigma) of the daily peaks and the share of the price they drive;
+# the same values hourly_consumption and the frontend curve use.
+PEAKS = ((9, 2), (19, 2.5))
+PEAK_SHARE = 0.15
 
 def gaussian(x, mean, sigma=2):
     """
@@ -33,6 +41,55 @@ def hourly_consumption(hour):
     
     return total_consumption
 
+# ---------- Vectorized tariff ----------
+
+def hour_grid(days=1, resolution_minutes=60):
+    """Hour of day (0-24) of every step of `days` days at the given resolution."""
+    steps = int(round(days * 24 * 60 / resolution_minutes))
+    return (np.arange(steps) * resolution_minutes / 60.0) % 24
+
+def tariff_curve(hours, peaks=PEAKS):
+    """hourly_consumption over an array of hours, for any set of (center, sigma) peaks."""
+    hours = np.asarray(hours, dtype=np.float64)
+    centers = np.array([c for c, _ in peaks], dtype=np.float64)
+    sigmas = np.array([s for _, s in peaks], dtype=np.float64)
+    return np.exp(-0.5 * ((hours[..., None] - centers) / sigmas) ** 2).sum(axis=-1)
+
+@lru_cache(maxsize=64)
+def day_curve(resolution_minutes=60, peaks=PEAKS):
+    """Precomputed one-day curve (read-only); weeks tile it."""
+    curve = tariff_curve(hour_grid(1, resolution_minutes), peaks)
+    curve.setflags(write=False)
+    return curve
+
+def load_shape(load, steps, peak):
+    """
+    Scale a load series (e.g. a forecast) to the curve's range: its minimum maps
+    to 0 and its maximum to `peak`. Resampled linearly to `steps` points.
+    """
+    load = np.asarray(load, dtype=np.float64)
+    if load.size != steps:
+        load = np.interp(np.linspace(0, load.size - 1, steps), np.arange(load.size), load)
+    span = load.max() - load.min()
+    if span <= 0:
+        return np.zeros(steps)
+    return (load - load.min()) / span * peak
+
+def price_matrix(previous_costs, days=1, resolution_minutes=60, peaks=PEAKS, share=PEAK_SHARE, load=None):
+    """
+    Prices [len(previous_costs), steps] for every previous cost over `days` days:
+    cost * (share * shape + (1 - share)), where shape is the Gaussian curve or,
+    when `load` is given, the load series scaled to the curve's peak height.
+    """
+    costs = np.asarray(previous_costs, dtype=np.float64).reshape(-1, 1)
+    peaks = tuple((float(c), float(s)) for c, s in peaks)
+    curve = day_curve(resolution_minutes, peaks)
+    steps = int(round(days * len(curve)))
+    shape = np.resize(curve, steps)
+    if load is not None:
+        shape = load_shape(load, steps, curve.max())
+    return costs * (share * shape + (1 - share))
+
 if __name__ == "__main__":
     # Test the function for each hour of the day
     for hour in range(24):
@@ -0,0 +1,64 @@
+"""
+Production serving for app.py:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the gunicorn master (preload_app) and its data
+subsystems are built there (app.preload()), so data.json, calc.json and the
+meter maps are parsed a single time and every worker forked
+from the master shares those pages copy-on-write instead of holding its own copy.
+`gc.freeze()` moves the loaded objects out of the collector's generations right
+before the fork, so garbage collection in a worker does not touch (and copy) them.
+
+Settings (environment):
+    WEB_BIND      address to bind                     (default 0.0.0.0:5000)
+    WEB_WORKERS   worker processes                    (default: number of CPUs)
+    WEB_THREADS   threads per worker                  (default 8)
+    WEB_TIMEOUT   seconds before a silent worker dies (default 120)
+
+/ready answers 200 once the data subsystems are built, which is already true
+when a worker starts; the consumption rollups and prefix sums, the forecaster,
+the OpenAI client and the AI summaries warm up in a background thread per
+worker (each worker holds its own copy) and show up in /ready's "subsystems". /health only tells that the process is up.
+
+Each worker is a gthread worker: the CPU-heavy routes (/color, /pred/...) are
+spread over processes, while threads keep long-lived /color/stream (SSE)
+connections from blocking a whole worker. Count one thread per open stream.
+
+Live ingestion (the export-folder watcher and POST /ingest) updates the data in
+the memory of the process that runs it, and writes meter_registry.json, the
+totals state and anomalies.json. It is therefore only enabled with
+WEB_WORKERS=1; with more workers it is switched off (POST /ingest answers 503)
+and new exports are picked up on the next restart.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("WEB_THREADS", "8"))
+worker_class = "gthread"
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master before any fork. Importing app.py is cheap (every
+    # subsystem is lazy), so build the shared data here explicitly.
+    import app
+
+    app.ingest_enabled = workers == 1
+    if not app.ingest_enabled:
+        server.log.warning("live ingestion disabled: it needs WEB_WORKERS=1 (running %d workers)", workers)
+    app.preload()
+    gc.freeze()
+    server.log.info("app preloaded, %d objects frozen before fork", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork(); start the per-worker background work here.
+    import app
+
+    app.start_background()
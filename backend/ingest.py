@@ -0,0 +1,366 @@
+"""
+Live ingestion of meter readings.
+
+Readings arrive either as a batch POST (/ingest) or as export files dropped into
+a watched folder. They are appended to the in-memory meter store and only the
+structures they touch are updated:
+
+    - data[meter]           raw readings (same layout as data.json)
+    - calc_data             per-region / "moldova" 15-minute import/export deltas
+    - consumption_data      per-location total consumption (/consumptions)
+    - MeterRegistry         unique meters, first/last seen, per-file row counts
+    - TotalConsumption      first/last reading reducer behind consumption_data
+
+Everything else that derives from readings (e.g. the color frame cache)
+subscribes through `Ingestor.listeners` and is told which meters, regions and
+timestamps changed. Stores that need the readings themselves (e.g. the Parquet
+dataset) are added with `add_sink` and get each batch's appended readings as a
+Meter/Time/Import/Export frame. With an AnomalyDetector, every new delta is
+screened first: calc_data gets the repaired delta, and the frame's
+ImportFix/ExportFix columns carry repaired minus raw delta for delta stores.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from diff_data import DATA_DIR, CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
+from exports import EXPORT_TIME_FORMAT, iter_export_chunks, list_export_files
+from anomalies import SEED_READINGS
+
+log = logging.getLogger(__name__)
+
+WATCH_INTERVAL_SECONDS = 30
+# Export files already applied to the in-memory data, replayed at start (their
+# readings are not in data.json). Kept apart from the registry's file list,
+# which `python meter_registry.py` and idSum also fill.
+INGESTED_FILE = os.path.join(DATA_DIR, "ingested_files.json")
+
+
+class IngestEvent:
+    """What a single ingestion batch changed."""
+
+    def __init__(self, meters: set, regions: set, times: set, rows: int):
+        self.meters = meters
+        self.regions = regions
+        self.times = times  # datetimes of the ingested readings
+        self.rows = rows
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "meters": len(self.meters),
+            "regions": sorted(self.regions),
+            "first": str(min(self.times)) if self.times else None,
+            "last": str(max(self.times)) if self.times else None,
+        }
+
+
+def records_to_frame(records: list[dict]):
+    """
+    Normalize POSTed readings into a Meter/Time/Import/Export frame.
+    Each record may use the short keys ("Meter", "Clock", "Import", "Export")
+    or the OBIS column names used in data.json.
+    """
+    import pandas as pd
+
+    rows = []
+    for r in records:
+        rows.append((
+            r.get("Meter"),
+            r.get("Clock", r.get(CLOCK_COLMN_NAME)),
+            r.get("Import", r.get(IMPORT_COLMN_NAME)),
+            r.get("Export", r.get(EXPORT_COLMN_NAME)),
+        ))
+    df = pd.DataFrame(rows, columns=["Meter", "Clock", "Import", "Export"])
+    df["Time"] = pd.to_datetime(df["Clock"], format=EXPORT_TIME_FORMAT, errors="coerce")
+    df["Import"] = pd.to_numeric(df["Import"], errors="coerce")
+    df["Export"] = pd.to_numeric(df["Export"], errors="coerce")
+    df = df.dropna(subset=["Meter", "Time", "Import"])
+    df["Meter"] = df["Meter"].astype(str)
+    return df[["Meter", "Time", "Import", "Export"]].reset_index(drop=True)
+
+
+class Ingestor:
+    def __init__(self, data: dict, calc_data: list, meter_data: dict,
+                 consumption_data: dict, registry, totals, detector=None,
+                 files_path: str = INGESTED_FILE):
+        self.data = data
+        self.calc_data = calc_data
+        self.consumption_data = consumption_data
+        self.registry = registry
+        self.totals = totals
+        self.detector = detector
+        self.meter_to_location = {
+            str(m): location for location, meters in meter_data.items() for m in meters
+        }
+        self.listeners = []
+        self.sinks = []
+        self.files_path = files_path
+        self.files: list[str] = []
+        if os.path.exists(files_path):
+            with open(files_path, "r", encoding="utf-8") as f:
+                self.files = json.load(f)
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """`callback(event: IngestEvent)` is called after every ingested batch."""
+        self.listeners.append(callback)
+
+    def add_sink(self, callback):
+        """`callback(frame)` gets the readings each batch appended (not the ignored ones)."""
+        self.sinks.append(callback)
+
+    # ---------- entry points ----------
+    def ingest_records(self, records: list[dict]) -> IngestEvent:
+        return self.ingest_frame(records_to_frame(records))
+
+    def ingest_file(self, path: str) -> IngestEvent | None:
+        """Ingest one export file in chunks; returns None if it was ingested before."""
+        name = os.path.basename(path)
+        if name in self.files:
+            return None
+        events = []
+
+        def on_chunk(chunk):
+            events.append(self.ingest_frame(chunk, register=False))
+
+        if not self.registry.ingest_file(path, on_chunk=on_chunk):
+            # Counted by the registry already (CLI or idSum): apply it without counting it twice.
+            for chunk in iter_export_chunks(path):
+                if not chunk.empty:
+                    on_chunk(chunk)
+        self.files.append(name)
+        self._save_files()
+        self.registry.save()
+        if self.totals.files:
+            # Only a reducer folded from the exports (total_consumption.py) is kept on
+            # disk. The file is not added to its list: only the appended readings were
+            # folded in, so the CLI still folds the whole export.
+            self.totals.save()
+        if self.detector is not None:
+            self.detector.save()
+        return IngestEvent(
+            set().union(*(e.meters for e in events)),
+            set().union(*(e.regions for e in events)),
+            set().union(*(e.times for e in events)),
+            sum(e.rows for e in events),
+        )
+
+    def replay(self, folder: str) -> int:
+        """
+        Re-apply the exports listed in ingested_files.json after a restart: their
+        readings are not in data.json. Readings the meter store already holds are
+        skipped, and nothing is counted, flagged or saved again. Returns the rows
+        appended.
+        """
+        rows = 0
+        for name in self.files:
+            path = os.path.join(folder, name)
+            if not os.path.exists(path):
+                log.warning("ingested export %s is gone; its readings are not replayed", path)
+                continue
+            for chunk in iter_export_chunks(path):
+                if not chunk.empty:
+                    rows += self.ingest_frame(chunk, register=False, record=False).rows
+        return rows
+
+    def ingest_frame(self, df, register: bool = True, record: bool = True) -> IngestEvent:
+        """
+        Apply a normalized Meter/Time/Import/Export frame to every derived structure.
+        `register` counts it in the registry, `record` keeps the anomalies it flags.
+        """
+        df = df.sort_values(["Meter", "Time"], kind="stable")
+        with self._lock:
+            if register:
+                self.registry.observe_frame(df)
+            for meter in df["Meter"].unique():
+                self._seed_totals(meter)
+            old_totals = {m: self._meter_total(m) for m in df["Meter"].unique()}
+
+            meters, regions, times = set(), set(), set()
+            rows = 0
+            new_rows = []
+            for meter, group in df.groupby("Meter", sort=False):
+                appended = self._append_readings(meter, group, record)
+                if not appended:
+                    continue
+                # Only appended readings reach the reducer: older ones in the batch
+                # are history that consumption_data already covers.
+                for reading in (appended[0], appended[-1]):
+                    self.totals.update(meter, str(reading[0]), reading[1])
+                rows += len(appended)
+                meters.add(meter)
+                times.update(reading[0] for reading in appended)
+                if self.sinks:
+                    new_rows.extend((meter, *reading) for reading in appended)
+                location = self.meter_to_location.get(meter)
+                if location is not None:
+                    regions.add(location)
+                    self.consumption_data[location] = (
+                        self.consumption_data.get(location, 0)
+                        + self._meter_total(meter) - old_totals[meter]
+                    )
+
+        if new_rows:
+            self._write_sinks(new_rows)
+        event = IngestEvent(meters, regions, times, rows)
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception:
+                log.exception("ingest listener failed")
+        return event
+
+    # ---------- internals ----------
+    def _save_files(self):
+        os.makedirs(os.path.dirname(self.files_path) or ".", exist_ok=True)
+        tmp = self.files_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.files, f)
+        os.replace(tmp, self.files_path)
+
+    def _write_sinks(self, new_rows: list):
+        import pandas as pd
+
+        frame = pd.DataFrame(new_rows, columns=["Meter", "Time", "Import", "Export", "ImportFix", "ExportFix"])
+        for sink in self.sinks:
+            try:
+                sink(frame)
+            except Exception:
+                log.exception("ingest sink failed")
+
+    def _meter_total(self, meter: str) -> float:
+        state = self.totals.meters.get(meter)
+        return state[3] - state[1] if state else 0
+
+    def _seed_totals(self, meter: str):
+        """
+        Start the reducer of a meter it has never seen from the meter's first and
+        latest in-memory readings, so its state covers the meter's whole history and
+        only the readings appended after them change consumption_data.
+        """
+        rows = self.data.get(meter)
+        if meter in self.totals.meters or not rows:
+            return
+        for reading in (rows[0], rows[-1]):
+            if reading.get(IMPORT_COLMN_NAME) is None:
+                continue
+            ts = str(datetime.strptime(reading[CLOCK_COLMN_NAME], EXPORT_TIME_FORMAT))
+            self.totals.update(meter, ts, float(reading[IMPORT_COLMN_NAME]))
+
+    def _append_readings(self, meter: str, group, record: bool = True) -> list[tuple]:
+        """
+        Append readings newer than the meter's latest one and fold their deltas
+        into calc_data. Older or duplicate readings are ignored. Returns the
+        appended (time, import, export, import fix, export fix) tuples.
+        """
+        rows = self.data.setdefault(meter, [])
+        if self.detector is not None and not self.detector.seeded(meter):
+            self.detector.seed(meter, [r.get(IMPORT_COLMN_NAME) for r in rows[-SEED_READINGS:]])
+        prev = rows[-1] if rows else None
+        prev_time = datetime.strptime(prev[CLOCK_COLMN_NAME], EXPORT_TIME_FORMAT) if prev else None
+        location = self.meter_to_location.get(meter)
+
+        appended = []
+        for t, imp, exp in zip(group["Time"], group["Import"], group["Export"]):
+            t = t.to_pydatetime()
+            if prev_time is not None and t <= prev_time:
+                continue
+            reading = {
+                CLOCK_COLMN_NAME: t.strftime(EXPORT_TIME_FORMAT),
+                IMPORT_COLMN_NAME: float(imp),
+                EXPORT_COLMN_NAME: float(exp) if exp == exp else 0.0,
+            }
+            fix_imp = fix_exp = 0.0
+            if prev is not None:
+                dimp = reading[IMPORT_COLMN_NAME] - prev[IMPORT_COLMN_NAME]
+                dexp = reading[EXPORT_COLMN_NAME] - prev[EXPORT_COLMN_NAME]
+                if self.detector is not None:
+                    fixed_imp, fixed_exp, kind = self.detector.check(
+                        meter, str(t),
+                        (prev[IMPORT_COLMN_NAME], prev[EXPORT_COLMN_NAME]),
+                        (reading[IMPORT_COLMN_NAME], reading[EXPORT_COLMN_NAME]),
+                        record=record,
+                    )
+                    if kind is not None:
+                        fix_imp, fix_exp = fixed_imp - dimp, fixed_exp - dexp
+                        dimp, dexp = fixed_imp, fixed_exp
+                if location is not None:
+                    self._add_region_delta(location, str(t), dimp, dexp)
+            rows.append(reading)
+            appended.append((t, reading[IMPORT_COLMN_NAME], reading[EXPORT_COLMN_NAME], fix_imp, fix_exp))
+            prev, prev_time = reading, t
+        return appended
+
+    def _add_region_delta(self, location: str, key: str, dimp: float, dexp: float):
+        every, total = self.calc_data
+        for bucket in (every.setdefault(location, {}), total.setdefault("moldova", {})):
+            vals = bucket.setdefault(key, {"Import": 0.0, "Export": 0.0})
+            vals["Import"] += dimp
+            vals["Export"] += dexp
+
+
+class DeferredSink:
+    """
+    Sink for a store that is built in the background: frames ingested before
+    the store is attached are queued and replayed into it on attach (stores skip
+    readings they already hold), so ingestion never waits for the build.
+    """
+
+    def __init__(self, method: str = "on_ingest_frame"):
+        self.method = method
+        self.store = None
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def attach(self, store):
+        with self._lock:
+            for frame in self.pending:
+                getattr(store, self.method)(frame)
+            self.pending = []
+            self.store = store
+        return store
+
+    def __call__(self, frame):
+        with self._lock:
+            if self.store is None:
+                self.pending.append(frame)
+                return
+        getattr(self.store, self.method)(frame)
+
+
+class ExportWatcher(threading.Thread):
+    """Polls a drop folder and ingests every export file the ingestor has not applied yet."""
+
+    def __init__(self, ingestor: Ingestor, folder: str, interval: float = WATCH_INTERVAL_SECONDS):
+        super().__init__(name="export-watcher", daemon=True)
+        self.ingestor = ingestor
+        self.folder = folder
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def poll(self) -> list[str]:
+        ingested = []
+        for path in list_export_files(self.folder):
+            if os.path.basename(path) in self.ingestor.files:
+                continue
+            try:
+                event = self.ingestor.ingest_file(path)
+            except Exception:
+                log.exception("failed to ingest %s", path)
+                continue
+            if event is not None:
+                log.info("ingested %s: %s", path, event.to_dict())
+                ingested.append(path)
+        return ingested
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.poll()
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,78 @@
+"""
+Lazy initialization of the app's subsystems.
+
+Each subsystem (meter store, calc data, forecaster, AI summaries, ...) is a
+`Lazy` whose loader runs on first use, or earlier in a background warm-up
+thread, so importing app.py costs nothing and the first request for a cold
+subsystem simply waits for its loader.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Lazy:
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+        self.state = PENDING
+        self.error: Exception | None = None
+        self.load_seconds: float | None = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        """Return the value, loading it first if needed (exactly once across threads)."""
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state != READY:
+                self.state = LOADING
+                started = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.state = FAILED
+                    self.error = e
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self.state = READY
+                log.info("%s loaded in %.2fs", self.name, self.load_seconds)
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def status(self) -> dict:
+        out = {"state": self.state}
+        if self.load_seconds is not None:
+            out["seconds"] = round(self.load_seconds, 3)
+        if self.error is not None:
+            out["error"] = str(self.error)
+        return out
+
+
+def load_all(lazies):
+    """Load every subsystem in order, logging (not raising) failures."""
+    for lazy in lazies:
+        try:
+            lazy()
+        except Exception:
+            log.exception("warm-up of %s failed", lazy.name)
+
+
+def warm_up(lazies) -> threading.Thread:
+    """Load `lazies` in order on a background thread."""
+    thread = threading.Thread(target=load_all, args=(list(lazies),), name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,169 @@
+"""
+Incremental reader for the legacy data.json layout ({meter_id: [rows], ...}).
+
+iter_legacy() yields (meter_id, rows) one meter at a time while reading the
+file in chunks, so only one meter's readings are decoded at any moment. The
+first full pass also records where every meter's array starts and ends and
+saves it next to the file (data.json.idx.json); read_meter() then seeks
+straight to one meter without touching the rest of the file.
+
+Index layout:
+    {"size": bytes, "mtime": float, "meters": {meter_id: [offset, length], ...}}
+It is rebuilt whenever the data file's size or mtime no longer match.
+"""
+
+import codecs
+import json
+import os
+
+CHUNK_BYTES = 1 << 20
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+def index_path(path: str) -> str:
+    return str(path) + ".idx.json"
+
+
+class _Buffer:
+    """Decoded text of the file read so far, with the byte offset of its start."""
+
+    def __init__(self, f, chunk_bytes: int):
+        self.f = f
+        self.chunk_bytes = chunk_bytes
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0            # position in self.text
+        self.offset = 0         # byte offset of self.text[0]
+        self.eof = False
+
+    def fill(self, min_bytes: int | None = None) -> bool:
+        """Append the next chunk (at least min_bytes); False when nothing was left to read."""
+        if self.eof:
+            return False
+        raw = self.f.read(max(self.chunk_bytes, min_bytes or 0))
+        self.eof = not raw
+        # Drop what was consumed before growing the buffer.
+        consumed = self.text[:self.pos]
+        self.offset += len(consumed.encode("utf-8")) if not consumed.isascii() else len(consumed)
+        self.text = self.text[self.pos:] + self.utf8.decode(raw, final=self.eof)
+        self.pos = 0
+        return bool(raw)
+
+    def byte_pos(self, pos: int) -> int:
+        head = self.text[:pos]
+        return self.offset + (len(head) if head.isascii() else len(head.encode("utf-8")))
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_ws()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at byte {self.byte_pos(self.pos)}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value, reading more of the file until it is complete."""
+        self.skip_ws()
+        grow = self.chunk_bytes
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(grow):
+                    raise
+                grow *= 2       # doubling keeps re-parsing of long values linear overall
+                continue
+            # A number can stop at the end of the buffer: make sure it is really finished.
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            start, self.pos = self.pos, end
+            return value, start, end
+
+
+def iter_legacy(path: str, chunk_bytes: int = CHUNK_BYTES, build_index: bool = True):
+    """Yield (meter_id, rows) from a legacy data.json; saves the byte-offset index after a full pass."""
+    meters = {}
+    with open(path, "rb") as f:
+        buf = _Buffer(f, chunk_bytes)
+        buf.fill()
+        buf.expect("{")
+        if buf.peek() == "}":
+            buf.pos += 1
+        else:
+            while True:
+                meter_id, _, _ = buf.value()
+                buf.expect(":")
+                rows, start, end = buf.value()
+                if build_index:
+                    first = buf.byte_pos(start)
+                    meters[str(meter_id)] = [first, buf.byte_pos(end) - first]
+                yield str(meter_id), rows
+                sep = buf.peek()
+                buf.pos += 1
+                if sep == "}":
+                    break
+                if sep != ",":
+                    raise ValueError(f"Expected ',' or '}}' at byte {buf.byte_pos(buf.pos - 1)}")
+    if build_index:
+        try:
+            save_index(path, meters)
+        except OSError:
+            pass    # read-only data folder: read_meter() will stream instead
+
+
+def save_index(path: str, meters: dict):
+    st = os.stat(path)
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": st.st_size, "mtime": st.st_mtime, "meters": meters}, f)
+    os.replace(tmp, index_path(path))
+
+
+def load_index(path: str) -> dict | None:
+    """meter_id -> [offset, length], or None when there is no index or it is stale."""
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            idx = json.load(f)
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if idx.get("size") != st.st_size or idx.get("mtime") != st.st_mtime:
+        return None
+    return idx["meters"]
+
+
+def ensure_index(path: str) -> dict:
+    idx = load_index(path)
+    if idx is None:
+        idx = {}
+        for meter_id, _ in iter_legacy(path):
+            idx[meter_id] = None
+        idx = load_index(path) or idx
+    return idx
+
+
+def read_meter(path: str, meter_id) -> list | None:
+    """One meter's rows via the index (built by a streaming pass if needed); None if absent."""
+    idx = ensure_index(path)
+    meter_id = str(meter_id)
+    if meter_id not in idx:
+        return None
+    if idx[meter_id] is None:     # index could not be saved
+        return next(rows for m, rows in iter_legacy(path, build_index=False) if m == meter_id)
+    offset, length = idx[meter_id]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+
+def meter_ids(path: str) -> list[str]:
+    return list(ensure_index(path))
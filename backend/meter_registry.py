@@ -0,0 +1,162 @@
+"""
+Persistent registry of every meter seen in the export files.
+
+The registry is updated while files are ingested, so listing or counting meters
+(and spotting new or disappeared ones) is a read of meter_registry.json instead
+of a rescan of every export on disk.
+
+Layout of meter_registry.json:
+    {
+      "meters": { meter_id: {"first_seen": ts, "last_seen": ts, "rows": n}, ... },
+      "files":  { file_name: {"rows": n, "meters": n, "first": ts, "last": ts}, ... }
+    }
+Timestamps are stored as "YYYY-MM-DD HH:MM:SS" so they compare as strings.
+"""
+
+import json
+import os
+import threading
+
+from diff_data import DATA_DIR
+from exports import iter_export_chunks, list_export_files
+from total_consumption import EXPORTS_DIR
+
+REGISTRY_FILE = os.path.join(DATA_DIR, "meter_registry.json")
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class MeterRegistry:
+    def __init__(self, path: str = REGISTRY_FILE):
+        self.path = path
+        self.meters: dict[str, dict] = {}
+        self.files: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    # ---------- persistence ----------
+    @classmethod
+    def load(cls, path: str = REGISTRY_FILE) -> "MeterRegistry":
+        reg = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            reg.meters = raw.get("meters", {})
+            reg.files = raw.get("files", {})
+        return reg
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with self._lock:
+            payload = {"meters": self.meters, "files": self.files}
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+        os.replace(tmp, self.path)
+
+    # ---------- updates ----------
+    def observe(self, meter: str, first: str, last: str, rows: int):
+        """Merge a (first, last, rows) summary for one meter into the registry."""
+        with self._lock:
+            entry = self.meters.get(meter)
+            if entry is None:
+                self.meters[meter] = {"first_seen": first, "last_seen": last, "rows": rows}
+                return
+            if first < entry["first_seen"]:
+                entry["first_seen"] = first
+            if last > entry["last_seen"]:
+                entry["last_seen"] = last
+            entry["rows"] += rows
+
+    def observe_frame(self, df) -> int:
+        """Register a normalized Meter/Time frame (see exports.py). Returns row count."""
+        if df.empty:
+            return 0
+        summary = df.groupby("Meter")["Time"].agg(["min", "max", "size"])
+        firsts = summary["min"].dt.strftime(TS_FORMAT)
+        lasts = summary["max"].dt.strftime(TS_FORMAT)
+        for meter, first, last, rows in zip(summary.index, firsts, lasts, summary["size"]):
+            self.observe(str(meter), first, last, int(rows))
+        return len(df)
+
+    def ingest_file(self, path: str, force: bool = False, on_chunk=None) -> bool:
+        """
+        Register one export file. Files already in the registry are skipped.
+        `on_chunk`, if given, is called with every normalized chunk so callers
+        (e.g. live ingestion) can reuse the same single pass over the file.
+        """
+        name = os.path.basename(path)
+        if name in self.files and not force:
+            return False
+
+        rows = 0
+        meters = set()
+        first, last = None, None
+        for chunk in iter_export_chunks(path):
+            if chunk.empty:
+                continue
+            rows += self.observe_frame(chunk)
+            if on_chunk is not None:
+                on_chunk(chunk)
+            meters.update(chunk["Meter"].unique())
+            lo = chunk["Time"].min().strftime(TS_FORMAT)
+            hi = chunk["Time"].max().strftime(TS_FORMAT)
+            first = lo if first is None or lo < first else first
+            last = hi if last is None or hi > last else last
+
+        with self._lock:
+            self.files[name] = {"rows": rows, "meters": len(meters), "first": first, "last": last}
+        return True
+
+    def ingest_folder(self, folder: str = EXPORTS_DIR) -> list[str]:
+        """Register every export in `folder` not seen before; returns the new file names."""
+        added = [os.path.basename(p) for p in list_export_files(folder) if self.ingest_file(p)]
+        if added:
+            self.save()
+        return added
+
+    # ---------- queries ----------
+    def count(self) -> int:
+        return len(self.meters)
+
+    def ids(self) -> list[str]:
+        return sorted(self.meters, key=lambda x: (len(x), x))
+
+    def new_meters(self, known) -> list[str]:
+        """Meters in the registry that are not in `known`."""
+        known = {str(m) for m in known}
+        return [m for m in self.ids() if m not in known]
+
+    def missing_meters(self, known) -> list[str]:
+        """Meters in `known` that the registry has never seen."""
+        return sorted({str(m) for m in known} - self.meters.keys(), key=lambda x: (len(x), x))
+
+    def disappeared(self, since: str | None = None) -> list[str]:
+        """
+        Meters whose last reading is older than `since` ("YYYY-MM-DD HH:MM:SS").
+        Defaults to the newest timestamp in the registry, i.e. meters absent
+        from the latest export.
+        """
+        if since is None:
+            since = max((e["last_seen"] for e in self.meters.values()), default=None)
+            if since is None:
+                return []
+        return [m for m in self.ids() if self.meters[m]["last_seen"] < since]
+
+    def summary(self) -> dict:
+        return {
+            "meters": self.count(),
+            "files": len(self.files),
+            "rows": sum(f["rows"] for f in self.files.values()),
+            "first": min((e["first_seen"] for e in self.meters.values()), default=None),
+            "last": max((e["last_seen"] for e in self.meters.values()), default=None),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else EXPORTS_DIR
+    registry = MeterRegistry.load()
+    added = registry.ingest_folder(folder)
+    print(f"Registered {len(added)} new file(s) from {folder}")
+    print(registry.summary())
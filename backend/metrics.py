@@ -0,0 +1,215 @@
+"""
+Request-level latency instrumentation and Prometheus-style metrics.
+
+    instrument(app)          per-route timing, in-flight count, payload sizes
+    with span("stage"): ...  time a sub-stage (data lookup, aggregation, model inference, LLM call)
+    cache_hit(name) / cache_miss(name)
+    render()                 Prometheus text exposition, served on /metrics
+
+Set METRICS_LOG_JSON=1 to also log one structured JSON line per request
+(route, status, duration, sizes and the spans recorded while serving it).
+
+Metrics live in process memory: with several gunicorn workers every worker
+exposes its own numbers, the scraper adds them up.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+LOG_JSON = os.getenv("METRICS_LOG_JSON") == "1"
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name + _labels(self.label_names, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += n
+                yield (
+                    self.name + "_bucket" + _labels(self.label_names + ("le",), labels + (bound,)),
+                    cumulative,
+                )
+            yield self.name + "_sum" + _labels(self.label_names, labels), series[-1]
+            yield self.name + "_count" + _labels(self.label_names, labels), cumulative
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("route", "method", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being served.", ("route",))
+REQUEST_BYTES = Histogram(
+    "http_request_size_bytes", "Request body size by route.", ("route",), SIZE_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size by route.", ("route",), SIZE_BUCKETS
+)
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in a sub-stage.", ("stage",))
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result.", ("cache", "result"))
+
+METRICS = [REQUEST_SECONDS, REQUESTS_IN_FLIGHT, REQUEST_BYTES, RESPONSE_BYTES, STAGE_SECONDS,
+           CACHE_REQUESTS]
+
+# Spans recorded by the current thread's request (for the JSON request log).
+_local = threading.local()
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        spans = getattr(_local, "spans", None)
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.inc(cache, "hit")
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.inc(cache, "miss")
+
+
+def cache_ratios() -> dict:
+    """{cache: hit ratio} over the process lifetime."""
+    totals: dict[str, list] = {}
+    for (cache, result), n in list(CACHE_REQUESTS._values.items()):
+        t = totals.setdefault(cache, [0, 0])
+        t[0 if result == "hit" else 1] += n
+    return {cache: hits / (hits + misses) for cache, (hits, misses) in totals.items() if hits + misses}
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, value in metric.samples():
+            lines.append(f"{name} {value}")
+    lines.append("# HELP cache_hit_ratio Cache hits over lookups.")
+    lines.append("# TYPE cache_hit_ratio gauge")
+    for cache, ratio in cache_ratios().items():
+        lines.append(f'cache_hit_ratio{{cache="{cache}"}} {ratio}')
+    return "\n".join(lines) + "\n"
+
+
+def instrument(app):
+    """Register the Flask hooks that time every request."""
+    from flask import g, request
+
+    if LOG_JSON and not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+
+    def route_label():
+        rule = request.url_rule
+        return rule.rule if rule is not None else "<unmatched>"
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_route = route_label()
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(g.metrics_route)
+        _local.spans = []
+        if request.content_length:
+            REQUEST_BYTES.observe(request.content_length, g.metrics_route)
+
+    @app.after_request
+    def _record(response):
+        route = g.get("metrics_route")
+        if route is None:
+            return response
+        elapsed = time.perf_counter() - g.metrics_started
+        REQUEST_SECONDS.observe(elapsed, route, request.method, response.status_code)
+        # Streamed responses (e.g. /color/stream) have no length up front.
+        size = None if response.is_streamed else response.calculate_content_length()
+        if size is not None:
+            RESPONSE_BYTES.observe(size, route)
+        if LOG_JSON:
+            log.info(json.dumps({
+                "route": route,
+                "method": request.method,
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 3),
+                "request_bytes": request.content_length or 0,
+                "response_bytes": size,
+                "spans": {stage: round(s * 1000, 3) for stage, s in getattr(_local, "spans", [])},
+            }))
+        return response
+
+    @app.teardown_request
+    def _finish(exc):
+        route = g.pop("metrics_route", None)
+        if route is not None:
+            REQUESTS_IN_FLIGHT.dec(route)
+        _local.spans = None
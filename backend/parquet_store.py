@@ -0,0 +1,216 @@
+"""
+Readings as a Hive-partitioned Parquet dataset (needs the optional pyarrow).
+
+    data/parquet/date=2025-06-07/region=Chisinau/part-<id>-0.parquet
+                 columns: meter (string), time (timestamp), import, export (float64)
+
+Ingestion appends every batch it adds to the meter store (Ingestor sink), and
+`python backend/parquet_store.py backfill [data.json]` loads the history once,
+one batch of meters at a time. Rows are sorted by meter and time inside each
+file, so the row-group min/max statistics of both columns are tight.
+
+query() turns meter, region and time-range filters into a dataset filter:
+date and region prune whole partition directories, meter and time prune row
+groups inside the files that remain, so a one-day query reads one day.
+Meters missing from meter_to_location.json are stored under region=unknown.
+"""
+
+import os
+import sys
+import threading
+import uuid
+from datetime import timedelta
+
+from diff_data import DATA_DIR
+from rollups import parse_time
+
+DATASET_DIR = os.path.join(DATA_DIR, "parquet")
+UNKNOWN_REGION = "unknown"
+ROW_GROUP_ROWS = 64_000
+BACKFILL_BATCH_METERS = 500
+
+
+def available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The Parquet dataset needs pyarrow (pip install pyarrow)") from e
+    return pa, ds, pq
+
+
+def _schema():
+    pa, _, _ = _require_pyarrow()
+    return pa.schema([
+        ("meter", pa.string()), ("time", pa.timestamp("s")), ("import", pa.float64()),
+        ("export", pa.float64()), ("date", pa.string()), ("region", pa.string()),
+    ])
+
+
+def _partitioning():
+    pa, ds, _ = _require_pyarrow()
+    return ds.partitioning(pa.schema([("date", pa.string()), ("region", pa.string())]), flavor="hive")
+
+
+class ParquetStore:
+    def __init__(self, meter_data: dict, root: str = DATASET_DIR, row_group_rows: int = ROW_GROUP_ROWS):
+        self.root = root
+        self.row_group_rows = row_group_rows
+        self.meter_to_location = {
+            str(m): location for location, meters in meter_data.items() for m in meters
+        }
+        self._lock = threading.Lock()
+
+    # ---------- writing ----------
+    def _table(self, df):
+        pa, _, _ = _require_pyarrow()
+        df = df.sort_values(["Meter", "Time"], kind="stable")
+        return pa.table({
+            "meter": pa.array(df["Meter"].astype(str).to_numpy(), pa.string()),
+            "time": pa.array(df["Time"].to_numpy(dtype="datetime64[s]"), pa.timestamp("s")),
+            "import": pa.array(df["Import"].to_numpy(dtype="float64"), pa.float64()),
+            "export": pa.array(df["Export"].fillna(0.0).to_numpy(dtype="float64"), pa.float64()),
+            "date": pa.array(df["Time"].dt.strftime("%Y-%m-%d").to_numpy(), pa.string()),
+            "region": pa.array(
+                df["Meter"].astype(str).map(self.meter_to_location).fillna(UNKNOWN_REGION).to_numpy(),
+                pa.string()),
+        })
+
+    def write_frame(self, df) -> int:
+        """Append a Meter/Time/Import/Export frame as new files in its date/region partitions."""
+        if df is None or len(df) == 0:
+            return 0
+        _, ds, _ = _require_pyarrow()
+        table = self._table(df)
+        with self._lock:
+            ds.write_dataset(
+                table, self.root, format="parquet",
+                partitioning=_partitioning(),
+                basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=self.row_group_rows,
+                min_rows_per_group=min(self.row_group_rows, len(table)),
+            )
+        return len(table)
+
+    def on_ingest_frame(self, df):
+        """Ingestor sink: persist the readings a batch appended."""
+        self.write_frame(df)
+
+    def backfill(self, readings, batch_meters: int = BACKFILL_BATCH_METERS) -> int:
+        """Write (meter_id, rows) pairs (e.g. readings.iter_readings()) a batch of meters at a time."""
+        import pandas as pd
+        from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
+        from exports import EXPORT_TIME_FORMAT
+
+        written, batch = 0, []
+
+        def flush():
+            nonlocal written, batch
+            if batch:
+                df = pd.DataFrame(batch, columns=["Meter", "Clock", "Import", "Export"])
+                df["Time"] = pd.to_datetime(df["Clock"], format=EXPORT_TIME_FORMAT, errors="coerce")
+                df["Import"] = pd.to_numeric(df["Import"], errors="coerce")
+                df["Export"] = pd.to_numeric(df["Export"], errors="coerce")
+                written += self.write_frame(df.dropna(subset=["Time", "Import"]))
+            batch = []
+
+        for i, (meter, rows) in enumerate(readings, 1):
+            batch.extend(
+                (str(meter), r.get(CLOCK_COLMN_NAME), r.get(IMPORT_COLMN_NAME), r.get(EXPORT_COLMN_NAME))
+                for r in rows
+            )
+            if i % batch_meters == 0:
+                flush()
+        flush()
+        return written
+
+    def compact(self, date: str) -> int:
+        """Merge the small per-batch files of one day into one sorted file per region."""
+        pa, ds, pq = _require_pyarrow()
+        day_dir = os.path.join(self.root, f"date={date}")
+        if not os.path.isdir(day_dir):
+            return 0
+        merged = 0
+        with self._lock:
+            for region_dir in sorted(os.listdir(day_dir)):
+                folder = os.path.join(day_dir, region_dir)
+                files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".parquet")]
+                if len(files) < 2:
+                    continue
+                table = ds.dataset(files, format="parquet").to_table().sort_by([("meter", "ascending"),
+                                                                                 ("time", "ascending")])
+                out = os.path.join(folder, f"part-{uuid.uuid4().hex[:12]}-0.parquet")
+                pq.write_table(table, out + ".tmp", row_group_size=self.row_group_rows)
+                os.replace(out + ".tmp", out)
+                for f in files:
+                    os.remove(f)
+                merged += len(files)
+        return merged
+
+    # ---------- reading ----------
+    def dataset(self):
+        _, ds, _ = _require_pyarrow()
+        # With the schema given, an empty dataset still has every column to filter on.
+        return ds.dataset(self.root, format="parquet", partitioning=_partitioning(), schema=_schema())
+
+    def query(self, meters=None, regions=None, start=None, end=None, columns=None):
+        """
+        Readings with meter in `meters`, region in `regions` and start <= time < end
+        (any filter may be None) as a pandas frame. Times may be datetimes or strings.
+        Before the first write the frame is empty but keeps the column types.
+        """
+        _, ds, _ = _require_pyarrow()
+        start, end = parse_time(start), parse_time(end)
+        if not os.path.isdir(self.root):
+            table = _schema().empty_table()
+            return (table.select(columns) if columns else table).to_pandas()
+
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field("date") >= start.strftime("%Y-%m-%d"))
+            conditions.append(ds.field("time") >= start)
+        if end is not None:
+            # `end` is exclusive; midnight of a day does not need that day's partition.
+            last_day = (end - timedelta(seconds=1)).strftime("%Y-%m-%d")
+            conditions.append(ds.field("date") <= last_day)
+            conditions.append(ds.field("time") < end)
+        if regions:
+            conditions.append(ds.field("region").isin([str(r) for r in regions]))
+        if meters:
+            conditions.append(ds.field("meter").isin([str(m) for m in meters]))
+
+        expr = None
+        for cond in conditions:
+            expr = cond if expr is None else expr & cond
+        table = self.dataset().to_table(filter=expr, columns=columns)
+        return table.to_pandas()
+
+    def dates(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(self.root) if d.startswith("date="))
+
+
+if __name__ == "__main__":
+    import json
+    from readings import iter_readings, data_file
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("backfill", "compact"):
+        sys.exit("usage: parquet_store.py backfill [data.json] | compact <YYYY-MM-DD>")
+    with open(os.path.join(DATA_DIR, "daniel_data", "meter_to_location.json"), encoding="utf-8") as f:
+        store = ParquetStore(json.load(f))
+    if sys.argv[1] == "backfill":
+        src = data_file(sys.argv[2] if len(sys.argv) > 2 else os.path.join(DATA_DIR, "data.json"))
+        print(f"wrote {store.backfill(iter_readings(src))} readings to {store.root}")
+    else:
+        print(f"merged {store.compact(sys.argv[2])} files")
@@ -0,0 +1,132 @@
+"""
+Prefix sums of import/export per region over the 15-minute grid.
+
+    cum[series, k] = consumption booked in grid buckets 0..k (inclusive)
+
+so the consumption of any series over [start, end) is cum[end - 1] - cum[start - 1]:
+two lookups however long the range, for any number of ranges at once
+(week-over-week comparisons are just two ranges) and for every position of a
+moving window. The booking rules, series keys, caching next to the data file and
+ingest updates are those of rollups.DeltaStore; a delta landing in bucket b is
+added to cum[b:], which on ingest is the short tail of the grid.
+
+Range bounds are snapped down to the grid. Sums stay float64: a running total
+over months would lose whole kWh in float32. The grid grows a week at a time
+and keeps everything (no retention), as any range needs the sums before it;
+only region series are indexed (book_meters = False), so that is a few MB per
+year. Per-meter ranges come from the rollups (Rollups.range_sums).
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from rollups import DeltaStore, parse_time, parse_resolution
+
+STEP_SECONDS = 900
+GRAIN = "quarter"
+
+
+def _stamp(t: datetime) -> str:
+    return t.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class PrefixIndex(DeltaStore):
+    grains = {GRAIN: STEP_SECONDS}
+    blocks = {GRAIN: 672}       # a week of quarters
+    retain = {}
+    dtype = np.float64
+    book_meters = False
+    cache_suffix = ".prefix.npz"
+
+    # ---------- upkeep ----------
+    def _book(self, series: np.ndarray, offset: np.ndarray, deltas: np.ndarray):
+        cum = self.sums[GRAIN]
+        bucket = offset // STEP_SECONDS - self.base[GRAIN]
+        lo = int(bucket.min())
+        rows, inverse = np.unique(series, return_inverse=True)
+        added = np.zeros((len(rows), cum.shape[1] - lo, 2))
+        np.add.at(added, (inverse, bucket - lo), deltas)
+        np.cumsum(added, axis=1, out=added)
+        cum[rows, lo:] += added
+
+    def _extend(self, lo: np.datetime64, hi: np.datetime64):
+        old_width = self.sums[GRAIN].shape[1]
+        old_start = self.origin + timedelta(seconds=self.base[GRAIN] * STEP_SECONDS) if old_width else None
+        super()._extend(lo, hi)
+        cum = self.sums[GRAIN]
+        if old_width and cum.shape[1] > old_width:
+            # New buckets before the old ones stay 0; new ones after them carry the last sum.
+            front = int((old_start - self.origin).total_seconds()) // STEP_SECONDS - self.base[GRAIN]
+            cum[:, front + old_width:] = cum[:, front + old_width - 1:front + old_width]
+
+    # ---------- queries ----------
+    def _bucket(self, t: datetime) -> int:
+        """Grid bucket holding t (t snapped down to the grid)."""
+        return int((t - self.origin).total_seconds() // STEP_SECONDS)
+
+    def _before(self, rows: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+        """[rows, len(buckets), 2]: consumption booked before each bucket."""
+        cum = self.sums[GRAIN]
+        idx = np.clip(buckets - 1 - self.base[GRAIN], -1, cum.shape[1] - 1)
+        out = cum[rows[:, None], np.maximum(idx, 0)[None, :]]
+        out[:, idx < 0] = 0.0
+        return out
+
+    def totals(self, keys: list[str], ranges: list) -> list[dict]:
+        """Import/export of each key over each (start, end) range, end exclusive."""
+        with self._lock:
+            if self.origin is None:
+                raise ValueError("No readings have been indexed yet")
+            bounds = []
+            for start, end in ranges:
+                start, end = parse_time(start), parse_time(end)
+                if start is None or end is None or end <= start:
+                    raise ValueError("every range needs a start before its end")
+                bounds.append((self._bucket(start), self._bucket(end)))
+            bounds = np.array(bounds, dtype=np.int64).reshape(-1, 2)
+            starts, ends = bounds[:, 0], bounds[:, 1]
+            rows = self.series_rows(keys)
+            sums = self._before(rows, ends) - self._before(rows, starts)
+
+        grid = timedelta(seconds=STEP_SECONDS)
+        return [
+            {
+                "start": _stamp(self.origin + int(a) * grid),
+                "end": _stamp(self.origin + int(b) * grid),
+                "series": {
+                    key: {"import": float(sums[k, r, 0]), "export": float(sums[k, r, 1])}
+                    for k, key in enumerate(keys)
+                },
+            }
+            for r, (a, b) in enumerate(zip(starts, ends))
+        ]
+
+    def moving(self, keys: list[str], window, start=None, end=None) -> dict:
+        """
+        Consumption over the trailing `window` (see rollups.parse_resolution) ending
+        at every grid point in (start, end]; bounds default to the indexed range.
+        """
+        width = parse_resolution(window)
+        if width is None:
+            raise ValueError("moving sums need a window")
+        with self._lock:
+            if self.origin is None:
+                raise ValueError("No readings have been indexed yet")
+            a = self._bucket(parse_time(start) or self.origin)
+            b = self._bucket(parse_time(end) or self.end)
+            if b <= a:
+                raise ValueError("end must be after start")
+            ends = np.arange(a, b, dtype=np.int64) + 1
+            rows = self.series_rows(keys)
+            sums = self._before(rows, ends) - self._before(rows, ends - width // STEP_SECONDS)
+
+        grid = timedelta(seconds=STEP_SECONDS)
+        return {
+            "window": width,
+            "times": [_stamp(self.origin + int(k) * grid) for k in ends],
+            "series": {
+                key: {"import": sums[k, :, 0].tolist(), "export": sums[k, :, 1].tolist()}
+                for k, key in enumerate(keys)
+            },
+        }
@@ -0,0 +1,201 @@
+"""
+Opt-in request profiling.
+
+PROFILING (environment) selects which requests are profiled:
+    off     (default) nothing
+    header  only requests sent with "X-Profile: 1"
+    all     every request
+
+A profiled request runs under cProfile; if it reaches the forecaster, the
+GlobalLSTMForecaster rollout is additionally recorded with torch.profiler.
+Artifacts are written to PROFILE_DIR and the response carries X-Profile-Id:
+
+    GET /profiles                       recent profiles
+    GET /profiles/<id>/top?n=25&sort=   top-N hotspots (sort: cumulative | tottime | calls)
+    GET /profiles/<id>/prof             cProfile stats file (snakeviz, pstats)
+    GET /profiles/<id>/trace            torch.profiler Chrome trace (chrome://tracing)
+
+Only one request is profiled at a time per process; concurrent requests that
+ask for a profile are served unprofiled and get X-Profile-Skipped.
+"""
+
+import cProfile
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MODE = os.getenv("PROFILING", "off")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "energyx-profiles"))
+MAX_PROFILES = int(os.getenv("PROFILE_KEEP", "50"))
+SORT_KEYS = {"cumulative": "cumulative", "tottime": "tottime", "calls": "calls"}
+
+_busy = threading.Lock()
+_local = threading.local()
+# profile id -> metadata, oldest first
+_index: "OrderedDict[str, dict]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _wants_profile(request) -> bool:
+    if MODE == "all":
+        return True
+    return MODE == "header" and request.headers.get("X-Profile") == "1"
+
+
+def _artifact(profile_id: str, suffix: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}{suffix}")
+
+
+def _remember(profile_id: str, meta: dict):
+    with _index_lock:
+        _index[profile_id] = meta
+        while len(_index) > MAX_PROFILES:
+            old_id, _ = _index.popitem(last=False)
+            for suffix in (".prof", ".torch.json"):
+                try:
+                    os.remove(_artifact(old_id, suffix))
+                except OSError:
+                    pass
+
+
+def current_profile_id() -> str | None:
+    return getattr(_local, "profile_id", None)
+
+
+@contextmanager
+def torch_trace(name: str):
+    """Record the wrapped block with torch.profiler when the current request is profiled."""
+    profile_id = current_profile_id()
+    if profile_id is None:
+        yield
+        return
+
+    from torch.profiler import profile, ProfilerActivity
+
+    with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prof.export_chrome_trace(_artifact(profile_id, ".torch.json"))
+    _local.torch_top = prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=25)
+    _local.torch_name = name
+
+
+def top_hotspots(profile_id: str, n: int = 25, sort: str = "cumulative") -> list[dict]:
+    stats = pstats.Stats(_artifact(profile_id, ".prof"))
+    stats.sort_stats(SORT_KEYS.get(sort, "cumulative"))
+    rows = []
+    for func in stats.fcn_list[:n]:
+        cc, nc, tt, ct, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            "function": name,
+            "file": filename,
+            "line": line,
+            "calls": nc,
+            "primitive_calls": cc,
+            "tottime_s": round(tt, 6),
+            "cumtime_s": round(ct, 6),
+        })
+    return rows
+
+
+def instrument(app):
+    """Register the profiling hooks and the /profiles routes."""
+    from flask import g, jsonify, request, send_file
+
+    @app.before_request
+    def _start_profile():
+        if MODE == "off" or not _wants_profile(request) or request.path.startswith("/profiles"):
+            return
+        if not _busy.acquire(blocking=False):
+            g.profile_skipped = True
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active.
+            _busy.release()
+            g.profile_skipped = True
+            return
+        g.profiler = profiler
+        g.profile_started = time.perf_counter()
+        _local.profile_id = uuid.uuid4().hex[:12]
+
+    @app.after_request
+    def _stop_profile(response):
+        if g.get("profile_skipped"):
+            response.headers["X-Profile-Skipped"] = "busy"
+            return response
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        profile_id = _local.profile_id
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(_artifact(profile_id, ".prof"))
+            _remember(profile_id, {
+                "id": profile_id,
+                "route": request.url_rule.rule if request.url_rule else request.path,
+                "path": request.path,
+                "status": response.status_code,
+                "seconds": round(time.perf_counter() - g.profile_started, 6),
+                "created": time.time(),
+                "torch_trace": getattr(_local, "torch_name", None),
+                "torch_top": getattr(_local, "torch_top", None),
+            })
+            response.headers["X-Profile-Id"] = profile_id
+        finally:
+            _local.profile_id = None
+            _local.torch_top = None
+            _local.torch_name = None
+            _busy.release()
+        return response
+
+    @app.teardown_request
+    def _release(exc):
+        # Request failed before after_request ran: drop the half-finished profile.
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _local.profile_id = None
+            _busy.release()
+
+    @app.route("/profiles")
+    def list_profiles():
+        with _index_lock:
+            metas = [{k: v for k, v in m.items() if k != "torch_top"} for m in _index.values()]
+        return jsonify({"mode": MODE, "profiles": list(reversed(metas))})
+
+    @app.route("/profiles/<profile_id>/top")
+    def profile_top(profile_id):
+        meta = _index.get(profile_id)
+        if meta is None:
+            return jsonify({"error": f"Unknown profile '{profile_id}'"}), 404
+        n = request.args.get("n", 25, type=int)
+        sort = request.args.get("sort", "cumulative")
+        return jsonify({
+            **{k: v for k, v in meta.items() if k != "torch_top"},
+            "hotspots": top_hotspots(profile_id, n, sort),
+            "torch_top": meta.get("torch_top"),
+        })
+
+    @app.route("/profiles/<profile_id>/prof")
+    def profile_download(profile_id):
+        if profile_id not in _index:
+            return jsonify({"error": f"Unknown profile '{profile_id}'"}), 404
+        return send_file(_artifact(profile_id, ".prof"), as_attachment=True,
+                         download_name=f"{profile_id}.prof")
+
+    @app.route("/profiles/<profile_id>/trace")
+    def profile_trace(profile_id):
+        path = _artifact(profile_id, ".torch.json")
+        if profile_id not in _index or not os.path.exists(path):
+            return jsonify({"error": f"No torch trace for profile '{profile_id}'"}), 404
+        return send_file(path, as_attachment=True, download_name=f"{profile_id}.torch.json")
@@ -0,0 +1,256 @@
+"""
+Meter readings on disk: the legacy data.json layout and the compact one.
+
+    legacy   { meter_id: [ {"Clock (...)": t, "Active Energy Import (...)": i,
+                            "Active Energy Export (...)": e}, ... ], ... }
+
+    compact  { "schema": {"format": "meter-readings", "version": 1,
+                          "columns": {"clock": "Clock (...)", "import": "...", "export": "..."},
+                          "time_format": "%d.%m.%Y %H:%M:%S"},
+               "meters": { meter_id: {"clock": [...], "import": [...], "export": [...]}, ... } }
+
+The compact layout names the OBIS columns once in the schema header instead of
+once per reading, which shrinks the file and its parse time. load_readings()
+reads either layout and returns the legacy in-memory shape (meter_id -> list of
+row dicts), so app.py, diff_data and the ingest pipeline work unchanged -- and
+hold the same row dicts in memory as before, whichever file they were read
+from. Only load_columns(), which returns MeterColumns (one array per column),
+is lighter in memory; it serves the batch readers that only need the series.
+iter_readings() yields one meter at a time and streams legacy files
+(legacy_stream), for conversion and batch scripts that should not hold the
+whole document.
+
+    python backend/readings.py data.json data.compact.json     # convert
+"""
+
+import json
+import os
+import sys
+from array import array
+
+from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME, DATA_DIR
+
+FORMAT = "meter-readings"
+VERSION = 1
+TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+SCHEMA = {
+    "format": FORMAT,
+    "version": VERSION,
+    "columns": {"clock": CLOCK_COLMN_NAME, "import": IMPORT_COLMN_NAME, "export": EXPORT_COLMN_NAME},
+    "time_format": TIME_FORMAT,
+}
+
+NAN = float("nan")
+HEADER_CHARS = 1 << 16      # read by is_compact_file; the schema header is far smaller
+
+LEGACY_DATA_FILE = os.path.join(DATA_DIR, "data.json")
+COMPACT_DATA_FILE = os.path.join(DATA_DIR, "data.compact.json")   # compact_path(LEGACY_DATA_FILE)
+
+
+def _float(value) -> float:
+    return NAN if value is None else float(value)
+
+
+def _none(value: float):
+    return None if value != value else value
+
+
+class MeterColumns:
+    """
+    The readings of one meter as parallel arrays (clock strings, import and export
+    floats). Missing values (null, or a column absent from a compact file) are NaN;
+    rows() and to_json() give them back as None.
+    """
+
+    __slots__ = ("clock", "imp", "exp")
+
+    def __init__(self, clock=None, imp=None, exp=None):
+        self.clock = list(clock or [])
+        n = len(self.clock)
+        self.imp = array("d", map(_float, [None] * n if imp is None else imp))
+        self.exp = array("d", map(_float, [None] * n if exp is None else exp))
+
+    @classmethod
+    def from_rows(cls, rows) -> "MeterColumns":
+        cols = cls()
+        for r in rows:
+            cols.append(r)
+        return cols
+
+    def append(self, row: dict):
+        self.clock.append(row[CLOCK_COLMN_NAME])
+        self.imp.append(_float(row.get(IMPORT_COLMN_NAME)))
+        self.exp.append(_float(row.get(EXPORT_COLMN_NAME)))
+
+    def __len__(self):
+        return len(self.clock)
+
+    def rows(self) -> list[dict]:
+        return [
+            {CLOCK_COLMN_NAME: t, IMPORT_COLMN_NAME: _none(i), EXPORT_COLMN_NAME: _none(e)}
+            for t, i, e in zip(self.clock, self.imp, self.exp)
+        ]
+
+    def to_json(self) -> dict:
+        return {"clock": self.clock, "import": list(map(_none, self.imp)), "export": list(map(_none, self.exp))}
+
+
+def is_compact(raw) -> bool:
+    return isinstance(raw, dict) and isinstance(raw.get("schema"), dict) \
+        and raw["schema"].get("format") == FORMAT
+
+
+def _check_schema(schema: dict):
+    if schema.get("version", 0) > VERSION:
+        raise ValueError(f"Readings schema version {schema.get('version')} is newer than {VERSION}")
+    # Files written with other column names still load; rows get the names of the header.
+    return schema.get("columns", SCHEMA["columns"])
+
+
+def _compact_columns(raw) -> dict:
+    _check_schema(raw["schema"])
+    return {
+        meter: MeterColumns(cols.get("clock"), cols.get("import"), cols.get("export"))
+        for meter, cols in raw["meters"].items()
+    }
+
+
+def _iter_compact_rows(raw):
+    names = _check_schema(raw["schema"])
+    clock, imp, exp = names["clock"], names["import"], names["export"]
+    for meter, cols in raw["meters"].items():
+        n = len(cols.get("clock", []))
+        yield meter, [
+            {clock: t, imp: i, exp: e}
+            for t, i, e in zip(cols["clock"], cols.get("import") or [None] * n, cols.get("export") or [None] * n)
+        ]
+
+
+def _compact_rows(raw) -> dict:
+    return dict(_iter_compact_rows(raw))
+
+
+def compact_path(path: str) -> str:
+    """data.json -> data.compact.json (next to it)."""
+    return os.path.splitext(str(path))[0] + ".compact.json"
+
+
+def data_file(path: str = LEGACY_DATA_FILE) -> str:
+    """The readings file to load for `path`: its compact twin once converted, else `path` itself."""
+    compact = compact_path(path)
+    return compact if os.path.exists(compact) else str(path)
+
+
+def _read(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_readings(path: str | None = None) -> dict:
+    """meter_id -> list of row dicts (the legacy in-memory layout), from either file layout."""
+    raw = _read(path or data_file())
+    return _compact_rows(raw) if is_compact(raw) else raw
+
+
+def _skip_ws(text: str, i: int) -> int:
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return i
+
+
+def is_compact_file(path: str) -> bool:
+    """
+    is_compact() of a file without parsing its readings: only the first member
+    of the top-level object is decoded. write_compact puts the "schema" header
+    first; files with "meters" first are parsed whole, legacy ones start with a
+    meter id.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(HEADER_CHARS)
+    decoder = json.JSONDecoder()
+    i = _skip_ws(head, 0)
+    if head[i:i + 1] != "{":
+        return False
+    try:
+        key, i = decoder.raw_decode(head, _skip_ws(head, i + 1))
+        if key == "meters":
+            return is_compact(_read(path))
+        i = _skip_ws(head, i)
+        if key != "schema" or head[i:i + 1] != ":":
+            return False
+        schema, _ = decoder.raw_decode(head, _skip_ws(head, i + 1))
+    except ValueError:
+        return False
+    return is_compact({"schema": schema})
+
+
+def iter_readings(path: str | None = None):
+    """
+    (meter_id, rows) pairs from either layout. Legacy files are streamed one
+    meter at a time (legacy_stream), compact ones are parsed whole.
+    """
+    path = path or data_file()
+    if is_compact_file(path):
+        yield from _iter_compact_rows(_read(path))
+    else:
+        from legacy_stream import iter_legacy
+        yield from iter_legacy(path)
+
+
+def iter_meter_rows(pairs, columns=(CLOCK_COLMN_NAME, IMPORT_COLMN_NAME)):
+    """
+    (meter_id, rows holding every one of `columns`) from a meter_id -> rows dict
+    or (meter_id, rows) pairs such as iter_readings(); non-list entries are skipped.
+    """
+    for meter_id, rows in pairs.items() if isinstance(pairs, dict) else pairs:
+        if isinstance(rows, list):
+            yield str(meter_id), [r for r in rows if all(c in r for c in columns)]
+
+
+def load_columns(path: str | None = None) -> dict:
+    """meter_id -> MeterColumns, from either file layout."""
+    path = path or data_file()
+    if is_compact_file(path):
+        return _compact_columns(_read(path))
+    return {meter: MeterColumns.from_rows(rows) for meter, rows in iter_readings(path)}
+
+
+def _rows_to_json(rows) -> dict:
+    # Values are copied as they are (ints stay ints), unlike MeterColumns' float arrays.
+    return {
+        "clock": [r[CLOCK_COLMN_NAME] for r in rows],
+        "import": [r.get(IMPORT_COLMN_NAME) for r in rows],
+        "export": [r.get(EXPORT_COLMN_NAME) for r in rows],
+    }
+
+
+def write_compact(meters, out_path: str):
+    """
+    Write (meter_id, rows or MeterColumns) pairs as a compact file, one meter at
+    a time, via a temp file and os.replace.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + ".tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{"schema": ' + json.dumps(SCHEMA) + ', "meters": {')
+        for meter, readings in meters:
+            cols = readings.to_json() if isinstance(readings, MeterColumns) else _rows_to_json(readings)
+            f.write(("," if count else "") + json.dumps(str(meter)) + ":" + json.dumps(cols))
+            count += 1
+        f.write("}}")
+    os.replace(tmp, out_path)
+    return count
+
+
+def convert(legacy_path: str = LEGACY_DATA_FILE, out_path: str | None = None) -> int:
+    """Convert a legacy data.json to the compact layout, streaming it; returns the number of meters."""
+    return write_compact(iter_readings(legacy_path), out_path or compact_path(legacy_path))
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else LEGACY_DATA_FILE
+    dst = sys.argv[2] if len(sys.argv) > 2 else compact_path(src)
+    n = convert(src, dst)
+    print(f"wrote {n} meters to {dst} ({os.path.getsize(dst) / 2**20:.1f} MB, "
+          f"legacy {os.path.getsize(src) / 2**20:.1f} MB)")
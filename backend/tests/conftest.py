@@ -0,0 +1,5 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "api")]
@@ -0,0 +1,33 @@
+import pytest
+
+from anomalies import import_deltas, WARMUP
+
+
+def cumulative(deltas, start=100.0):
+    values = [start]
+    for d in deltas:
+        values.append(values[-1] + d)
+    return values
+
+
+def test_plain_deltas_skip_broken_pairs():
+    assert import_deltas([10.0, 12.0, None, 15.0, 14.0]) == [2.0, -1.0]
+
+
+def test_repair_replaces_a_reset_by_the_expected_delta():
+    values = cumulative([2.0] * WARMUP) + [3.0, 5.0]
+    deltas = import_deltas(values, repair=True)
+    assert deltas[WARMUP] == pytest.approx(2.0)     # the counter fell back to 3
+    assert deltas[-1] == pytest.approx(2.0)
+
+
+def test_repair_zeroes_a_small_backward_step():
+    deltas = import_deltas([100.0, 102.0, 101.5, 103.0], repair=True)
+    assert deltas == pytest.approx([2.0, 0.0, 1.5])
+
+
+def test_repair_caps_a_spike_after_warmup():
+    values = cumulative([1.0] * WARMUP + [500.0, 1.0])
+    deltas = import_deltas(values, repair=True)
+    assert deltas[WARMUP] == pytest.approx(1.0)
+    assert import_deltas(values)[WARMUP] == pytest.approx(500.0)
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+import pytest
+
+from frames import FrameHub
+
+
+class FakeCache:
+    def get(self, time_value):
+        return {"t": time_value}
+
+
+@pytest.mark.parametrize("minutes", [0, -15])
+def test_replay_rejects_a_step_that_never_reaches_the_end(minutes):
+    with pytest.raises(ValueError):
+        FrameHub(FakeCache()).replay("01.01.2025 00:00:00", "01.01.2025 01:00:00", timedelta(minutes=minutes), 0)
+
+
+def test_replay_yields_every_step_up_to_the_end():
+    frames = FrameHub(FakeCache()).replay("01.01.2025 00:00:00", "01.01.2025 00:30:00", timedelta(minutes=15), 0)
+    assert [f["time"] for f in frames] == ["01.01.2025 00:00:00", "01.01.2025 00:15:00", "01.01.2025 00:30:00"]
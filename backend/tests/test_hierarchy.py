@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+from model import hierarchy     # noqa: E402
+
+
+@pytest.fixture
+def paths(tmp_path):
+    files = {
+        "device_ids": ["1", "2", "3"],
+        "regions": {"regions": ["north", "south", "east"]},
+        "meter_map": {"north": ["1", "2"], "south": ["3"]},     # east has no meters
+    }
+    out = {}
+    for name, value in files.items():
+        out[name] = str(tmp_path / f"{name}.json")
+        with open(out[name], "w", encoding="utf-8") as f:
+            json.dump(value, f)
+    out["regions_panel"] = str(tmp_path / "processed_regions.json")
+    with open(out["regions_panel"], "w") as f:
+        json.dump([[0.0]], f)
+    return out
+
+
+def run(monkeypatch, paths, method):
+    direct_rows = []
+
+    def direct(ckpt, data_path, n, rows=None):
+        rows = np.arange(3) if rows is None else np.asarray(rows)
+        direct_rows.append(rows.tolist())
+        return np.full((len(rows), n), 10.0)
+
+    monkeypatch.setattr(hierarchy, "forecast_meters", lambda ckpt, path, n: np.ones((3, n)))
+    monkeypatch.setattr(hierarchy, "forecast_regions_direct", direct)
+    result = hierarchy.forecast_hierarchy(
+        2, method, meter_data_path="unused", region_data_path=paths["regions_panel"],
+        device_ids_path=paths["device_ids"], regions_path=paths["regions"], meter_map_path=paths["meter_map"])
+    return result, direct_rows
+
+
+def test_bottom_up_only_forecasts_regions_without_meters(monkeypatch, paths):
+    result, direct_rows = run(monkeypatch, paths, "bottom_up")
+    assert direct_rows == [[2]]
+    assert result["regions"] == {"north": [2.0, 2.0], "south": [1.0, 1.0], "east": [10.0, 10.0]}
+    assert result[hierarchy.NATIONAL] == [13.0, 13.0]
+
+
+def test_proportional_matches_every_direct_forecast(monkeypatch, paths):
+    result, direct_rows = run(monkeypatch, paths, "proportional")
+    assert direct_rows == [[0, 1, 2]]
+    assert result["regions"]["north"] == pytest.approx([10.0, 10.0])
+
+
+def test_ols_splits_the_gap_over_meters_and_region():
+    meters, regions = hierarchy.reconcile(np.ones((3, 1)), np.array([0, 0, -1]), 1, np.array([[5.0]]), "ols")
+    assert meters[:, 0] == pytest.approx([2.0, 2.0, 1.0])       # gap 3 over 2 meters + 1
+    assert regions[0, 0] == pytest.approx(4.0)
@@ -0,0 +1,111 @@
+import pytest
+
+from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
+from anomalies import AnomalyDetector
+from ingest import Ingestor, ExportWatcher
+from meter_registry import MeterRegistry
+from total_consumption import TotalConsumption
+
+
+def reading(clock: str, imp: float, exp: float = 0.0) -> dict:
+    return {CLOCK_COLMN_NAME: clock, IMPORT_COLMN_NAME: imp, EXPORT_COLMN_NAME: exp}
+
+
+def record(clock: str, imp: float, meter: str = "1") -> dict:
+    return {"Meter": meter, "Clock": clock, "Import": imp, "Export": 0.0}
+
+
+def make_ingestor(tmp_path, detector=None):
+    """An ingestor over data.json-like history, as after a (re)start."""
+    data = {"1": [reading("01.01.2025 00:00:00", 100.0), reading("01.01.2025 01:00:00", 110.0)]}
+    return Ingestor(
+        data, [{}, {}], {"north": ["1"]}, {"north": 10.0},
+        MeterRegistry(str(tmp_path / "registry.json")),
+        TotalConsumption.load(str(tmp_path / "totals.json")),
+        detector, files_path=str(tmp_path / "ingested.json"),
+    )
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    return make_ingestor(tmp_path)
+
+
+@pytest.fixture
+def exports(tmp_path):
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    (folder / "export.csv").write_text("1,01.01.2025 02:00:00,\"115,0\",\"0,0\"\n", encoding="utf-8")
+    return folder
+
+
+def test_new_readings_add_their_consumption(ingestor):
+    event = ingestor.ingest_records([record("01.01.2025 02:00:00", 115.0), record("01.01.2025 03:00:00", 118.0)])
+    assert event.rows == 2
+    assert ingestor.consumption_data["north"] == pytest.approx(18.0)
+    assert ingestor.calc_data[1]["moldova"]["2025-01-01 02:00:00"]["Import"] == pytest.approx(5.0)
+
+
+def test_overlapping_batch_only_counts_the_new_reading(ingestor):
+    event = ingestor.ingest_records([record("01.01.2025 00:00:00", 100.0), record("01.01.2025 02:00:00", 115.0)])
+    assert event.rows == 1
+    assert ingestor.consumption_data["north"] == pytest.approx(15.0)
+    assert len(ingestor.data["1"]) == 3
+
+
+def test_replayed_batch_changes_nothing(ingestor):
+    ingestor.ingest_records([record("01.01.2025 02:00:00", 115.0)])
+    event = ingestor.ingest_records([record("01.01.2025 01:00:00", 110.0), record("01.01.2025 02:00:00", 115.0)])
+    assert event.rows == 0
+    assert ingestor.consumption_data["north"] == pytest.approx(15.0)
+
+
+def test_unknown_meter_starts_from_its_first_reading(ingestor):
+    ingestor.meter_to_location["2"] = "north"
+    ingestor.ingest_records([record("01.01.2025 00:00:00", 50.0, "2"), record("01.01.2025 01:00:00", 54.0, "2")])
+    assert ingestor.consumption_data["north"] == pytest.approx(14.0)
+
+
+def test_watcher_ingests_files_the_registry_already_counted(ingestor, exports):
+    ingestor.registry.ingest_folder(str(exports))       # e.g. `python meter_registry.py` on the same folder
+
+    watcher = ExportWatcher(ingestor, str(exports))
+    assert watcher.poll() == [str(exports / "export.csv")]
+    assert ingestor.consumption_data["north"] == pytest.approx(15.0)
+    assert ingestor.registry.meters["1"]["rows"] == 1
+    assert watcher.poll() == []
+
+
+def test_reducer_is_seeded_from_the_first_reading(ingestor):
+    ingestor.ingest_records([record("01.01.2025 02:00:00", 115.0)])
+    assert ingestor.totals.meter_totals()["1"] == pytest.approx(15.0)
+
+
+def test_watcher_does_not_persist_a_reducer_the_exports_did_not_build(ingestor, exports, tmp_path):
+    ExportWatcher(ingestor, str(exports)).poll()
+    assert ingestor.totals.files == []
+    assert not (tmp_path / "totals.json").exists()
+
+
+def test_reducer_from_the_exports_keeps_the_watched_file_for_the_cli(ingestor, exports, tmp_path):
+    ingestor.totals.files.append("older.csv")       # folded by total_consumption.py
+    ExportWatcher(ingestor, str(exports)).poll()
+    saved = TotalConsumption.load(str(tmp_path / "totals.json"))
+    assert saved.files == ["older.csv"]
+    assert saved.meter_totals()["1"] == pytest.approx(15.0)
+
+
+def test_restart_replays_the_ingested_exports(exports, tmp_path):
+    detector = AnomalyDetector(str(tmp_path / "anomalies.json"))
+    first = make_ingestor(tmp_path, detector)
+    (exports / "export.csv").write_text("1,01.01.2025 02:00:00,\"2,0\",\"0,0\"\n", encoding="utf-8")   # a reset
+    ExportWatcher(first, str(exports)).poll()
+    assert len(detector.events) == 1
+
+    restarted = make_ingestor(tmp_path, detector)
+    assert restarted.replay(str(exports)) == 1
+    assert restarted.data["1"][-1][IMPORT_COLMN_NAME] == pytest.approx(2.0)
+    assert restarted.consumption_data == pytest.approx(first.consumption_data)
+    assert restarted.calc_data == first.calc_data
+    assert len(detector.events) == 1
+    assert restarted.replay(str(exports)) == 0
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+import legacy_stream
+from legacy_stream import iter_legacy, load_index, read_meter, meter_ids
+
+DATA = {
+    "7": [{"Clock": "01.01.2025 00:00:00", "Import": 1.5}, {"Clock": "01.01.2025 00:15:00", "Import": 12345.25}],
+    "Chișinău-12": [{"Clock": "01.01.2025 00:00:00", "Import": 9, "Note": "contor înlocuit"}],
+    "30": [],
+    "4": [{"Clock": "01.01.2025 00:00:00", "Import": 1e3}],
+}
+
+
+@pytest.fixture(params=[None, 2], ids=["compact", "indented"])
+def data_file(tmp_path, request):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(DATA, ensure_ascii=False, indent=request.param), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 64, 1 << 20])
+def test_streams_every_meter_in_order(data_file, chunk_bytes):
+    assert list(iter_legacy(data_file, chunk_bytes=chunk_bytes)) == list(DATA.items())
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 1 << 20])
+def test_index_offsets_point_at_each_meter_array(data_file, chunk_bytes):
+    list(iter_legacy(data_file, chunk_bytes=chunk_bytes))
+    index = load_index(data_file)
+    assert list(index) == list(DATA)
+    raw = open(data_file, "rb").read()
+    for meter, (offset, length) in index.items():
+        assert json.loads(raw[offset:offset + length]) == DATA[meter]
+
+
+def test_read_meter_builds_the_index_once(data_file, monkeypatch):
+    assert read_meter(data_file, "Chișinău-12") == DATA["Chișinău-12"]
+    monkeypatch.setattr(legacy_stream, "iter_legacy", lambda *a, **k: pytest.fail("index not reused"))
+    assert read_meter(data_file, 4) == DATA["4"]
+    assert read_meter(data_file, "missing") is None
+    assert meter_ids(data_file) == list(DATA)
+
+
+def test_stale_index_is_rebuilt(data_file):
+    list(iter_legacy(data_file))
+    changed = dict(DATA, **{"7": DATA["7"] + [{"Clock": "01.01.2025 00:30:00", "Import": 13000.0}]})
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump(changed, f, ensure_ascii=False)
+    os.utime(data_file, (1, 1))
+    assert load_index(data_file) is None
+    assert read_meter(data_file, "4") == DATA["4"]
+    assert read_meter(data_file, "7") == changed["7"]
+
+
+def test_unsaved_index_falls_back_to_streaming(data_file, monkeypatch):
+    def fail(*_):
+        raise OSError("read-only")
+    monkeypatch.setattr(legacy_stream, "save_index", fail)
+    assert read_meter(data_file, "4") == DATA["4"]
+
+
+@pytest.mark.parametrize("text, expected", [("{}", []), ('{ "1" : [] }', [("1", [])])])
+def test_small_objects(tmp_path, text, expected):
+    path = tmp_path / "data.json"
+    path.write_text(text)
+    assert list(iter_legacy(str(path), chunk_bytes=1)) == expected
+
+
+def test_malformed_file_raises(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text('{"1": [] "2": []}')
+    with pytest.raises(ValueError, match="byte 9"):
+        list(iter_legacy(str(path)))
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+from parquet_store import ParquetStore     # noqa: E402
+
+COLUMNS = ["meter", "time", "import", "export", "region"]
+
+
+def frame(times, meter="1"):
+    return pd.DataFrame({"Meter": meter, "Time": pd.to_datetime(times), "Import": 1.0, "Export": 0.0})
+
+
+@pytest.mark.parametrize("create_root", [False, True], ids=["missing", "empty"])
+def test_query_before_the_first_write_is_empty_but_typed(tmp_path, create_root):
+    root = tmp_path / "parquet"
+    if create_root:
+        root.mkdir()
+    df = ParquetStore({}, root=str(root)).query(start="2025-01-01", end="2025-01-02", columns=COLUMNS)
+    assert df.empty and list(df.columns) == COLUMNS
+    assert df["time"].dt.strftime("%Y-%m-%d").tolist() == []
+
+
+def test_query_filters_by_time_and_region(tmp_path):
+    store = ParquetStore({"north": ["1"]}, root=str(tmp_path / "parquet"))
+    store.write_frame(frame(["2025-01-01 23:45", "2025-01-02 00:00", "2025-01-02 00:15"]))
+    store.write_frame(frame(["2025-01-02 00:00"], meter="2"))
+    df = store.query(regions=["north"], start="2025-01-02", end="2025-01-02 00:15:00", columns=COLUMNS)
+    assert df["time"].dt.strftime("%H:%M").tolist() == ["00:00"]
+    assert df["meter"].tolist() == ["1"]
+    with pytest.raises(ValueError):
+        store.query(start="yesterday")
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+import pytest
+
+from prefix_index import PrefixIndex
+from rollups import meter_key, region_key, TOTAL_REGION
+from test_rollups import START, METERS, readings, brute_force
+
+
+@pytest.fixture
+def index():
+    data = {str(m): readings(m, days=21) for m in (1, 2, 3)}
+    return data, PrefixIndex.build(data, METERS)
+
+
+def test_totals_match_the_readings(index):
+    data, prefix = index
+    ranges = [
+        (START, START + timedelta(days=21)),
+        (START + timedelta(hours=5, minutes=15), START + timedelta(days=9, hours=2, minutes=45)),
+        (START + timedelta(days=20), START + timedelta(days=30)),       # past the last reading
+    ]
+    result = prefix.totals([region_key("north"), region_key(TOTAL_REGION)], ranges)
+    for (start, end), got in zip(ranges, result):
+        assert got["series"][region_key("north")]["import"] == pytest.approx(
+            brute_force(data, ["1", "2"], start, end), rel=1e-9)
+        assert got["series"][region_key(TOTAL_REGION)]["import"] == pytest.approx(
+            brute_force(data, ["1", "2", "3"], start, end), rel=1e-9)
+
+
+def test_bounds_snap_down_to_the_grid(index):
+    data, prefix = index
+    [got] = prefix.totals([region_key("south")], [(START + timedelta(minutes=20), START + timedelta(hours=1, minutes=5))])
+    assert (got["start"], got["end"]) == ("2025-01-06 00:15:00", "2025-01-06 01:00:00")
+    assert got["series"][region_key("south")]["import"] == pytest.approx(
+        brute_force(data, ["3"], START + timedelta(minutes=15), START + timedelta(hours=1)))
+
+
+def test_moving_sums_trail_the_window(index):
+    data, prefix = index
+    result = prefix.moving([region_key("north")], "2h", START + timedelta(days=3), START + timedelta(days=3, hours=4))
+    ends = [START + timedelta(days=3, minutes=15 * (k + 1)) for k in range(16)]
+    assert result["series"][region_key("north")]["import"] == pytest.approx(
+        [brute_force(data, ["1", "2"], t - timedelta(hours=2), t) for t in ends], rel=1e-9)
+
+
+def test_meters_are_not_indexed(index):
+    _, prefix = index
+    with pytest.raises(KeyError):
+        prefix.totals([meter_key("1")], [(START, START + timedelta(days=1))])
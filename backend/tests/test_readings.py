@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import readings
+from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
+
+LEGACY = {
+    "7": [
+        {CLOCK_COLMN_NAME: "01.01.2025 00:00:00", IMPORT_COLMN_NAME: 1.5, EXPORT_COLMN_NAME: 0.0},
+        {CLOCK_COLMN_NAME: "01.01.2025 00:15:00", IMPORT_COLMN_NAME: 2.0, EXPORT_COLMN_NAME: 0.25},
+    ],
+    "12": [{CLOCK_COLMN_NAME: "01.01.2025 00:00:00", IMPORT_COLMN_NAME: 9.0, EXPORT_COLMN_NAME: 1.0}],
+}
+
+
+@pytest.fixture
+def legacy_file(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(LEGACY), encoding="utf-8")
+    return str(path)
+
+
+def test_convert_round_trips(legacy_file):
+    assert readings.convert(legacy_file) == 2
+    compact = readings.compact_path(legacy_file)
+    assert readings.data_file(legacy_file) == compact
+    assert readings.load_readings(compact) == LEGACY
+    assert dict(readings.iter_readings(compact)) == LEGACY
+    assert readings.load_columns(compact)["7"].rows() == LEGACY["7"]
+
+
+@pytest.mark.parametrize("indent, schema_first", [(None, True), (2, True), (None, False), (4, False)])
+def test_compact_detection_ignores_layout(tmp_path, indent, schema_first):
+    meters = {"7": readings._rows_to_json(LEGACY["7"])}
+    raw = {"schema": readings.SCHEMA, "meters": meters} if schema_first else \
+        {"meters": meters, "schema": readings.SCHEMA}
+    path = tmp_path / "data.compact.json"
+    path.write_text(" \n" + json.dumps(raw, indent=indent), encoding="utf-8")
+    assert readings.is_compact_file(str(path)) == readings.is_compact(raw) is True
+    assert readings.load_readings(str(path)) == {"7": LEGACY["7"]}
+
+
+def test_legacy_and_foreign_files_are_not_compact(legacy_file, tmp_path):
+    assert not readings.is_compact_file(legacy_file)
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"schema": {"format": "something-else"}, "meters": {}}), encoding="utf-8")
+    assert not readings.is_compact_file(str(other))
+    assert dict(readings.iter_readings(legacy_file)) == LEGACY
+
+
+def test_iter_meter_rows_keeps_rows_with_every_column():
+    rows = [{"clock": "a", "import": 1}, {"clock": "b"}, {"import": 2}]
+    pairs = [(7, rows), ("8", "not rows")]
+    assert list(readings.iter_meter_rows(pairs, ("clock", "import"))) == [("7", [rows[0]])]
+    assert list(readings.iter_meter_rows({"9": rows}, ("clock",))) == [("9", rows[:2])]
+
+
+NULL_ROWS = [
+    {CLOCK_COLMN_NAME: "01.01.2025 00:00:00", IMPORT_COLMN_NAME: None, EXPORT_COLMN_NAME: 0.0},
+    {CLOCK_COLMN_NAME: "01.01.2025 00:15:00", IMPORT_COLMN_NAME: 0.0, EXPORT_COLMN_NAME: None},
+]
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["legacy", "compact"])
+def test_null_readings_load_as_nan_in_either_format(tmp_path, compact):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"5": NULL_ROWS}), encoding="utf-8")
+    if compact:
+        readings.convert(str(path))
+        path = readings.compact_path(str(path))
+    cols = readings.load_columns(str(path))["5"]
+    assert cols.imp[0] != cols.imp[0] and cols.imp[1] == 0.0      # NaN, and a real 0 stays 0
+    assert cols.exp[0] == 0.0 and cols.exp[1] != cols.exp[1]
+    assert cols.rows() == NULL_ROWS
+    assert readings.load_readings(str(path))["5"] == NULL_ROWS
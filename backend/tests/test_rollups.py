@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
+from exports import EXPORT_TIME_FORMAT
+from ingest import DeferredSink
+from rollups import Rollups, meter_key, region_key, TOTAL_REGION
+
+START = datetime(2025, 1, 6)     # a Monday
+METERS = {"north": ["1", "2"], "south": ["3"]}
+
+
+def readings(meter: int, days: int, step_minutes: int = 15) -> list[dict]:
+    """Cumulative readings whose delta at step k is (meter + k % 7) / 10."""
+    rng = np.random.default_rng(meter)
+    rows, total = [], 1000.0
+    for k in range(days * 24 * 60 // step_minutes + 1):
+        total += (meter + k % 7) / 10
+        t = START + timedelta(minutes=k * step_minutes)
+        rows.append({CLOCK_COLMN_NAME: t.strftime(EXPORT_TIME_FORMAT), IMPORT_COLMN_NAME: total,
+                     EXPORT_COLMN_NAME: float(rng.integers(0, 3))})
+    return rows
+
+
+def brute_force(data: dict, meters: list[str], start: datetime, end: datetime) -> float:
+    """Import consumed over [start, end): deltas of the readings in (start, end]."""
+    total = 0.0
+    for m in meters:
+        rows = data[m]
+        for prev, cur in zip(rows, rows[1:]):
+            t = datetime.strptime(cur[CLOCK_COLMN_NAME], EXPORT_TIME_FORMAT)
+            if start < t <= end:
+                total += cur[IMPORT_COLMN_NAME] - prev[IMPORT_COLMN_NAME]
+    return total
+
+
+@pytest.fixture
+def data():
+    return {str(m): readings(m, days=21) for m in (1, 2, 3)}
+
+
+def frame(rows: list[dict], meter: str) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "Meter": meter,
+        "Time": pd.to_datetime([r[CLOCK_COLMN_NAME] for r in rows], format=EXPORT_TIME_FORMAT),
+        "Import": [r[IMPORT_COLMN_NAME] for r in rows],
+        "Export": [r[EXPORT_COLMN_NAME] for r in rows],
+    })
+    return df
+
+
+@pytest.mark.parametrize("start, end, resolution", [
+    (START, START + timedelta(days=21), None),
+    (START + timedelta(hours=5), START + timedelta(days=3, hours=7), "hour"),
+    (START + timedelta(days=2), START + timedelta(days=16), "day"),
+    (START, START + timedelta(weeks=3), "week"),
+])
+def test_range_sums_match_the_readings(data, start, end, resolution):
+    store = Rollups.build(data, METERS)
+    keys = [meter_key("1"), region_key("north"), region_key(TOTAL_REGION)]
+    result = store.query(keys, start, end, resolution)
+    got = {key: sum(result["series"][key]["import"]) for key in keys}
+    assert got[meter_key("1")] == pytest.approx(brute_force(data, ["1"], start, end), rel=1e-5)
+    assert got[region_key("north")] == pytest.approx(brute_force(data, ["1", "2"], start, end), rel=1e-5)
+    assert got[region_key(TOTAL_REGION)] == pytest.approx(brute_force(data, ["1", "2", "3"], start, end), rel=1e-5)
+
+
+def test_hourly_steps_follow_the_booking_rule(data):
+    store = Rollups.build(data, METERS)
+    result = store.query([meter_key("1")], START, START + timedelta(hours=3), "hour")
+    for i, value in enumerate(result["series"][meter_key("1")]["import"]):
+        hour = START + timedelta(hours=i)
+        assert value == pytest.approx(brute_force(data, ["1"], hour, hour + timedelta(hours=1)), rel=1e-5)
+
+
+def test_hours_older_than_the_window_raise(data, monkeypatch):
+    monkeypatch.setitem(Rollups.retain, "hour", 7 * 86_400)
+    store = Rollups.build(data, METERS)
+    with pytest.raises(ValueError, match="only kept from"):
+        store.query([meter_key("1")], START, START + timedelta(hours=1), "hour")
+    # the coarser grains still hold them
+    day = store.query([meter_key("1")], START, START + timedelta(days=1), "day")
+    assert sum(day["series"][meter_key("1")]["import"]) == pytest.approx(
+        brute_force(data, ["1"], START, START + timedelta(days=1)), rel=1e-5)
+
+
+def test_older_readings_move_the_origin_back(data):
+    early = {m: rows[:len(rows) // 2 + 1] for m, rows in data.items()}
+    late = {m: rows[len(rows) // 2:] for m, rows in data.items()}
+    store = Rollups.build(late, METERS)
+    for m, rows in early.items():
+        store.last.pop(m)       # as if the older export arrived first
+        store.on_ingest_frame(frame(rows, m))
+    end = START + timedelta(days=21)
+    result = store.query([region_key(TOTAL_REGION)], START, end)
+    # the late half starts at the seam reading, whose delta comes with the early half
+    expected = brute_force(data, ["1", "2", "3"], START, end)
+    assert sum(result["series"][region_key(TOTAL_REGION)]["import"]) == pytest.approx(expected, rel=1e-5)
+
+
+def test_cache_round_trip(data, tmp_path):
+    source = tmp_path / "data.json"
+    source.write_text("{}")
+    built = Rollups.load_or_build(data, METERS, str(source))
+    loaded = Rollups.load(Rollups.cache_path(str(source)), str(source))
+    assert loaded is not None
+    args = ([meter_key("3")], START, START + timedelta(days=7), "day")
+    assert loaded.query(*args) == built.query(*args)
+
+
+def test_deferred_sink_replays_frames_into_the_store(data):
+    sink = DeferredSink()
+    head = {m: rows[:-4] for m, rows in data.items()}
+    sink(frame(data["1"][-8:], "1"))        # ingested while the store builds
+    store = sink.attach(Rollups.build(head, METERS))
+    sink(frame(data["1"][-8:], "1"))        # replayed: nothing new
+    end = START + timedelta(days=21)
+    result = store.query([meter_key("1")], START, end)
+    assert sum(result["series"][meter_key("1")]["import"]) == pytest.approx(
+        brute_force(data, ["1"], START, end), rel=1e-5)
+
+
+@pytest.mark.parametrize("start, end", [
+    (START + timedelta(hours=5), START + timedelta(days=17, hours=3)),     # weeks, days and hours
+    (START + timedelta(days=1, minutes=40), START + timedelta(days=1, hours=2, minutes=10)),
+])
+def test_range_sums_combine_the_grains(data, start, end):
+    store = Rollups.build(data, METERS)
+    rows = store.series_rows([meter_key("1"), meter_key("3")])
+    a, b, sums = store.range_sums(rows, start, end)
+    assert (a.minute, b.minute) == (0, 0)   # snapped down to whole hours
+    assert sums[:, 0] == pytest.approx([brute_force(data, ["1"], a, b), brute_force(data, ["3"], a, b)], rel=1e-5)
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from rollups import Rollups
+from top_k import HeavyConsumers, top_k
+from test_rollups import START, METERS, readings, brute_force
+
+
+def test_top_k_orders_the_largest_first():
+    values = np.array([3.0, 9.0, 1.0, 9.0, 5.0])
+    assert top_k(values, 3).tolist() == [1, 3, 4]
+    assert top_k(values, 10).tolist() == [1, 3, 4, 0, 2]
+    assert top_k(values, 0).tolist() == []
+
+
+def test_heavy_consumers_of_a_region():
+    data = {str(m): readings(m, days=10) for m in (1, 2, 3)}
+    engine = HeavyConsumers(Rollups.build(data, METERS))
+    start, end = START + timedelta(days=2, hours=3), START + timedelta(days=9)
+    result = engine.query("moldova", start, end, k=2)
+    assert [m["meter"] for m in result["meters"]] == ["3", "2"]
+    assert result["meters"][0]["import"] == pytest.approx(brute_force(data, ["3"], start, end), rel=1e-5)
+    assert [m["meter"] for m in engine.query("north", start, end, k=5)["meters"]] == ["2", "1"]
+    with pytest.raises(KeyError):
+        engine.query("east", start, end)
@@ -0,0 +1,124 @@
+"""
+Heavy consumers: the k meters of a region with the largest import (or export)
+over an interval.
+
+HeavyConsumers sums every meter of the region over the interval from the
+rollups (Rollups.range_sums: whole weeks, days, then hours, vectorized over the
+meters) and picks the k largest with np.argpartition (O(n)) before sorting only
+those k. RunningTopK keeps the answer for the most recent
+intervals of every region: it listens to ingest events and recomputes only the
+intervals and regions a batch touched, so the live "top meters this hour" is
+read from memory.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from rollups import TOTAL_REGION, meter_key, parse_resolution
+
+DEFAULT_K = 50
+RUNNING_INTERVAL = "hour"
+RUNNING_KEEP = 48
+COLUMNS = ("import", "export")
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, largest first (ties keep index order)."""
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-values, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.lexsort((part, -values[part]))]
+
+
+class HeavyConsumers:
+    def __init__(self, index):
+        self.index = index
+        self._regions: dict[str, tuple[list[str], np.ndarray]] = {}
+        self._indexed = -1
+        self._lock = threading.Lock()
+
+    def region_meters(self, region: str) -> tuple[list[str], np.ndarray]:
+        """(meter ids, rollup rows) of a region's rolled-up meters; "moldova" is all mapped ones."""
+        with self._lock:
+            if self._indexed != len(self.index.index):     # new meters were indexed
+                self._regions.clear()
+                self._indexed = len(self.index.index)
+            if region not in self._regions:
+                meters = [
+                    m for m, location in self.index.meter_to_location.items()
+                    if (region == TOTAL_REGION or location == region) and meter_key(m) in self.index.index
+                ]
+                rows = np.array([self.index.index[meter_key(m)] for m in meters], dtype=np.int64)
+                self._regions[region] = (meters, rows)
+            return self._regions[region]
+
+    def query(self, region: str, start, end, k: int = DEFAULT_K, by: str = "import") -> dict:
+        if by not in COLUMNS:
+            raise ValueError(f"by must be one of {COLUMNS}")
+        meters, rows = self.region_meters(region)
+        if not meters:
+            raise KeyError(region)
+        start, end, sums = self.index.range_sums(rows, start, end)
+        picked = top_k(sums[:, COLUMNS.index(by)], k)
+        return {
+            "region": region,
+            "start": start.strftime("%Y-%m-%d %H:%M:%S"),
+            "end": end.strftime("%Y-%m-%d %H:%M:%S"),
+            "by": by,
+            "meters": [
+                {"meter": meters[i], "import": float(sums[i, 0]), "export": float(sums[i, 1])}
+                for i in picked
+            ],
+        }
+
+
+class RunningTopK:
+    """The top `k` per region for each of the last `keep` intervals, refreshed on ingest."""
+
+    def __init__(self, engine: HeavyConsumers, interval=RUNNING_INTERVAL, k: int = DEFAULT_K,
+                 keep: int = RUNNING_KEEP):
+        self.engine = engine
+        self.interval = timedelta(seconds=parse_resolution(interval))
+        self.k = k
+        self.keep = keep
+        # (region, by) -> {interval start: result}
+        self.latest: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def _interval_start(self, t: datetime) -> datetime:
+        # Readings close the interval before them (see rollups): 14:00 belongs to 13:00-14:00.
+        origin = self.engine.index.origin
+        return origin + ((t - timedelta(seconds=1) - origin) // self.interval) * self.interval
+
+    def refresh(self, region: str, start: datetime):
+        for by in COLUMNS:
+            result = self.engine.query(region, start, start + self.interval, self.k, by)
+            with self._lock:
+                results = self.latest.setdefault((region, by), {})
+                results[result["start"]] = result
+                for old in sorted(results)[:-self.keep]:
+                    del results[old]
+
+    def on_ingest(self, event):
+        if not event.times or self.engine.index.origin is None:
+            return
+        starts = sorted({self._interval_start(t) for t in event.times})[-self.keep:]
+        for region in sorted(event.regions) + [TOTAL_REGION]:
+            for start in starts:
+                self.refresh(region, start)
+
+    def get(self, region: str, k: int = DEFAULT_K, by: str = "import") -> dict | None:
+        """The most recent interval's top k, or None if no ingest has touched the region."""
+        with self._lock:
+            results = self.latest.get((region, by))
+            if not results or k > self.k:
+                return None
+            latest = dict(results[max(results)])
+        latest["meters"] = latest["meters"][:k]
+        return latest
@@ -0,0 +1,140 @@
+"""
+Streaming per-location total consumption.
+
+Replaces the one-off functionalities/calculateTotal.py. Instead of keeping every
+import value of every meter in memory, a reducer keeps only the earliest and the
+latest reading per meter (O(meters) memory), so export files can be folded in
+chunk by chunk and new files can be added later without re-reading old ones.
+
+The reducer state is persisted next to location_total_consumption.json:
+    {
+      "meters": { meter_id: [first_ts, first_import, last_ts, last_import], ... },
+      "files":  [file_name, ...]
+    }
+"""
+
+import json
+import os
+import threading
+
+from diff_data import DATA_DIR, METER_MAP_FILE
+from exports import iter_export_chunks, list_export_files
+
+TOTAL_CONSUMPTION_FILE = os.path.join(DATA_DIR, "daniel_data", "location_total_consumption.json")
+STATE_FILE = os.path.join(DATA_DIR, "daniel_data", "total_consumption_state.json")
+EXPORTS_DIR = os.path.join(DATA_DIR, "exports")
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class TotalConsumption:
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        # meter -> [first_ts, first_import, last_ts, last_import]
+        self.meters: dict[str, list] = {}
+        self.files: list[str] = []
+        self._lock = threading.Lock()
+
+    # ---------- persistence ----------
+    @classmethod
+    def load(cls, path: str = STATE_FILE) -> "TotalConsumption":
+        red = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            red.meters = raw.get("meters", {})
+            red.files = raw.get("files", [])
+        return red
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"meters": self.meters, "files": self.files}, f)
+        os.replace(tmp, self.path)
+
+    # ---------- reduction ----------
+    def update(self, meter: str, ts: str, value: float):
+        """Fold a single reading ("YYYY-MM-DD HH:MM:SS", cumulative import) into the state."""
+        with self._lock:
+            state = self.meters.get(meter)
+            if state is None:
+                self.meters[meter] = [ts, value, ts, value]
+                return
+            if ts < state[0]:
+                state[0], state[1] = ts, value
+            if ts >= state[2]:
+                state[2], state[3] = ts, value
+
+    def update_frame(self, df) -> int:
+        """Fold a normalized Meter/Time/Import frame (see exports.py). Returns rows used."""
+        df = df.dropna(subset=["Import"])
+        if df.empty:
+            return 0
+        # Reduce the chunk to one first and one last row per meter before
+        # touching the Python-level state.
+        grouped = df.groupby("Meter")["Time"]
+        firsts = df.loc[grouped.idxmin()]
+        lasts = df.loc[grouped.idxmax()]
+        for meter, t, v in zip(firsts["Meter"], firsts["Time"].dt.strftime(TS_FORMAT), firsts["Import"]):
+            self.update(meter, t, float(v))
+        for meter, t, v in zip(lasts["Meter"], lasts["Time"].dt.strftime(TS_FORMAT), lasts["Import"]):
+            self.update(meter, t, float(v))
+        return len(df)
+
+    def ingest_file(self, path: str, force: bool = False) -> bool:
+        name = os.path.basename(path)
+        if name in self.files and not force:
+            return False
+        for chunk in iter_export_chunks(path):
+            self.update_frame(chunk)
+        with self._lock:
+            if name not in self.files:
+                self.files.append(name)
+        return True
+
+    def ingest_folder(self, folder: str = EXPORTS_DIR) -> list[str]:
+        """Fold every export in `folder` that was not processed yet; returns the new file names."""
+        added = [os.path.basename(p) for p in list_export_files(folder) if self.ingest_file(p)]
+        if added:
+            self.save()
+        return added
+
+    # ---------- results ----------
+    def meter_totals(self) -> dict[str, float]:
+        return {m: s[3] - s[1] for m, s in self.meters.items()}
+
+    def location_totals(self, location_to_meters: dict) -> dict[str, float]:
+        totals = self.meter_totals()
+        return {
+            location: sum(totals.get(str(m), 0) for m in meters)
+            for location, meters in location_to_meters.items()
+        }
+
+
+def write_location_totals(reducer: TotalConsumption, out_path: str = TOTAL_CONSUMPTION_FILE,
+                          map_path: str = METER_MAP_FILE) -> dict:
+    with open(map_path, encoding="utf-8") as f:
+        location_to_meters = json.load(f)
+    location_totals = reducer.location_totals(location_to_meters)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(location_totals, f, indent=2)
+    return location_totals
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Fold the new export files of a folder (default EXPORTS_DIR) and rewrite the location totals."""
+    import sys
+
+    argv = sys.argv[1:] if argv is None else argv
+    folder = argv[0] if argv else EXPORTS_DIR
+    reducer = TotalConsumption.load()
+    added = reducer.ingest_folder(folder)
+    print(f"Folded {len(added)} new file(s) from {folder}")
+    write_location_totals(reducer)
+    print(f"Saved total consumption per location to {TOTAL_CONSUMPTION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
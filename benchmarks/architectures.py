@@ -0,0 +1,112 @@
+"""
+nn.LSTM vs xLSTM forecasters on CPU.
+
+As benchmark cases (latency only) a 24-step rollout of a batch of synthetic
+meters runs through each architecture at the shipped checkpoint's size.
+
+Run directly, every architecture is trained with the same budget on
+processed_regions.json minus its last --horizon steps and scored on that tail
+(MAE), with inference throughput in series per second:
+
+    python benchmarks/architectures.py --epochs 3 --horizon 24
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench import case
+
+BATCH = 64
+ARCHITECTURES = {
+    "lstm": {"arch": "lstm"},
+    "xlstm[m]": {"arch": "xlstm", "slstm_at": []},
+    "xlstm[m+s]": {"arch": "xlstm", "slstm_at": [1]},
+}
+
+
+def _case(extra):
+    def setup(ctx):
+        import torch
+        from model.xlstm_runner import build_model, load_array2d, fit_scalers, user_windows, rollout
+
+        hyper = dict(torch.load(ctx.ckpt, map_location="cpu")["hyper"])
+        panel = load_array2d(ctx.paths["panel"])
+        hyper.update(extra, num_users=panel.shape[0], horizon=1)
+        model = build_model(hyper).eval()
+        idxs = list(range(min(BATCH, panel.shape[0])))
+        windows, _, _ = user_windows(panel, idxs, *fit_scalers(panel), hyper["lookback"])
+        return lambda: rollout(model, windows, idxs, 24)
+    return setup
+
+
+for _name, _extra in ARCHITECTURES.items():
+    case(f"rollout.{_name}[24]x{BATCH}")(_case(_extra))
+
+
+def compare(data_path: str, horizon: int, epochs: int, stride: int, hidden: int, seed: int,
+            archs: list[str]) -> dict:
+    """Train each architecture on the panel minus its last `horizon` steps and score the tail."""
+    import numpy as np
+    import torch
+    from model.xlstm_runner import load_array2d, train, load_forecaster, series_windows, rollout
+
+    panel = load_array2d(data_path)
+    history, truth = panel[:, :-horizon], panel[:, -horizon:]
+    base = {"input_size": 1, "hidden_size": hidden, "num_layers": 2, "id_embed_dim": 8,
+            "dropout": 0.1, "lookback": 64, "horizon": 1}
+    out = {"data": os.path.basename(data_path), "series": panel.shape[0], "horizon": horizon, "epochs": epochs}
+
+    with tempfile.TemporaryDirectory(prefix="bench-archs-") as folder:
+        for name in archs:
+            started = time.perf_counter()
+            ckpt = train(history, {**base, **ARCHITECTURES[name]}, epochs=epochs, stride=stride,
+                         seed=seed, device="cpu")
+            train_s = time.perf_counter() - started
+            path = os.path.join(folder, f"{name}.pt")
+            torch.save(ckpt, path)
+            model, ckpt = load_forecaster(path, "cpu")
+
+            idxs = np.arange(panel.shape[0])
+            windows, mu, s = series_windows(history, idxs, base["lookback"])
+            preds = rollout(model, windows, idxs, horizon) * s[:, None] + mu[:, None]
+
+            # Throughput on a larger batch (the panel's windows tiled to BATCH * 4 series).
+            reps = -(-BATCH * 4 // len(idxs))
+            big = np.tile(windows, (reps, 1))
+            big_ids = np.tile(idxs, reps)
+            started = time.perf_counter()
+            rollout(model, big, big_ids, horizon)
+            infer_s = time.perf_counter() - started
+
+            out[name] = {
+                "params": sum(p.numel() for p in model.parameters()),
+                "train_s": round(train_s, 2),
+                "mae": float(np.abs(preds - truth).mean()),
+                "mape_pct": float((np.abs(preds - truth) / np.maximum(np.abs(truth), 1e-6)).mean() * 100),
+                "series_per_second": round(len(big) / infer_s, 1),
+            }
+    return out
+
+
+if __name__ == "__main__":
+    import run
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default=os.path.join(run.REPO_DIR, "backend", "data", "model_data",
+                                                   "processed_regions.json"))
+    ap.add_argument("--horizon", type=int, default=24)
+    ap.add_argument("--epochs", type=int, default=3)
+    ap.add_argument("--stride", type=int, default=1)
+    ap.add_argument("--hidden", type=int, default=64)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--archs", nargs="*", default=list(ARCHITECTURES), choices=list(ARCHITECTURES))
+    args = ap.parse_args()
+    json.dump(compare(args.data, args.horizon, args.epochs, args.stride, args.hidden, args.seed, args.archs),
+              sys.stdout, indent=2)
+    print()
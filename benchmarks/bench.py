@@ -0,0 +1,11 @@
+"""Case registry shared by run.py and the case modules."""
+
+CASES: dict = {}
+
+
+def case(name: str):
+    """Register `fn(ctx) -> callable` as benchmark `name`."""
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
@@ -0,0 +1,110 @@
+"""
+Autoregressive vs direct multi-horizon forecasting.
+
+As benchmark cases (latency only) the one-step model rolls out 24/168 steps and
+a direct-head model of the same size emits them in one pass, for a batch of
+meters of the synthetic panel. Weights do not change latency, so both
+use untrained models with the shipped checkpoint's hyper.
+
+Run directly, both variants are trained with the same budget on a synthetic
+panel and compared on the held-out tail (MAE and latency):
+
+    python benchmarks/horizons.py --meters 200 --days 21 --horizon 168 --epochs 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench import case
+
+BATCH = 64
+
+
+def _models(ctx, horizon):
+    import torch
+    from model.xlstm_runner import build_model, load_array2d, fit_scalers, user_windows
+
+    hyper = dict(torch.load(ctx.ckpt, map_location="cpu")["hyper"])
+    panel = load_array2d(ctx.paths["panel"])
+    hyper["num_users"] = panel.shape[0]
+    ar = build_model({**hyper, "horizon": 1}).eval()
+    direct = build_model({**hyper, "horizon": horizon}).eval()
+    idxs = list(range(min(BATCH, panel.shape[0])))
+    windows, _, _ = user_windows(panel, idxs, *fit_scalers(panel), hyper["lookback"])
+    return ar, direct, windows, idxs
+
+
+def _case(horizon, direct_head):
+    def setup(ctx):
+        from model.xlstm_runner import rollout
+
+        ar, direct, windows, uids = _models(ctx, horizon)
+        model = direct if direct_head else ar
+        return lambda: rollout(model, windows, uids, horizon)
+    return setup
+
+
+for _h in (24, 168):
+    case(f"rollout.autoregressive[{_h}]x{BATCH}")(_case(_h, False))
+    case(f"rollout.direct[{_h}]x{BATCH}")(_case(_h, True))
+
+
+def compare(meters: int, days: float, horizon: int, lookback: int, epochs: int, seed: int) -> dict:
+    """Train both variants on a synthetic panel (minus its last `horizon` steps) and score the tail."""
+    import numpy as np
+    import synthetic
+    from model.xlstm_runner import train, load_forecaster, user_windows, rollout
+    import torch
+
+    readings = synthetic.generate_readings(synthetic.meter_ids(meters, seed), days, 60, seed)
+    panel = np.array(synthetic.delta_panel(readings), dtype=np.float32)
+    history, truth = panel[:, :-horizon], panel[:, -horizon:]
+    hyper = {"input_size": 1, "hidden_size": 64, "num_layers": 2, "id_embed_dim": 8,
+             "dropout": 0.1, "lookback": lookback}
+
+    out = {"meters": meters, "history_steps": history.shape[1], "horizon": horizon, "epochs": epochs}
+    with tempfile.TemporaryDirectory(prefix="bench-horizons-") as folder:
+        for name, h in (("autoregressive", 1), ("direct", horizon)):
+            started = time.perf_counter()
+            ckpt = train(history, {**hyper, "horizon": h}, epochs=epochs, seed=seed, device="cpu")
+            train_s = time.perf_counter() - started
+            path = os.path.join(folder, f"{name}.pt")
+            torch.save(ckpt, path)
+            model, ckpt = load_forecaster(path, "cpu")
+
+            idxs = np.arange(meters)
+            windows, mu, s = user_windows(history, idxs, ckpt["scalers"]["mean"], ckpt["scalers"]["std"], lookback)
+            started = time.perf_counter()
+            preds = rollout(model, windows, idxs, horizon) * s[:, None] + mu[:, None]
+            infer_s = time.perf_counter() - started
+            err = np.abs(preds - truth)
+            out[name] = {
+                "train_s": round(train_s, 3),
+                "inference_s": round(infer_s, 4),
+                "mae": float(err.mean()),
+                "mae_first_24": float(err[:, :24].mean()),
+                "mae_last_24": float(err[:, -24:].mean()),
+            }
+    return out
+
+
+if __name__ == "__main__":
+    import run  # noqa: F401  (sets up sys.path)
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--meters", type=int, default=200)
+    ap.add_argument("--days", type=float, default=21)
+    ap.add_argument("--horizon", type=int, default=168)
+    ap.add_argument("--lookback", type=int, default=64)
+    ap.add_argument("--epochs", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    json.dump(compare(args.meters, args.days, args.horizon, args.lookback, args.epochs, args.seed),
+              sys.stdout, indent=2)
+    print()
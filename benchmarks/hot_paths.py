@@ -0,0 +1,241 @@
+"""Benchmark cases for the request-time and preprocessing hot paths."""
+
+import os
+
+from bench import case
+
+
+@case("diff_data.get_diffs")
+def bench_get_diffs(ctx):
+    import diff_data
+
+    rows = next(iter(ctx.data.values()))
+    return lambda: diff_data.get_diffs(rows)
+
+
+@case("diff_data.get_timed_diffs")
+def bench_get_timed_diffs(ctx):
+    import diff_data
+
+    ids = list(ctx.data.keys())
+    t = ctx.clock(4)
+    return lambda: diff_data.get_timed_diffs(ctx.data, ids, t)
+
+
+def _point_diff_data_at(ctx):
+    import diff_data
+
+    diff_data.METER_MAP_FILE = ctx.paths["meter_map"]
+    diff_data.LOCATION_CSV_FILE = ctx.paths["locations"]
+    return diff_data
+
+
+@case("diff_data.get_color_json")
+def bench_get_color_json(ctx):
+    diff_data = _point_diff_data_at(ctx)
+    t = ctx.clock(4)
+    return lambda: diff_data.get_color_json(ctx.data, t)
+
+
+@case("diff_data.calc_consump")
+def bench_calc_consump(ctx):
+    diff_data = _point_diff_data_at(ctx)
+    return lambda: diff_data.calc_consump(ctx.data)
+
+
+@case("xlstm_runner.forecast_user[24]")
+def bench_forecast_user(ctx):
+    from model.xlstm_runner import forecast_user
+
+    return lambda: forecast_user(ctx.ckpt, ctx.paths["panel"], 0, 24)
+
+
+@case("xlstm_runner.forecast_user[168]")
+def bench_forecast_user_week(ctx):
+    from model.xlstm_runner import forecast_user
+
+    return lambda: forecast_user(ctx.ckpt, ctx.paths["panel"], 0, 168)
+
+
+@case("preprocess.new_procesed")
+def bench_new_procesed(ctx):
+    import new_procesed
+    from pathlib import Path
+
+    new_procesed.INPUT_PATH = Path(ctx.paths["data"])
+    new_procesed.OUTPUT_PATH = Path(os.path.join(ctx.folder, "bench_processed.json"))
+    return new_procesed.main
+
+
+@case("preprocess.build_region_import_deltas_leftpad")
+def bench_build_regions(ctx):
+    import build_region_import_deltas_leftpad as regions
+    from pathlib import Path
+
+    regions.INPUT_PATH = Path(ctx.paths["data"])
+    regions.MAP_PATH = Path(ctx.paths["meter_map"])
+    regions.OUT_SERIES = Path(os.path.join(ctx.folder, "bench_regions.json"))
+    regions.OUT_INDEX = Path(os.path.join(ctx.folder, "bench_regions_index.json"))
+    return regions.main
+
+
+@case("gauss_tarrif.price_matrix[week x 1000 costs]")
+def bench_price_matrix(ctx):
+    import gauss_tarrif
+
+    costs = list(range(100, 1100))
+    return lambda: gauss_tarrif.price_matrix(costs, days=7, resolution_minutes=15)
+
+
+@case("readings.load_readings[legacy]")
+def bench_load_legacy(ctx):
+    import readings
+
+    return lambda: readings.load_readings(ctx.paths["data"])
+
+
+@case("readings.load_readings[compact]")
+def bench_load_compact(ctx):
+    import readings
+
+    path = os.path.join(ctx.folder, "data.compact.json")
+    readings.convert(ctx.paths["data"], path)
+    return lambda: readings.load_readings(path)
+
+
+@case("readings.load_columns[compact]")
+def bench_load_columns(ctx):
+    import readings
+
+    path = os.path.join(ctx.folder, "data.compact.json")
+    readings.convert(ctx.paths["data"], path)
+    return lambda: readings.load_columns(path)
+
+
+@case("legacy_stream.iter_legacy")
+def bench_iter_legacy(ctx):
+    import legacy_stream
+
+    return lambda: sum(1 for _ in legacy_stream.iter_legacy(ctx.paths["data"], build_index=False))
+
+
+@case("legacy_stream.read_meter[indexed]")
+def bench_read_meter(ctx):
+    import legacy_stream
+
+    legacy_stream.ensure_index(ctx.paths["data"])
+    meter = list(ctx.data)[len(ctx.data) // 2]
+    return lambda: legacy_stream.read_meter(ctx.paths["data"], meter)
+
+
+def _parquet_store(ctx):
+    import json
+    import parquet_store
+    import readings
+
+    with open(ctx.paths["meter_map"], encoding="utf-8") as f:
+        store = parquet_store.ParquetStore(json.load(f), root=os.path.join(ctx.folder, "parquet"))
+    if not store.dates():
+        store.backfill(readings.iter_readings(ctx.paths["data"]))
+    return store
+
+
+@case("parquet_store.query[one day]")
+def bench_parquet_day(ctx):
+    store = _parquet_store(ctx)
+    day = store.dates()[len(store.dates()) // 2]
+    return lambda: store.query(start=day, end=day + " 23:59:59")
+
+
+@case("parquet_store.query[one meter]")
+def bench_parquet_meter(ctx):
+    store = _parquet_store(ctx)
+    meter = list(ctx.data)[len(ctx.data) // 2]
+    return lambda: store.query(meters=[meter])
+
+
+@case("rollups.build")
+def bench_rollups_build(ctx):
+    import rollups
+
+    return lambda: rollups.Rollups.build(ctx.data, ctx.meter_map)
+
+
+@case("rollups.query[regions, hourly week]")
+def bench_rollups_query(ctx):
+    import rollups
+
+    store = rollups.Rollups.build(ctx.data, ctx.meter_map)
+    keys = [k for k in store.index if k.startswith("region:")]
+    return lambda: store.query(keys, resolution="hour")
+
+
+@case("prefix_index.totals[regions, 1000 ranges]")
+def bench_prefix_totals(ctx):
+    import random
+    from datetime import timedelta
+    from prefix_index import PrefixIndex, STEP_SECONDS
+
+    index = PrefixIndex.build(ctx.data, ctx.meter_map)
+    keys = [k for k in index.index if k.startswith("region:")]
+    steps = int((index.end - index.origin).total_seconds() // STEP_SECONDS)
+    rng = random.Random(0)
+    ranges = []
+    for _ in range(1000):
+        a, b = sorted(rng.sample(range(steps + 1), 2))
+        ranges.append((index.origin + timedelta(seconds=a * STEP_SECONDS),
+                       index.origin + timedelta(seconds=b * STEP_SECONDS)))
+    return lambda: index.totals(keys, ranges)
+
+
+@case("top_k.HeavyConsumers.query[moldova, hour, k=50]")
+def bench_top_k(ctx):
+    from datetime import timedelta
+    from rollups import Rollups
+    from top_k import HeavyConsumers
+
+    engine = HeavyConsumers(Rollups.build(ctx.data, ctx.meter_map))
+    end = engine.index.end - timedelta(hours=1)
+    return lambda: engine.query("moldova", end - timedelta(hours=1), end, 50)
+
+
+def _profile_index(meters: int = 100_000, hours: int = 168, shapes: int = 2000):
+    import numpy as np
+    from profiles import ProfileIndex
+
+    rng = np.random.default_rng(0)
+    base = rng.random((shapes, hours))
+    vectors = np.abs(base[rng.integers(0, shapes, meters)] + 0.1 * rng.standard_normal((meters, hours)))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return ProfileIndex([str(i) for i in range(meters)], vectors)
+
+
+@case("profiles.search[100k weekly, exact]")
+def bench_profiles_exact(ctx):
+    index = _profile_index()
+    return lambda: index.search("12345", 10, "exact")
+
+
+@case("profiles.search[100k weekly, lsh]")
+def bench_profiles_lsh(ctx):
+    index = _profile_index()
+    return lambda: index.search("12345", 10, "lsh")
+
+
+@case("clusters.minibatch_kmeans[100k daily shapes, k=8]")
+def bench_clusters(ctx):
+    import numpy as np
+    from model.clusters import minibatch_kmeans
+
+    rng = np.random.default_rng(0)
+    base = rng.random((8, 24))
+    shapes = np.abs(base[rng.integers(0, 8, 100_000)] + 0.1 * rng.standard_normal((100_000, 24)))
+    shapes = (shapes / shapes.sum(axis=1, keepdims=True)).astype(np.float32)
+    return lambda: minibatch_kmeans(shapes, 8)
+
+
+@case("backtest.backtest[users, 4 origins x 24]")
+def bench_backtest(ctx):
+    from model.backtest import backtest
+
+    return lambda: backtest(ctx.ckpt, ctx.paths["panel"], "users", 24, 4, 24)
@@ -0,0 +1,172 @@
+"""
+Benchmark harness for the backend hot paths.
+
+    python benchmarks/run.py --meters 1000 --days 2 --out results.json
+    python benchmarks/run.py --meters 1000 --days 2 --compare results.json
+
+A synthetic dataset (see synthetic.py) is written to a temporary folder, every
+registered case is timed (`--repeats` runs, median and min reported) and its
+peak Python heap is measured with tracemalloc in one extra run. Results are
+written as JSON; with --compare the run fails (exit code 1) when a case got
+slower than the baseline by more than --threshold.
+
+Cases are registered with bench.case in the modules listed in CASE_MODULES. A case
+gets the shared `Context` and returns the zero-argument callable to time, so
+setup work stays outside the measurement.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+for p in (BENCH_DIR,
+          os.path.join(REPO_DIR, "backend"),
+          os.path.join(REPO_DIR, "backend", "api"),
+          os.path.join(REPO_DIR, "functionalities")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import synthetic  # noqa: E402
+from bench import CASES  # noqa: E402
+
+CASE_MODULES = ["hot_paths", "horizons", "architectures"]
+
+
+class Context:
+    """Everything a case may need: the synthetic data, its files and the model checkpoint."""
+
+    def __init__(self, folder: str, meters: int, days: float, interval: int, seed: int):
+        self.folder = folder
+        self.meters, self.days, self.interval, self.seed = meters, days, interval, seed
+        self.paths = synthetic.write_dataset(folder, meters, days, interval, seed)
+        with open(self.paths["data"], encoding="utf-8") as f:
+            self.data = json.load(f)
+        with open(self.paths["meter_map"], encoding="utf-8") as f:
+            self.meter_map = json.load(f)
+        self.ckpt = os.path.join(REPO_DIR, "backend", "data", "model_data", "model.pt")
+
+    def clock(self, step: int) -> str:
+        """Clock string of the step-th reading."""
+        rows = next(iter(self.data.values()))
+        return rows[min(step, len(rows) - 1)][synthetic.CLOCK_COL]
+
+
+def measure(fn, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "repeats": repeats,
+        "peak_mb": peak / 2**20,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, res in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_s" not in res or "median_s" not in base:
+            continue
+        ratio = res["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {base['median_s']:.4f}s -> {res['median_s']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--meters", type=int, default=1000)
+    ap.add_argument("--days", type=float, default=2)
+    ap.add_argument("--interval", type=int, default=15)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--cases", nargs="*", help="only run cases whose name contains one of these")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="baseline results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    for module in CASE_MODULES:
+        importlib.import_module(module)
+
+    selected = [n for n in CASES if not args.cases or any(c in n for c in args.cases)]
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as folder:
+        ctx = Context(folder, args.meters, args.days, args.interval, args.seed)
+        results = {
+            "meta": {
+                "meters": args.meters,
+                "days": args.days,
+                "interval_minutes": args.interval,
+                "seed": args.seed,
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+            },
+            "results": {},
+        }
+        for name in selected:
+            try:
+                res = measure(CASES[name](ctx), args.repeats)
+            except Exception as e:
+                res = {"error": f"{type(e).__name__}: {e}"}
+            results["results"][name] = res
+            if "error" in res:
+                print(f"{name:<40} ERROR {res['error']}")
+            else:
+                print(f"{name:<40} {res['median_s']*1000:10.2f} ms  {res['peak_mb']:8.2f} MB")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Synthetic data generator for the benchmarks.
+
+Produces data.json-shaped readings (meter id -> list of cumulative readings
+with the OBIS column names), a meter_to_location map over the real region
+names, and the [U, T] delta panel the forecaster reads (processed.json), at
+any scale:
+
+    python benchmarks/synthetic.py --meters 1000 --days 7 --out /tmp/synth
+
+Readings follow a daily two-peak load shape (the same peaks as gauss_tarrif)
+with per-meter scale and noise; roughly one meter in ten also exports at midday.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCATIONS_CSV = os.path.join(REPO_DIR, "backend", "data", "daniel_data", "locations.csv")
+
+CLOCK_COL = "Clock (8:0-0:1.0.0*255:2)"
+IMPORT_COL = "Active Energy Import (3:1-0:1.8.0*255:2)"
+EXPORT_COL = "Active Energy Export (3:1-0:2.8.0*255:2)"
+TIME_FMT = "%d.%m.%Y %H:%M:%S"
+
+START = datetime(2025, 6, 1)
+
+
+def load_regions(path: str = LOCATIONS_CSV) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def meter_ids(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    ids = rng.sample(range(13_000_000, 16_000_000), n)
+    return [str(i) for i in sorted(ids)]
+
+
+def meter_map(ids: list[str], regions: list[str], seed: int = 0) -> dict[str, list[int]]:
+    rng = random.Random(seed)
+    out: dict[str, list[int]] = {r: [] for r in regions}
+    for m in ids:
+        out[rng.choice(regions)].append(int(m))
+    return out
+
+
+def _load_shape(hour: float) -> float:
+    morning = math.exp(-0.5 * ((hour - 9) / 2) ** 2)
+    evening = math.exp(-0.5 * ((hour - 19) / 2.5) ** 2)
+    return 0.2 + morning + evening
+
+
+def _solar_shape(hour: float) -> float:
+    return max(0.0, math.sin(math.pi * (hour - 6) / 12)) if 6 <= hour <= 18 else 0.0
+
+
+def iter_readings(ids: list[str], days: float, interval_minutes: int = 15, seed: int = 0,
+                  start: datetime = START):
+    """Yield (meter_id, readings) one meter at a time, so huge datasets can be streamed to disk."""
+    steps = int(days * 24 * 60 / interval_minutes) + 1
+    clocks = [(start + timedelta(minutes=i * interval_minutes)) for i in range(steps)]
+    clock_strs = [c.strftime(TIME_FMT) for c in clocks]
+    hours = [c.hour + c.minute / 60 for c in clocks]
+    load = [_load_shape(h) for h in hours]
+    solar = [_solar_shape(h) for h in hours]
+
+    for m in ids:
+        rng = random.Random(f"{seed}-{m}")
+        scale = rng.uniform(5, 60)
+        exporter = rng.random() < 0.1
+        imp = float(rng.randint(10_000, 5_000_000))
+        exp = float(rng.randint(0, 100_000)) if exporter else 0.0
+        rows = []
+        for i in range(steps):
+            if i:
+                imp += round(scale * load[i] * rng.uniform(0.7, 1.3))
+                if exporter:
+                    exp += round(3 * scale * solar[i] * rng.uniform(0.5, 1.0))
+            rows.append({CLOCK_COL: clock_strs[i], IMPORT_COL: imp, EXPORT_COL: exp})
+        yield m, rows
+
+
+def generate_readings(ids: list[str], days: float, interval_minutes: int = 15, seed: int = 0) -> dict:
+    return dict(iter_readings(ids, days, interval_minutes, seed))
+
+
+def delta_panel(readings: dict) -> list[list[float]]:
+    """[U, T] import deltas, one row per meter (same order as `readings`)."""
+    return [
+        [b[IMPORT_COL] - a[IMPORT_COL] for a, b in zip(rows, rows[1:])]
+        for rows in readings.values()
+    ]
+
+
+def write_dataset(folder: str, meters: int, days: float, interval_minutes: int = 15,
+                  seed: int = 0) -> dict:
+    """
+    Write a full synthetic data folder laid out like backend/data and return
+    the paths. data.json is streamed meter by meter.
+    """
+    os.makedirs(os.path.join(folder, "daniel_data"), exist_ok=True)
+    os.makedirs(os.path.join(folder, "model_data"), exist_ok=True)
+    regions = load_regions()
+    ids = meter_ids(meters, seed)
+
+    paths = {
+        "data": os.path.join(folder, "data.json"),
+        "meter_map": os.path.join(folder, "daniel_data", "meter_to_location.json"),
+        "locations": os.path.join(folder, "daniel_data", "locations.csv"),
+        "panel": os.path.join(folder, "model_data", "processed.json"),
+    }
+
+    with open(paths["data"], "w", encoding="utf-8") as f, \
+            open(paths["panel"], "w", encoding="utf-8") as p:
+        f.write("{")
+        p.write("[")
+        for i, (m, rows) in enumerate(iter_readings(ids, days, interval_minutes, seed)):
+            sep = "," if i else ""
+            f.write(f"{sep}{json.dumps(m)}:{json.dumps(rows)}")
+            deltas = [b[IMPORT_COL] - a[IMPORT_COL] for a, b in zip(rows, rows[1:])]
+            p.write(f"{sep}{json.dumps(deltas)}")
+        f.write("}")
+        p.write("]")
+
+    with open(paths["meter_map"], "w", encoding="utf-8") as f:
+        json.dump(meter_map(ids, [r["Name"] for r in regions], seed), f)
+    with open(paths["locations"], "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Name", "Latitude", "Longitude"])
+        writer.writeheader()
+        writer.writerows(regions)
+    return paths
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--meters", type=int, default=1000)
+    ap.add_argument("--days", type=float, default=7)
+    ap.add_argument("--interval", type=int, default=15, help="minutes between readings")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args()
+    print(write_dataset(args.out, args.meters, args.days, args.interval, args.seed))
@@ -1,8 +1,14 @@
 import json
 import math
+import os
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+from readings import iter_readings, iter_meter_rows, data_file  # noqa: E402
+from anomalies import import_deltas  # noqa: E402
 
 # ---- Config ----
 INPUT_PATH  = Path("data.json")                 # raw readings
@@ -13,6 +19,7 @@ OUT_INDEX   = Path("regions_index.json")        # {"regions": ["Balti", "Chisina
 CLOCK_COL  = "Clock (8:0-0:1.0.0*255:2)"
 IMPORT_COL = "Active Energy Import (3:1-0:1.8.0*255:2)"
 TIME_FMT   = "%d.%m.%Y %H:%M:%S"
+REPAIR_ANOMALIES = False    # True: repair meter resets / negative steps / spikes like live ingestion
 
 
 # ---------- Helpers ----------
@@ -36,48 +43,48 @@ def _parse_dt(s: str) -> datetime:
     return datetime.strptime(s, TIME_FMT)
 
 
-def _normalize_input(data: Any) -> Dict[str, List[Dict[str, Any]]]:
+def _normalize_input(data: Any) -> Iterator[tuple[str, List[Dict[str, Any]]]]:
     """
     Accept either:
       A) { meter_id: [ {Clock:..., Import:...}, ... ], ... }
       B) [ { "Meter": "...", Clock:..., Import:... }, ... ]
-    Return dict: meter_id -> list of rows.
+      C) an iterator of (meter_id, rows) pairs, e.g. readings.iter_readings()
+    Yield (meter_id, rows) pairs; A and C are passed through one meter at a time.
     """
-    by_meter: Dict[str, List[Dict[str, Any]]] = {}
-
-    if isinstance(data, dict):
-        for meter_id, rows in data.items():
-            if not isinstance(rows, list):
-                continue
-            clean = [r for r in rows if CLOCK_COL in r and IMPORT_COL in r]
-            by_meter[str(meter_id)] = clean
-    elif isinstance(data, list):
+    if isinstance(data, list):
+        by_meter: Dict[str, List[Dict[str, Any]]] = {}
         for r in data:
             if "Meter" in r and CLOCK_COL in r and IMPORT_COL in r:
                 m = str(r["Meter"])
                 by_meter.setdefault(m, []).append(r)
+        yield from by_meter.items()
+    elif isinstance(data, (dict, Iterator)):
+        yield from iter_meter_rows(data, (CLOCK_COL, IMPORT_COL))
     else:
         raise ValueError("Unsupported data.json format")
-    return by_meter
+
+
+def _read_input(source: Path) -> Any:
+    """A list of records (format B) is loaded whole; meter dicts are streamed (iter_readings)."""
+    with source.open("r", encoding="utf-8") as f:
+        if f.read(64).lstrip().startswith("["):
+            f.seek(0)
+            return json.load(f)
+    return iter_readings(source)
 
 
 def _compute_import_deltas(rows: List[Dict[str, Any]]) -> List[float]:
     """
     Sort by time; compute consecutive deltas: next - last for IMPORT_COL.
     If a pair has missing/unparseable values, that delta is skipped.
+    With REPAIR_ANOMALIES, resets, negative steps and spikes are repaired
+    (anomalies.import_deltas).
     """
     if not rows:
         return []
     rows_sorted = sorted(rows, key=lambda r: _parse_dt(r[CLOCK_COL]))
     vals: List[float | None] = [_to_float(r.get(IMPORT_COL)) for r in rows_sorted]
-
-    deltas: List[float] = []
-    for i in range(len(vals) - 1):
-        v1, v2 = vals[i], vals[i + 1]
-        if v1 is None or v2 is None:
-            continue
-        deltas.append(v2 - v1)
-    return deltas
+    return import_deltas(vals, repair=REPAIR_ANOMALIES)
 
 
 def _first_nonzero_or_default(seq: List[float], default: float = 0.0) -> float:
@@ -118,22 +125,22 @@ def _sum_series(series_list: List[List[float]], length: int) -> List[float]:
 
 # ---------- Main ----------
 def main():
-    if not INPUT_PATH.exists():
+    source = Path(data_file(INPUT_PATH))    # data.json, or its compact twin once converted
+    if not source.exists():
         raise FileNotFoundError(f"Input file not found: {INPUT_PATH}")
     if not MAP_PATH.exists():
         raise FileNotFoundError(f"Mapping file not found: {MAP_PATH}")
 
-    with INPUT_PATH.open("r", encoding="utf-8") as f:
-        raw = json.load(f)
     with MAP_PATH.open("r", encoding="utf-8") as f:
         region_to_meters_raw = json.load(f)
 
-    # 1) Per-meter deltas
-    by_meter = _normalize_input(raw)
-    meter_ids_sorted = sorted(by_meter.keys(), key=lambda x: (len(x), x))
-    per_meter_series: Dict[str, List[float]] = {}
-    for m in meter_ids_sorted:
-        per_meter_series[m] = _compute_import_deltas(by_meter[m])
+    # 1) Per-meter deltas, streaming the readings one meter at a time
+    deltas_by_meter = {
+        m: _compute_import_deltas(rows)
+        for m, rows in _normalize_input(_read_input(source))
+    }
+    meter_ids_sorted = sorted(deltas_by_meter.keys(), key=lambda x: (len(x), x))
+    per_meter_series: Dict[str, List[float]] = {m: deltas_by_meter[m] for m in meter_ids_sorted}
 
     # 2) Left-pad all meters to max length (nearest-member extrapolation, prepend)
     max_len = max((len(s) for s in per_meter_series.values()), default=0)
@@ -1,7 +1,8 @@
-import pandas as pd
-import glob
 import os
-from datetime import datetime, timedelta
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from meter_registry import MeterRegistry
 
 
 def get_all_unique_ids():
@@ -10,28 +11,12 @@ def get_all_unique_ids():
     repo_root = os.path.dirname(script_dir)
     path = os.path.join(repo_root, 'data')
 
-    unique_ids = set()
-    data_files = [f for f in glob.glob(os.path.join(path, "*"))
-                  if f.lower().endswith(('.csv', '.xlsx', '.xls'))]
-
-    for file in data_files:
-        try:
-            if file.lower().endswith('.csv'):
-                df = pd.read_csv(file, header=None, dtype=str, encoding='utf-8', on_bad_lines='skip')
-            else:
-                df = pd.read_excel(file, header=None, dtype=str)
-
-            if len(df.columns) > 0:
-                id_column = df.iloc[:, 0]
-                numeric_ids = pd.to_numeric(id_column, errors='coerce')
-                valid_ids = numeric_ids.dropna().astype(int)
-                unique_ids.update(valid_ids.tolist())
-                
-        except Exception as e:
-            print(f"Error processing file {file}: {e}")
-            continue
-
-    return sorted(unique_ids)
+    # Only files the registry has not seen yet are read; the ids themselves
+    # come straight from the persisted registry.
+    registry = MeterRegistry.load()
+    registry.ingest_folder(path)
+
+    return sorted(int(m) for m in registry.meters)
 
 
 def calculate_total_unique_ids():
@@ -14,33 +14,32 @@
 # - Returns two arrays (one for each day) for easy frontend consumption
 # ---------------------------------------------
 
-import json
 import os
 import sys
 import pandas as pd
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'api')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+from readings import load_columns, data_file
+from diff_data import CLOCK_COLMN_NAME, IMPORT_COLMN_NAME, EXPORT_COLMN_NAME
 
 
-# Load the main data.json file containing all meter readings.
-# The file is expected to be a dictionary mapping meter IDs to lists of readings.
+# Load the main data.json file (or its compact twin) containing all meter readings,
+# as one column array per meter instead of one dict per reading.
 DATA_PATH = os.path.join(os.path.dirname(__file__), '../data/data.json')
-with open(DATA_PATH, encoding='utf-8') as f:
-	data = json.load(f)
+data = load_columns(data_file(DATA_PATH))
 
 
-# Build a pandas DataFrame from the data.json structure for fast filtering.
+# Build a pandas DataFrame from the per-meter columns for fast filtering.
 # Each row represents a single reading for a meter, with the meter ID in the 'Meter' column.
 def build_meter_dataframe(data):
-	return (
-		pd.concat({k: pd.DataFrame(v) for k, v in data.items()}, names=["Meter"])
-		.reset_index(level=0)
-		.reset_index(drop=True)
-	)
+	return pd.DataFrame({
+		"Meter": [m for m, cols in data.items() for _ in range(len(cols))],
+		CLOCK_COLMN_NAME: [t for cols in data.values() for t in cols.clock],
+		IMPORT_COLMN_NAME: [v for cols in data.values() for v in cols.imp],
+		EXPORT_COLMN_NAME: [v for cols in data.values() for v in cols.exp],
+	})
 
 # The DataFrame is built once and reused for all queries.
 df = build_meter_dataframe(data)
-# The column name for the timestamp in the data files.
-CLOCK_COLMN_NAME = "Clock (8:0-0:1.0.0*255:2)"
 
 
 
@@ -62,8 +61,8 @@ def get_hourly_import_diffs_for_day(meter_id: str, day: str) -> list:
 			row1 = meter_df[meter_df[CLOCK_COLMN_NAME] == t1]
 			row2 = meter_df[meter_df[CLOCK_COLMN_NAME] == t2]
 			if not row1.empty and not row2.empty:
-				import1 = row1.iloc[0]["Active Energy Import (3:1-0:1.8.0*255:2)"]
-				import2 = row2.iloc[0]["Active Energy Import (3:1-0:1.8.0*255:2)"]
+				import1 = row1.iloc[0][IMPORT_COLMN_NAME]
+				import2 = row2.iloc[0][IMPORT_COLMN_NAME]
 				diff_val = import2 - import1
 				diffs.append(float(diff_val))
 			else: